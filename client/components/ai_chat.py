@@ -7,24 +7,47 @@ from presenters.recipe_presenter import RecipePresenter
 
 
 class _ChatWorker(QThread):
+    token = Signal(str)   # חלק חדש של התשובה (בהזרמה)
     done = Signal(dict)
     fail = Signal(str)
 
-    def __init__(self, presenter, recipe_id, question):
+    def __init__(self, presenter, recipe_id, question, session_id=None):
         super().__init__()
         self.presenter = presenter
         self.recipe_id = recipe_id
         self.question = question
+        self.session_id = session_id
 
     def run(self):
+        events = self.presenter.chat_stream(self.recipe_id, self.question, self.session_id)
         try:
-            data = self.presenter.chat(self.recipe_id, self.question)
-            self.done.emit(data or {})
+            parts = []
+            # השרת שולח שורה לפחות פעם בשנייה (גם בהמתנה בתור), כך שביטול נבדק כל הזמן
+            for ev in events:
+                if self.isInterruptionRequested():
+                    # סגירת ה-generator סוגרת את החיבור, והשרת משחרר את התור ומפסיק לייצר
+                    return
+                if ev.get("error"):
+                    self.fail.emit(ev["error"])
+                    return
+                if ev.get("token"):
+                    parts.append(ev["token"])
+                    self.token.emit(ev["token"])
+                if ev.get("done"):
+                    self.done.emit({**ev, "answer": "".join(parts)})
+                    return
+            # הזרם נסגר בלי שורת סיום – מציגים מה שהתקבל
+            self.done.emit({"answer": "".join(parts)})
         except Exception as e:
             self.fail.emit(str(e))
+        finally:
+            events.close()
 
 
 class AIChat(QFrame):
+    # workers שבוטלו ועוד לא הסתיימו – שומרים רפרנס עד הסוף כדי ש-Qt לא יהרוס thread רץ
+    _stopping: set = set()
+
     def __init__(self, recipe_id: str | None = None):
         super().__init__()
         self.p = RecipePresenter(self)
@@ -33,6 +56,10 @@ class AIChat(QFrame):
         self._busy = False
         self._worker = None
         self._typing_lbl = None
+        self._stream_lbl = None   # בועת התשובה שמתמלאת בזמן ההזרמה
+        self._stream_text = ""
+        # השיחה בשרת (ההיסטוריה נשמרת שם) – מתקבל בתשובה הראשונה
+        self.session_id = None
 
         # --- כותרת + ניקוי ---
         header = QHBoxLayout()
@@ -42,6 +69,10 @@ class AIChat(QFrame):
         self.btn_clear.clicked.connect(self.clear_chat)
         header.addWidget(self.btn_clear, 0, Qt.AlignRight)
 
+        # --- שאלות מהירות (מהשרת, לפי המתכון) ---
+        self.chips = QHBoxLayout()
+        self.chips.setSpacing(6)
+
         # --- תצוגת הודעות (לוקחת את רוב הגובה) ---
         self.chat_area = QVBoxLayout()
         self.chat_area.addStretch(1)
@@ -72,9 +103,10 @@ class AIChat(QFrame):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(12, 12, 12, 12)
         layout.addLayout(header)
+        layout.addLayout(self.chips)
         layout.addWidget(self.scroll)       # תופס את רוב הגובה
         layout.addLayout(send_bar)
-        layout.setStretch(1, 1)             # נותן עדיפות לגובה ה-scroll
+        layout.setStretch(2, 1)             # נותן עדיפות לגובה ה-scroll
 
         # --- חיבורים ---
         self.btn.clicked.connect(self.ask)
@@ -88,7 +120,7 @@ class AIChat(QFrame):
                 return True
         return super().eventFilter(obj, ev)
 
-    def append_bubble(self, text: str, is_user: bool):
+    def append_bubble(self, text: str, is_user: bool) -> QLabel:
         label = QLabel(text or "")
         label.setWordWrap(True)
         label.setTextInteractionFlags(Qt.TextSelectableByMouse)
@@ -104,18 +136,55 @@ class AIChat(QFrame):
             line.addWidget(label)
             line.addStretch()
         self.chat_area.insertLayout(self.chat_area.count() - 1, line)
+        self._scroll_to_bottom()
+        return label
+
+    def _scroll_to_bottom(self):
         self.scroll.verticalScrollBar().setValue(self.scroll.verticalScrollBar().maximum())
 
     def set_busy(self, busy: bool):
         self._busy = busy
         self.btn.setEnabled(not busy)
         self.inp.setEnabled(not busy)
-        self.btn_clear.setEnabled(not busy)
+        for i in range(self.chips.count()):
+            w = self.chips.itemAt(i).widget()
+            if w:
+                w.setEnabled(not busy)
+
+    def set_suggestions(self, questions: list[str]):
+        """מחליף את כפתורי השאלות המהירות; לחיצה שולחת את השאלה כמו שהיא"""
+        while self.chips.count():
+            w = self.chips.takeAt(0).widget()
+            if w:
+                w.deleteLater()
+        for q in questions:
+            chip = QPushButton(q)
+            chip.setStyleSheet("border-radius:12px; padding:4px 10px;")
+            chip.clicked.connect(lambda _=False, q=q: self.ask_question(q))
+            self.chips.addWidget(chip)
+        self.chips.addStretch(1)
+
+    def cancel_pending(self):
+        """מבטל תשובה שעוד בדרך (ניקוי / סגירת החלון) – בלי לחכות שתסתיים"""
+        worker = self._worker
+        if worker is None or not worker.isRunning():
+            return
+        for sig in (worker.token, worker.done, worker.fail, worker.finished):
+            sig.disconnect()
+        worker.requestInterruption()
+        AIChat._stopping.add(worker)
+        worker.finished.connect(lambda w=worker: AIChat._stopping.discard(w))
+        self._worker = None
+        self._remove_typing()
+        self._stream_lbl = None
+        self.set_busy(False)
 
     def ask(self):
+        self.ask_question(self.inp.toPlainText().strip())
+
+    def ask_question(self, q: str):
         if self._busy:
             return  # מונע שליחה כפולה בזמן שהתשובה הקודמת עוד רצה
-        q = self.inp.toPlainText().strip()
         if not q:
             return
 
@@ -132,7 +201,10 @@ class AIChat(QFrame):
         self.chat_area.insertLayout(self.chat_area.count() - 1, tip_line)
 
         # בקשת הרשת ב־Thread כדי לא לחסום UI
-        self._worker = _ChatWorker(self.p, self.recipe_id, q)
+        self._stream_lbl = None
+        self._stream_text = ""
+        self._worker = _ChatWorker(self.p, self.recipe_id, q, self.session_id)
+        self._worker.token.connect(self._on_token)
         self._worker.done.connect(self._on_answer)
         self._worker.fail.connect(self._on_error)
         self._worker.finished.connect(lambda: self.set_busy(False))
@@ -143,16 +215,36 @@ class AIChat(QFrame):
             self._typing_lbl.setParent(None)
             self._typing_lbl = None
 
+    def _on_token(self, token: str):
+        # הטוקן הראשון מחליף את "ה-AI חושב" בבועה, והבאים מתווספים אליה
+        self._stream_text += token
+        if self._stream_lbl is None:
+            self._remove_typing()
+            self._stream_lbl = self.append_bubble(self._stream_text, is_user=False)
+        else:
+            self._stream_lbl.setText(self._stream_text)
+            self._scroll_to_bottom()
+
     def _on_answer(self, data: dict):
         self._remove_typing()
+        if data.get("session_id"):
+            self.session_id = data["session_id"]
         ans = (data.get("answer") or "").strip() or "(לא התקבלה תשובה)"
-        self.append_bubble(ans, is_user=False)
+        if self._stream_lbl is not None:
+            self._stream_lbl.setText(ans)
+            self._stream_lbl = None
+        else:
+            self.append_bubble(ans, is_user=False)
 
     def _on_error(self, msg: str):
         self._remove_typing()
+        self._stream_lbl = None
         self.append_bubble(f"[שגיאה] {msg}", is_user=False)
 
     def clear_chat(self):
+        self.cancel_pending()
+        # שיחה חדשה – השרת יפתח session חדש בשאלה הבאה
+        self.session_id = None
         # מוחק את כל הבועות ומשאיר את ה-stretch האחרון
         while self.chat_area.count() > 1:
             item = self.chat_area.takeAt(0)
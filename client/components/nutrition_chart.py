@@ -169,53 +169,3 @@ class NutritionChart(QFrame):
             self.legend_layout.addWidget(container)
 
         self.legend_layout.addStretch()
-
-
-
-# ====== נשאר כפי שהיה: פונקציה פשוטה לאומדן מקומי (fallback) ======
-def calculate_nutrition_from_ingredients(ingredients):
-    nutrition_db = {
-        'flour': {'cal': 364, 'protein': 10, 'carbs': 76, 'fat': 1},
-        'egg': {'cal': 155, 'protein': 13, 'carbs': 1, 'fat': 11},
-        'milk': {'cal': 42, 'protein': 3.4, 'carbs': 5, 'fat': 1},
-        'sugar': {'cal': 387, 'protein': 0, 'carbs': 100, 'fat': 0},
-        'oil': {'cal': 884, 'protein': 0, 'carbs': 0, 'fat': 100},
-        'butter': {'cal': 717, 'protein': 0.9, 'carbs': 0.1, 'fat': 81},
-        'chicken': {'cal': 239, 'protein': 27, 'carbs': 0, 'fat': 14},
-        'garlic': {'cal': 149, 'protein': 6.4, 'carbs': 33, 'fat': 0.5},
-        'onion': {'cal': 40, 'protein': 1.1, 'carbs': 9.3, 'fat': 0.1},
-        'tomato': {'cal': 18, 'protein': 0.9, 'carbs': 3.9, 'fat': 0.2},
-        'rice': {'cal': 130, 'protein': 2.7, 'carbs': 28, 'fat': 0.3},
-        'potato': {'cal': 77, 'protein': 2, 'carbs': 17, 'fat': 0.1},
-    }
-
-    total_cal = total_protein = total_carbs = total_fat = 0
-    found = 0
-
-    for ing in ingredients or []:
-        name = (ing.get('name') or '').lower()
-        for key, v in nutrition_db.items():
-            if key in name:
-                found += 1
-                if key in ['flour']: portion = 1.0
-                elif key in ['egg']: portion = 0.5
-                elif key in ['milk']: portion = 3.0
-                elif key in ['sugar']: portion = 0.2
-                elif key in ['oil','Butter'.lower()]: portion = 0.15
-                elif key in ['chicken','rice','potato']: portion = 1.5
-                else: portion = 0.1
-                total_cal += v['cal'] * portion
-                total_protein += v['protein'] * portion
-                total_carbs += v['carbs'] * portion
-                total_fat += v['fat'] * portion
-                break
-
-    if not found:
-        return {'calories': 300, 'protein': 20, 'carbs': 35, 'fat': 12}
-
-    return {
-        'calories': int(total_cal),
-        'protein': int(total_protein),
-        'carbs': int(total_carbs),
-        'fat': int(total_fat)
-    }
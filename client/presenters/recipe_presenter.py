@@ -9,6 +9,10 @@ class RecipePresenter:
         """טוען מתכון לפי מזהה"""
         return self.api.recipe(recipe_id)
 
-    def chat(self, recipe_id, question):
+    def chat(self, recipe_id, question, session_id=None):
         """שולח שאלה על המתכון ל־AI"""
-        return self.api.chat(question, recipe_id)
+        return self.api.chat(question, recipe_id, session_id)
+
+    def chat_stream(self, recipe_id, question, session_id=None):
+        """שולח שאלה על המתכון ל־AI ומחזיר את התשובה בהזרמה (generator של חלקים)"""
+        return self.api.chat_stream(question, recipe_id, session_id)
@@ -13,3 +13,12 @@ class SearchPresenter:
         """
         recipes = self.api.get_external_recipes(query or '')
         return recipes
+
+    def suggest(self, prefix):
+        """
+        הצעות להשלמה אוטומטית בזמן הקלדה
+        :param prefix: הטקסט שהוקלד
+        :return: רשימת מחרוזות להצגה
+        """
+        items = self.api.suggest(prefix or '')
+        return list(dict.fromkeys(i.get("text", "") for i in items or [] if i.get("text")))
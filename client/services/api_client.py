@@ -1,3 +1,4 @@
+import json
 import requests
 from config import API_BASE_URL
 from services.auth import AUTH
@@ -85,17 +86,74 @@ class ApiClient:
         """
         return self.get(f"/recipes/external/{recipe_id}")
 
+    def suggest(self, prefix: str, limit: int = 8):
+        """
+        מקבל הצעות להשלמה אוטומטית (כותרות, רכיבים ותגיות) לפי תחילת מחרוזת.
+
+        :param prefix: מה שהמשתמש הקליד עד עכשיו
+        :param limit: מספר הצעות מקסימלי
+        :return: רשימת dict עם text, kind, id
+        """
+        return self.get("/recipes/suggest", {"prefix": prefix, "limit": limit}, timeout=5)
+
+    def get_external_recipes_batch(self, recipe_ids: list[str]):
+        """
+        מקבל כמה מתכונים חיצוניים בקריאה אחת.
+
+        :param recipe_ids: רשימת מזהי מתכונים
+        :return: רשימה לפי אותו סדר, לכל מזהה dict עם id, recipe (או None) ו-error (או None)
+        """
+        return self.post("/recipes/external/batch", {"ids": list(recipe_ids)})
+
     # --- AI Chat ---
-    def chat(self, question: str, recipe_id: str | None = None):
+    def chat(self, question: str, recipe_id: str | None = None, session_id: str | None = None):
         """
         שולח שאלה ל-AI Chat, עם אפשרות לציין מתכון.
 
         :param question: השאלה למערכת ה-AI
         :param recipe_id: מזהה מתכון רלוונטי (אופציונלי)
-        :return: תשובה מה-AI
+        :param session_id: מזהה השיחה מהתשובה הקודמת (אופציונלי – בלעדיו נפתחת שיחה חדשה)
+        :return: תשובה מה-AI (כולל session_id)
         """
         # צ’אט מקבל timeout ארוך יותר
-        return self.post("/ai/chat", {"question": question, "recipe_id": recipe_id}, timeout=60)
+        return self.post("/ai/chat", {"question": question, "recipe_id": recipe_id, "session_id": session_id},
+                         timeout=60)
+
+    def chat_stream(self, question: str, recipe_id: str | None = None, session_id: str | None = None):
+        """
+        שולח שאלה ל-AI Chat ומקבל את התשובה בהזרמה, חלק אחרי חלק.
+
+        :param question: השאלה למערכת ה-AI
+        :param recipe_id: מזהה מתכון רלוונטי (אופציונלי)
+        :param session_id: מזהה השיחה מהתשובה הקודמת (אופציונלי)
+        :return: generator של dict – {"token": ...} לכל חלק, {"waiting": True} בזמן שהתשובה עוד לא התחילה,
+                 ובסוף {"done": True, "session_id", "ttft_ms", "total_ms"} או {"error": ...}
+        :raises: Exception אם השרת מחזיר סטטוס שגיאה
+        """
+        # timeout=(חיבור, המתנה בין חלקים) – לא מגביל את אורך התשובה כולה
+        with requests.post(self.base_url + "/ai/chat/stream", json={"question": question, "recipe_id": recipe_id, "session_id": session_id},
+                           headers=self._headers(), stream=True, timeout=(5, 60)) as r:
+            if r.status_code in (429, 503):
+                # השרת עמוס – Retry-After אומר בעוד כמה שניות לנסות שוב
+                raise Exception(f"ה-AI עמוס כרגע, נסו שוב בעוד {r.headers.get('Retry-After', 'כמה')} שניות")
+            if not r.ok:
+                raise Exception(f"{r.status_code}: {r.text}")
+            for line in r.iter_lines():
+                if line:
+                    ev = json.loads(line)
+                    if ev.get("error") and ev.get("retry_after"):
+                        # חיכה בתור יותר מדי זמן
+                        ev["error"] = f"ה-AI עמוס כרגע, נסו שוב בעוד {ev['retry_after']} שניות"
+                    yield ev
+
+    def ai_suggestions(self, recipe_id: str):
+        """
+        שאלות מוצעות למתכון. השרת מתחיל לייצר להן תשובות ברקע, כך שלחיצה עליהן עונה מיד.
+
+        :param recipe_id: מזהה המתכון
+        :return: dict עם questions – רשימת {"question", "ready"} (ready = התשובה כבר מוכנה)
+        """
+        return self.get(f"/ai/suggestions/{recipe_id}", timeout=10)
 
     # --- לוגו ---
     def get_logo_url(self, width: int = 120, height: int = 40):
@@ -12,4 +12,10 @@ class AIChatDialog(QDialog):
         lay.setContentsMargins(12, 12, 12, 12)
 
         # משחילים לתוך הדיאלוג את הרכיב הקיים
-        lay.addWidget(AIChat(recipe_id=recipe_id))
+        self.chat = AIChat(recipe_id=recipe_id)
+        lay.addWidget(self.chat)
+
+    def done(self, result: int):
+        # סגירת החלון באמצע תשובה – מבטלים אותה כדי שהשרת לא ימשיך לייצר אותה
+        self.chat.cancel_pending()
+        super().done(result)
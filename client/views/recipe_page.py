@@ -2,11 +2,27 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QScrollArea, QFrame, QListWidget, QListWidgetItem
 )
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtCore import Qt, Signal, QThread
 from PySide6.QtGui import QPixmap
 from services.api_client import ApiClient
 from components.ai_chat import AIChat
-from components.nutrition_chart import NutritionChart, calculate_nutrition_from_ingredients
+from components.nutrition_chart import NutritionChart
+
+class _AISuggestionsWorker(QThread):
+    done = Signal(str, list)
+
+    def __init__(self, api: ApiClient, recipe_id: str):
+        super().__init__()
+        self.api = api
+        self.recipe_id = recipe_id
+
+    def run(self):
+        try:
+            data = self.api.ai_suggestions(self.recipe_id) or {}
+            self.done.emit(self.recipe_id, [q["question"] for q in data.get("questions", [])])
+        except Exception:
+            self.done.emit(self.recipe_id, [])  # שאלות מהירות לא קריטיות – פשוט לא מציגים
+
 
 class RecipePage(QWidget):
     back_requested = Signal()
@@ -16,6 +32,8 @@ class RecipePage(QWidget):
         self.api = ApiClient()
         self.recipe_id = None
         self.recipe = {}
+        # workers של שאלות מהירות שעוד רצים (גם של מתכון קודם) – רפרנס עד שמסתיימים
+        self._suggest_workers: set = set()
 
         root = QVBoxLayout(self)
         root.setContentsMargins(12, 12, 12, 12)
@@ -95,6 +113,8 @@ class RecipePage(QWidget):
         """קורא מהשרת ומציג, כולל תמונה/רכיבים/שלבים"""
         self.recipe_id = recipe_id
         self.ai_panel.recipe_id = recipe_id  # שירוץ על ההקשר הנכון
+        self.ai_panel.session_id = None      # מתכון אחר = שיחה חדשה
+        self.ai_panel.set_suggestions([])
 
         rec = self.api.get_external_recipe_by_id(recipe_id) or {}
         self.recipe = rec
@@ -132,13 +152,30 @@ class RecipePage(QWidget):
         self.ai_panel.setVisible(False)
         self.nutri_panel.setVisible(False)
 
+        # אחרי שהמתכון מוצג: שאלות מהירות ברקע (השרת מכין להן תשובות בזמן שקוראים)
+        self._load_ai_suggestions(recipe_id)
+
+    def _load_ai_suggestions(self, recipe_id: str):
+        worker = _AISuggestionsWorker(self.api, recipe_id)
+        worker.done.connect(self._show_ai_suggestions)
+        worker.finished.connect(lambda w=worker: self._suggest_workers.discard(w))
+        self._suggest_workers.add(worker)
+        worker.start()
+
+    def _show_ai_suggestions(self, recipe_id: str, questions: list):
+        # תשובה של מתכון קודם (המשתמש כבר עבר מתכון) – מתעלמים
+        if recipe_id == self.recipe_id:
+            self.ai_panel.set_suggestions(questions)
+
     # ------- כפתורים -------
     def toggle_ai(self):
         self.ai_panel.setVisible(not self.ai_panel.isVisible())
 
     def toggle_nutrition(self):
         if not self.nutri_panel.isVisible():
-            # אם אין – חשב והצג
-            data = calculate_nutrition_from_ingredients(self.recipe.get("ingredients", []))
+            # הערכים מחושבים בשרת; ממפים לשמות השדות של הגרף
+            n = self.recipe.get("nutrition") or {}
+            data = {"calories": n.get("cal", 0), "protein": n.get("protein", 0),
+                    "carbs": n.get("carbs", 0), "fat": n.get("fat", 0)}
             self.nutri_panel.update_nutrition_data(data)
         self.nutri_panel.setVisible(not self.nutri_panel.isVisible())
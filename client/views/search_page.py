@@ -2,9 +2,9 @@
 from typing import Callable, List, Dict
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton,
-    QScrollArea, QGridLayout, QLabel, QSizePolicy
+    QScrollArea, QGridLayout, QLabel, QSizePolicy, QCompleter
 )
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import Qt, QThread, Signal, QTimer, QStringListModel
 from presenters.search_presenter import SearchPresenter
 from components.recipe_card import RecipeCard
 from views.recipe_page import RecipePage
@@ -26,6 +26,21 @@ class _SearchWorker(QThread):
             self.fail.emit(str(e))
 
 
+class _SuggestWorker(QThread):
+    done = Signal(str, list)
+
+    def __init__(self, presenter: SearchPresenter, prefix: str):
+        super().__init__()
+        self.presenter = presenter
+        self.prefix = prefix
+
+    def run(self):
+        try:
+            self.done.emit(self.prefix, self.presenter.suggest(self.prefix) or [])
+        except Exception:
+            self.done.emit(self.prefix, [])  # השלמה אוטומטית לא קריטית – פשוט לא מציגים
+
+
 class SearchPage(QWidget):
     """דף חיפוש בתוך ה-stack. מקבל open_recipe_cb/on_open כדי לפתוח עמוד מתכון."""
     def __init__(self, open_recipe_cb: Callable[[str], None] | None = None,
@@ -43,6 +58,20 @@ class SearchPage(QWidget):
         self.btn = QPushButton('חיפוש'); self.btn.setProperty('accent', True)
         self.btn.setFixedHeight(40)
 
+        # 💡 השלמה אוטומטית: בקשה לשרת אחרי הפסקה קצרה בהקלדה
+        self._suggest_model = QStringListModel(self)
+        self._completer = QCompleter(self._suggest_model, self)
+        self._completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self._completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self._completer.activated.connect(lambda _text: self.search())
+        self.q.setCompleter(self._completer)
+        self._suggest_worker: _SuggestWorker | None = None
+        self._suggest_timer = QTimer(self)
+        self._suggest_timer.setSingleShot(True)
+        self._suggest_timer.setInterval(150)
+        self._suggest_timer.timeout.connect(self._fetch_suggestions)
+        self.q.textEdited.connect(lambda _text: self._suggest_timer.start())
+
         # 🔝 שורת חיפוש + כפתור
         top = QHBoxLayout()
         top.addWidget(self.q, 1)
@@ -100,6 +129,24 @@ class SearchPage(QWidget):
         # גלילה לראש
         self.scroll.verticalScrollBar().setValue(0)
 
+    def _fetch_suggestions(self):
+        prefix = self.q.text().strip()
+        if len(prefix) < 2:
+            return
+        if self._suggest_worker and self._suggest_worker.isRunning():
+            self._suggest_timer.start()  # ננסה שוב כשהבקשה הקודמת תסתיים
+            return
+        self._suggest_worker = _SuggestWorker(self.p, prefix)
+        self._suggest_worker.done.connect(self._show_suggestions)
+        self._suggest_worker.start()
+
+    def _show_suggestions(self, prefix: str, items: list):
+        # תשובה ישנה (המשתמש כבר הקליד משהו אחר) – מתעלמים
+        if prefix != self.q.text().strip() or not items:
+            return
+        self._suggest_model.setStringList(items)
+        self._completer.complete()
+
     def open_recipe(self, rid: str):
         # אם יש callback מה־MainWindow – נשתמש בו; אחרת פולבאק לדיאלוג
         if callable(self._open_recipe_cb):
@@ -1,19 +1,58 @@
-from fastapi import APIRouter
+import asyncio
+import json
+import logging
+import os
+import time
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from services.ollama_client import ollama_generate
+from services import ai_policy, answer_cache, chat_sessions, llm_telemetry, recipe_vectors, suggested_questions
+from services.ollama_client import ollama_generate_stream
 from services.external_recipe_service import get_external_recipe_by_id
+from services.ollama_scheduler import BACKGROUND, INTERACTIVE, SchedulerBusy, scheduler
+from services.single_flight import SingleFlight
+from dependencies import get_requester_key
+
+log = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# אותה שאלה שנשאלת במקביל (לפני שהתשובה נכנסה ל-cache) מייצרת תשובה אחת
+_flight = SingleFlight()
+
+# זמן מקסימלי לתשובה (כולל המתנה בתור); אחריו היצירה מבוטלת
+CHAT_DEADLINE_SEC = float(os.getenv("AI_CHAT_DEADLINE_SEC", "90"))
+# כל כמה זמן בודקים אם הלקוח של /chat עדיין מחובר
+DISCONNECT_POLL_SEC = 0.5
+# ב-/chat/stream: שורת "עדיין מחכים" כשאין טוקן חדש במשך הזמן הזה (בתור / ב-prefill)
+HEARTBEAT_SEC = float(os.getenv("AI_STREAM_HEARTBEAT_SEC", "1"))
+_WAITING_LINE = json.dumps({"waiting": True}) + "\n"
+
+# יצירות שבוטלו באמצע (הלקוח התנתק / עבר הזמן) וכמה טוקנים כבר נוצרו בהן לשווא
+CANCEL_STATS = {"client_disconnects": 0, "deadlines": 0, "cancelled_generations": 0, "wasted_tokens": 0}
+
+# יצירה מראש של תשובות לשאלות המוצעות (בעדיפות רקע, רק כש-Ollama פנוי)
+PREFETCH_ENABLED = os.getenv("AI_PREFETCH", "1") == "1"
+PREFETCH_STATS = {"scheduled": 0, "generated": 0, "stopped_busy": 0, "preempted": 0, "superseded": 0}
+# prefetch אחד לכל משתמש: user → (recipe_id, task); פתיחת מתכון אחר מבטלת את הקודם
+_prefetch_tasks: dict[str, tuple[str, asyncio.Task]] = {}
+
+# עדיף באנגלית כדי להתאים ל־UI
+SYSTEM_PROMPT = "You are a professional cooking assistant. Answer briefly, clearly and practically."
+
 class ChatReq(BaseModel):
     recipe_id: str | None = None
     question: str
+    # שיחה קיימת (מהתשובה הקודמת); בלי מזהה נפתחת שיחה חדשה
+    session_id: str | None = None
 
-@router.post("/chat")
-async def chat(req: ChatReq):
+async def _recipe_context(recipe_id: str | None, budget_tokens: int) -> str:
+    """המתכון ל-prompt, מקוצר לתקציב: קודם הכותרת והרכיבים, ומה שנשאר – לשלבים"""
     ctx = ""
-    if req.recipe_id:
-        rec = get_external_recipe_by_id(req.recipe_id)
+    if recipe_id:
+        rec = await get_external_recipe_by_id(recipe_id)
         if rec:
             title = rec.get("title", "")
             ingredients = rec.get("ingredients") or []  # list[dict]
@@ -25,9 +64,399 @@ async def chat(req: ChatReq):
             )
             steps_txt = " ".join(steps) if isinstance(steps, list) else str(steps)
 
-            ctx = f"Recipe: {title}\nIngredients: {ing_txt}\nSteps: {steps_txt}\n\n"
+            title_line = f"Recipe: {title}"
+            if chat_sessions.estimate_tokens(title_line) > budget_tokens:
+                return ""   # אפילו הכותרת לא נכנסת – בלי בלוק הקשר בכלל
+            head = ai_policy.fit(f"{title_line}\nIngredients: {ing_txt}", budget_tokens)
+            steps_txt = ai_policy.fit(steps_txt, budget_tokens - chat_sessions.estimate_tokens(head) - 2)
+            ctx = f"{head}\nSteps: {steps_txt}\n\n" if steps_txt else head + "\n\n"
+    return ctx
+
+async def _build_prompt(req: ChatReq, session: dict, policy: ai_policy.Policy) -> tuple[str, list[int] | None]:
+    """
+    (prompt, context): בהמשך שיחה שה-context שלה עדיין תקף – רק השאלה החדשה;
+    אחרת מתכון + היסטוריה מקוצרת + השאלה, כשההקשר מקוצר כדי שהכל ייכנס ל-num_ctx של המדיניות.
+    """
+    context = chat_sessions.reusable_context(session, req.question, policy.model, policy.num_ctx, policy.num_predict)
+    if context:
+        return req.question, context
+    history = chat_sessions.history_prompt(session)
+    budget = policy.context_budget(chat_sessions.estimate_tokens(history) + chat_sessions.estimate_tokens(req.question))
+    if req.recipe_id:
+        ctx = await _recipe_context(req.recipe_id, budget)
+    elif recipe_vectors.RAG_ENABLED:
+        # צ'אט כללי: מעגנים את התשובה במתכונים הקרובים מהמאגר
+        ctx = ai_policy.fit((await recipe_vectors.recipe_vectors.context_for(req.question)).strip(), budget - 1)
+        # רק אם נכנס לפחות חלק ממתכון אחד (ולא רק שורת הכותרת), עם המפריד מהשאלה
+        ctx = ctx + "\n\n" if ctx.partition("\n")[2].strip() else ""
+    else:
+        ctx = ""
+    return ctx + history + req.question, None
+
+async def _cached_answer(req: ChatReq) -> dict | None:
+    # תשובה שמורה מכל מודל שהמדיניות משתמשת בו (קודם הגדול)
+    return await answer_cache.lookup_any(ai_policy.models(), SYSTEM_PROMPT, req.recipe_id, req.question)
+
+async def _store_answer(req: ChatReq, policy: ai_policy.Policy, final: dict, answer: str):
+    # נשמרת רק תשובה שלמה: Ollama שלח את שורת done (ולא סגר את ה-stream באמצע), היא לא ריקה,
+    # ולא נקטעה ב-num_predict – אחרת היא הייתה מוגשת מה-cache לכל מי ששואל אחר כך
+    if final.get("done") and answer.strip() and final.get("done_reason") != "length":
+        await answer_cache.store(policy.model, SYSTEM_PROMPT, req.recipe_id, req.question, answer)
+
+def _busy(e: SchedulerBusy) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+
+def _record_cancelled(tokens: int):
+    CANCEL_STATS["cancelled_generations"] += 1
+    CANCEL_STATS["wasted_tokens"] += tokens
+    log.info("ai generation cancelled after %s tokens", tokens)
+
+class _Preempted(Exception):
+    """יצירה ספקולטיבית שנעצרה כי משתמש מחכה בתור"""
+
+async def _collect(prompt: str, context: list[int] | None, policy: ai_policy.Policy, progress: dict,
+                   should_stop=None) -> dict:
+    """
+    יצירה במצב stream גם כשהלקוח מקבל תשובה אחת: כך ביטול סוגר את החיבור ל-Ollama
+    (והיצירה שם נעצרת), ו-progress יודע כמה טוקנים כבר נוצרו.
+    should_stop נבדק בכל חלק; אם הוא מחזיר True היצירה נעצרת ב-_Preempted.
+    """
+    parts = []
+    chunks = ollama_generate_stream(prompt=prompt, system=SYSTEM_PROMPT, temperature=0.3, context=context,
+                                    model=policy.model, num_predict=policy.num_predict, num_ctx=policy.num_ctx)
+    try:
+        async for chunk in chunks:
+            if chunk.get("response"):
+                parts.append(chunk["response"])
+                progress["tokens"] += 1
+            if chunk.get("done"):
+                return {**chunk, "response": "".join(parts)}
+            if should_stop is not None and should_stop():
+                raise _Preempted()
+    finally:
+        await chunks.aclose()
+    return {"response": "".join(parts)}
+
+async def _until_disconnected(request: Request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SEC)
+
+@router.post("/chat")
+async def chat(req: ChatReq, request: Request, user: str = Depends(get_requester_key)):
+    llm_telemetry.set_route("/ai/chat")
+    session = chat_sessions.open_session(req.session_id, user, req.recipe_id)
+    # רק שאלה ראשונה בשיחה לא תלויה בהיסטוריה – רק עליה עונים מה-cache
+    first = not session["turns"]
+    if first:
+        hit = await _cached_answer(req)
+        if hit:
+            chat_sessions.record_turn(session, req.question, hit["answer"])
+            return {"answer": hit["answer"], "cached": True, "session_id": session["id"], "policy": None}
+    # המודל והאורכים נבחרים לפי העומס ברגע הכניסה לתור
+    policy = ai_policy.choose()
+
+    async def _generate():
+        prompt, context = await _build_prompt(req, session, policy)
+        progress = {"tokens": 0}
+        try:
+            async with scheduler.slot(user, INTERACTIVE):
+                result = await _collect(prompt, context, policy, progress)
+        except asyncio.CancelledError:
+            # יציאה מה-slot כבר שחררה את המקום בתור וסגרה את החיבור ל-Ollama
+            _record_cancelled(progress["tokens"])
+            raise
+        if first:
+            await _store_answer(req, policy, result, result["response"])
+        return result
+
+    if first:
+        key = answer_cache.make_key(policy.model, SYSTEM_PROMPT, req.recipe_id, req.question)
+        # שאלה זהה של כמה לקוחות: היצירה מבוטלת רק כשכולם התנתקו
+        work = asyncio.create_task(_flight.do(key, _generate, cancel_abandoned=True))
+    else:
+        work = asyncio.create_task(_generate())
+    watch = asyncio.create_task(_until_disconnected(request))
+    await asyncio.wait({work, watch}, timeout=CHAT_DEADLINE_SEC, return_when=asyncio.FIRST_COMPLETED)
+    watch.cancel()
+    if not work.done():
+        work.cancel()
+        await asyncio.gather(work, return_exceptions=True)
+        if watch.done() and not watch.cancelled():
+            CANCEL_STATS["client_disconnects"] += 1
+            return None   # אין למי להחזיר
+        CANCEL_STATS["deadlines"] += 1
+        raise HTTPException(status_code=504, detail="AI answer took too long")
+    try:
+        result = work.result()
+    except SchedulerBusy as e:
+        raise _busy(e)
+    chat_sessions.record_turn(session, req.question, result["response"], result.get("context"), policy.model)
+    return {"answer": result["response"], "cached": False, "session_id": session["id"], "policy": policy._asdict()}
+
+# -------- תשובה בהזרמה (NDJSON) --------
+# כל שורה היא JSON: {"token": "..."} לכל חלק של התשובה ({"waiting": true} כשעוד אין), ובסוף
+# {"done": true, "session_id": ..., "ttft_ms": ..., "total_ms": ..., "policy": ...} (או {"error": "..."} אם Ollama נכשל באמצע)
+@router.post("/chat/stream")
+async def chat_stream(req: ChatReq, user: str = Depends(get_requester_key)):
+    llm_telemetry.set_route("/ai/chat/stream")
+    started = time.perf_counter()
+    session = chat_sessions.open_session(req.session_id, user, req.recipe_id)
+    first = not session["turns"]
+    hit = await _cached_answer(req) if first else None
+    if hit:
+        # תשובה שמורה יוצאת כחלק אחד
+        chat_sessions.record_turn(session, req.question, hit["answer"])
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        lines = [
+            json.dumps({"token": hit["answer"]}, ensure_ascii=False) + "\n",
+            json.dumps({"done": True, "cached": True, "session_id": session["id"],
+                        "ttft_ms": elapsed_ms, "total_ms": elapsed_ms, "policy": None}) + "\n",
+        ]
+        return StreamingResponse(iter(lines), media_type="application/x-ndjson")
+
+    # שאלה מוצעת שהתשובה לה נוצרת כרגע מראש (_prefetch): מצטרפים ליצירה במקום להתחיל חדשה
+    shared_key = next((key for key in (answer_cache.make_key(m, SYSTEM_PROMPT, req.recipe_id, req.question)
+                                       for m in ai_policy.models()) if _flight.running(key)), None) if first else None
+    policy = ai_policy.choose()
+    prompt, context = await _build_prompt(req, session, policy)
+    # דחייה מיידית חוזרת כ-429/503 רגיל; ההמתנה בתור עצמה כבר בתוך ההזרמה
+    if not shared_key:
+        try:
+            scheduler.check(user, INTERACTIVE)
+        except SchedulerBusy as e:
+            raise _busy(e)
+
+    async def _prefetched() -> dict | None:
+        # היצירה מראש הסתיימה בין הבדיקה להצטרפות – התשובה כבר ב-cache
+        hit = await _cached_answer(req)
+        return {"response": hit["answer"]} if hit else None
+
+    async def _events():
+        if shared_key:
+            shared = asyncio.ensure_future(_flight.do(shared_key, _prefetched))
+            try:
+                while not shared.done():
+                    done, _ = await asyncio.wait({shared}, timeout=HEARTBEAT_SEC)
+                    if not done:
+                        yield _WAITING_LINE
+            except (asyncio.CancelledError, GeneratorExit):
+                CANCEL_STATS["client_disconnects"] += 1
+                raise
+            finally:
+                # ממתין נוסף לא מבטל את היצירה מראש (היא עצמה עדיין ממתינה לה)
+                if not shared.done():
+                    shared.cancel()
+            result = None if shared.cancelled() or shared.exception() else shared.result()
+            if result and result.get("response"):
+                # כמו תשובה שמורה: חלק אחד
+                chat_sessions.record_turn(session, req.question, result["response"])
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                yield json.dumps({"token": result["response"]}, ensure_ascii=False) + "\n"
+                yield json.dumps({"done": True, "cached": True, "session_id": session["id"],
+                                  "ttft_ms": elapsed_ms, "total_ms": elapsed_ms, "policy": None}) + "\n"
+                return
+            # היצירה מראש נעצרה או נכשלה – עונים כרגיל
+
+        ttft_ms = None
+        parts = []
+        final = {}
+        ticket = None
+        chunks = None
+        pending = acquiring = asyncio.ensure_future(scheduler.acquire(user, INTERACTIVE))
+        try:
+            # בזמן ההמתנה בתור וב-prefill יוצאת שורת {"waiting": true} כל HEARTBEAT_SEC,
+            # כך שלקוח שביטל סוגר את החיבור מיד – ולא רק כשמגיע הטוקן הראשון
+            while ticket is None:
+                done, _ = await asyncio.wait({acquiring}, timeout=HEARTBEAT_SEC)
+                if not done:
+                    yield _WAITING_LINE
+                    continue
+                ticket = acquiring.result()
+            pending = None
+            chunks = ollama_generate_stream(prompt=prompt, system=SYSTEM_PROMPT, temperature=0.3, context=context,
+                                            model=policy.model, num_predict=policy.num_predict, num_ctx=policy.num_ctx)
+            while True:
+                # הדדליין חל גם על ההמתנה לטוקן הבא (למשל prefill ארוך)
+                remaining = CHAT_DEADLINE_SEC - (time.perf_counter() - started)
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                if pending is None:
+                    pending = asyncio.ensure_future(anext(chunks))
+                done, _ = await asyncio.wait({pending}, timeout=min(HEARTBEAT_SEC, remaining))
+                if not done:
+                    yield _WAITING_LINE
+                    continue
+                chunk, pending = pending.result(), None
+                token = chunk.get("response") or ""
+                if token:
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                    parts.append(token)
+                    yield json.dumps({"token": token}, ensure_ascii=False) + "\n"
+                if chunk.get("done"):
+                    final = chunk
+                    break
+        except StopAsyncIteration:
+            pass
+        except SchedulerBusy as e:
+            # חיכה בתור יותר מ-OLLAMA_QUEUE_MAX_WAIT
+            yield json.dumps({"error": e.reason, "retry_after": e.retry_after}) + "\n"
+            return
+        except asyncio.TimeoutError:
+            CANCEL_STATS["deadlines"] += 1
+            _record_cancelled(len(parts))
+            yield json.dumps({"error": "AI answer took too long"}) + "\n"
+            return
+        except httpx.HTTPError as e:
+            log.warning("ollama stream failed: %s", e)
+            yield json.dumps({"error": str(e) or e.__class__.__name__}) + "\n"
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            # הלקוח סגר את החיבור – בתור או באמצע ההזרמה
+            CANCEL_STATS["client_disconnects"] += 1
+            if chunks is not None:
+                _record_cancelled(len(parts))
+            raise
+        finally:
+            # קודם הניקוי הסינכרוני: בביטול (anyio) כל await כאן מבוטל שוב מיד.
+            # ביטול מה שעוד מחכה (מקום בתור / החלק הבא מ-Ollama) סוגר גם את החיבור ל-Ollama
+            if pending is not None and not pending.done():
+                pending.cancel()
+            if ticket is None and acquiring.done() and not acquiring.cancelled() and not acquiring.exception():
+                ticket = acquiring.result()   # המקום הוקצה בדיוק ברגע הביטול
+            if ticket is not None:
+                scheduler.release(ticket)
+            if chunks is not None:
+                try:
+                    await chunks.aclose()
+                except (RuntimeError, asyncio.CancelledError):
+                    pass   # המחולל עוד נסגר בתוך ה-task שבוטל
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        log.info("ai stream: ttft %sms, total %sms, policy %s", ttft_ms, total_ms, policy.level)
+        answer = "".join(parts)
+        chat_sessions.record_turn(session, req.question, answer, final.get("context"), policy.model)
+        if first:
+            await _store_answer(req, policy, final, answer)
+        queue_ms = round((ticket.started_at - ticket.enqueued_at) * 1000, 1)
+        yield json.dumps({"done": True, "cached": False, "session_id": session["id"], "ttft_ms": ttft_ms,
+                          "total_ms": total_ms, "queue_ms": queue_ms, "policy": policy._asdict()}) + "\n"
+
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+
+# -------- שאלות מוצעות + יצירה מראש של התשובות --------
+async def _is_cached(recipe_id: str, question: str) -> bool:
+    for model in ai_policy.models():
+        if await answer_cache.contains(model, SYSTEM_PROMPT, recipe_id, question):
+            return True
+    return False
+
+async def _prefetch(recipe_id: str, questions: list[str]):
+    """
+    מייצר בזו אחר זו תשובות לשאלות שעוד אין להן תשובה שמורה, בעדיפות רקע.
+    עוצר כשמשתמש מחכה בתור (גם באמצע יצירה – אלא אם מישהו כבר מחכה לאותה תשובה).
+    """
+    llm_telemetry.set_route("prefetch")
+    # שאלה ראשונה בלי היסטוריה – _build_prompt צריך רק את השדות האלה
+    no_session = {"context": None, "turns": 0}
+    for question in questions:
+        if await _is_cached(recipe_id, question):
+            continue
+        if scheduler.interactive_busy():
+            PREFETCH_STATS["stopped_busy"] += 1
+            return
+        policy = ai_policy.choose()
+        req = ChatReq(recipe_id=recipe_id, question=question)
+        key = answer_cache.make_key(policy.model, SYSTEM_PROMPT, recipe_id, question)
+
+        async def _generate(req=req, policy=policy, key=key):
+            prompt, _ = await _build_prompt(req, no_session, policy)
+            async with scheduler.slot("prefetch", BACKGROUND):
+                result = await _collect(prompt, None, policy, {"tokens": 0},
+                                        should_stop=lambda: scheduler.interactive_busy() and _flight.waiters(key) <= 1)
+            await _store_answer(req, policy, result, result["response"])
+            return result
+
+        try:
+            # דרך אותו SingleFlight של /chat: משתמש ששואל את השאלה באמצע מצטרף ליצירה הזו
+            await _flight.do(key, _generate, cancel_abandoned=True)
+        except SchedulerBusy:
+            PREFETCH_STATS["stopped_busy"] += 1
+            return
+        except _Preempted:
+            PREFETCH_STATS["preempted"] += 1
+            return
+        except httpx.HTTPError as e:
+            log.warning("answer prefetch failed: %s", e)
+            return
+        PREFETCH_STATS["generated"] += 1
+
+def cancel_prefetches():
+    """נקרא ב-shutdown, לפני שהלקוח ל-Ollama נסגר"""
+    for _, task in _prefetch_tasks.values():
+        task.cancel()
+
+@router.get("/suggestions/{recipe_id}")
+async def suggestions(recipe_id: str, user: str = Depends(get_requester_key)):
+    """
+    שאלות מוצעות למתכון; ready = יש כבר תשובה שמורה. לשאלות בלי תשובה מתחילה
+    יצירה מראש ברקע, והתשובה לא מחכה לה.
+    """
+    llm_telemetry.set_route("/ai/suggestions")
+    recipe = await get_external_recipe_by_id(recipe_id)
+    if not recipe:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    questions = [{"question": q, "ready": await _is_cached(recipe_id, q)}
+                 for q in suggested_questions.suggestions_for(recipe_id, recipe)]
+    pending = [q["question"] for q in questions if not q["ready"]]
+    prefetching = PREFETCH_ENABLED and bool(pending)
+    previous = _prefetch_tasks.get(user)
+    if prefetching and previous and previous[0] == recipe_id:
+        pass   # אותו מתכון שוב – ה-prefetch שכבר רץ ממשיך
+    elif prefetching:
+        if previous:
+            previous[1].cancel()
+            PREFETCH_STATS["superseded"] += 1
+        task = asyncio.create_task(_prefetch(recipe_id, pending))
+        _prefetch_tasks[user] = (recipe_id, task)
+
+        def _forget(t: asyncio.Task, user=user):
+            if user in _prefetch_tasks and _prefetch_tasks[user][1] is t:
+                del _prefetch_tasks[user]
+        task.add_done_callback(_forget)
+        PREFETCH_STATS["scheduled"] += 1
+    return {"recipe_id": recipe_id, "questions": questions, "prefetching": prefetching}
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    return {**answer_cache.stats(), "single_flight": _flight.stats, "inflight": _flight.inflight(),
+            "prefetch": {**PREFETCH_STATS, "running": len(_prefetch_tasks)}}
+
+
+@router.get("/queue/stats")
+def queue_stats():
+    return {**scheduler.snapshot(), "cancellation": CANCEL_STATS}
+
+
+@router.get("/sessions/stats")
+def sessions_stats():
+    return chat_sessions.stats()
+
+
+@router.get("/rag/stats")
+def rag_stats():
+    return recipe_vectors.recipe_vectors.stats()
+
+
+@router.get("/policy/stats")
+def policy_stats():
+    return ai_policy.stats()
+
 
-    # עדיף באנגלית כדי להתאים ל־UI
-    sys = "You are a professional cooking assistant. Answer briefly, clearly and practically."
-    answer = await ollama_generate(prompt=ctx + req.question, system=sys, temperature=0.3)
-    return {"answer": answer}
+@router.get("/metrics")
+def metrics(format: str = "json"):
+    """טוקנים ומשכי זמן של הקריאות ל-Ollama לפי route ומודל (format=prometheus לטקסט של Prometheus)"""
+    if format == "prometheus":
+        return PlainTextResponse(llm_telemetry.prometheus())
+    return llm_telemetry.snapshot()
@@ -1,20 +1,146 @@
 """exposes GET /recipes/external endpoint to search recipes from TheMealDB via external_recipe_service"""
 
-from fastapi import APIRouter, Query
-from services.external_recipe_service import get_external_recipes, get_external_recipe_by_id
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from schemas.recipe import RecipeSummary, RecipeDetail
+from services.external_recipe_service import (
+    get_external_recipes, get_external_recipe_by_id, get_external_recipes_by_ids, flight_stats,
+)
 from services.cloudinary_service import cloudinary_service
+from services import recipe_cache, corpus_mirror, recipe_index, recipe_derivation, measure_parser
+from services.ingredient_index import ingredient_index, MODES
+from services.fuzzy_index import fuzzy_index
+from services.suggest_index import suggest_index
+from services.similar_recipes import similar_recipes
+from services.nutrition_service import nutrition_service
 
 router = APIRouter()
 
+# מקסימום מזהים בבקשת batch אחת
+MAX_BATCH_IDS = 50
+
+class BatchReq(BaseModel):
+    ids: list[str]
+
+# שדות ברירת המחדל בתוצאות חיפוש (מה ש-RecipeCard צריך) ומה מותר לבקש דרך fields=
+SUMMARY_FIELDS = tuple(RecipeSummary.model_fields)
+DETAIL_FIELDS = tuple(RecipeDetail.model_fields)
+
+def _parse_fields(fields: str | None) -> tuple[str, ...]:
+    if not fields:
+        return SUMMARY_FIELDS
+    if fields.strip() == "*":
+        return DETAIL_FIELDS
+    keys = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [k for k in keys if k not in DETAIL_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # בלי id אי אפשר לפתוח את המתכון
+    return keys if "id" in keys else ("id",) + keys
+
+def _project(recipe: dict, keys: tuple[str, ...]) -> dict:
+    return {k: recipe.get(k) for k in keys}
+
 # היה: @router.get("/recipes/external")
 @router.get("/external")
-def fetch_external_recipes(q: str = Query(...)):
-    return get_external_recipes(q)
+async def fetch_external_recipes(q: str = Query(...),
+                                 fields: str | None = Query(default=None, description="comma separated, or * for full detail"),
+                                 limit: int = Query(default=50, ge=1, le=200),
+                                 offset: int = Query(default=0, ge=0)):
+    """
+    חיפוש מתכונים. מחזיר RecipeSummary (id, title, image, nutrition, tags) כברירת מחדל;
+    פרטים מלאים נשארים ב-/external/{rid}. סה"כ התוצאות ב-header X-Total-Count,
+    וה-offset של העמוד הבא (אם יש) ב-X-Next-Offset.
+    """
+    keys = _parse_fields(fields)
+    total, page = await get_external_recipes(q, limit, offset)
+    headers = {"X-Total-Count": str(total)}
+    if offset + len(page) < total:
+        headers["X-Next-Offset"] = str(offset + len(page))
+    # JSONResponse ישירות: התוצאה כבר dict פשוט, אין צורך ב-jsonable_encoder
+    return JSONResponse([_project(r, keys) for r in page], headers=headers)
+
+# שליפת כמה מתכונים בבקשה אחת (חייב להופיע לפני /external/{rid})
+@router.get("/external/batch")
+async def fetch_external_recipes_batch(ids: str = Query(..., description="comma separated recipe ids")):
+    return await _batch([i for i in ids.split(",") if i.strip()])
+
+@router.post("/external/batch")
+async def fetch_external_recipes_batch_post(req: BatchReq):
+    return await _batch(req.ids)
+
+async def _batch(ids: list[str]):
+    if not ids:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many ids (max {MAX_BATCH_IDS})")
+    return await get_external_recipes_by_ids(ids)
 
 # היה: @router.get("/recipes/external/{rid}")
 @router.get("/external/{rid}")
-def fetch_external_recipe_by_id(rid: str):
-    return get_external_recipe_by_id(rid)
+async def fetch_external_recipe_by_id(rid: str):
+    rec = await get_external_recipe_by_id(rid)
+    if rec:
+        suggest_index.record_view(rid)
+    return rec
+
+# השלמה אוטומטית בזמן הקלדה (כותרות, רכיבים ותגיות)
+@router.get("/suggest")
+def fetch_suggestions(prefix: str = Query(..., min_length=1, max_length=80),
+                      limit: int = Query(default=8, ge=1, le=10)):
+    return suggest_index.suggest(prefix, limit)
+
+# "מה יש לי במקרר": חיפוש מתכונים לפי רשימת רכיבים (items=chicken,rice,onion)
+@router.get("/by-ingredients")
+def fetch_recipes_by_ingredients(items: str = Query(..., min_length=1),
+                                 mode: str = Query(default="weighted", pattern="^(" + "|".join(MODES) + ")$"),
+                                 limit: int = Query(default=20, ge=1, le=100)):
+    pantry = [p.strip() for p in items.split(",") if p.strip()]
+    ranked = ingredient_index.search(pantry, mode=mode, limit=limit)
+    recipes = recipe_index.get_many([r["id"] for r in ranked])
+    return [
+        {**recipes[r["id"]], "matched": r["matched"], "missing_count": r["missing_count"], "score": r["score"]}
+        for r in ranked if r["id"] in recipes
+    ]
+
+# מתכונים דומים לפי רכיבים (TF-IDF + קוסינוס). פונקציה סינכרונית: בנייה ראשונה רצה ב-threadpool
+@router.get("/{rid}/similar")
+def fetch_similar_recipes(rid: str, limit: int = Query(default=8, ge=1, le=12)):
+    ranked = similar_recipes.similar(rid, limit)
+    recipes = recipe_index.get_many([r["id"] for r in ranked])
+    return [
+        {**_project(recipes[r["id"]], SUMMARY_FIELDS), "score": r["score"]}
+        for r in ranked if r["id"] in recipes
+    ]
+
+# מוני hit/miss/stale של ה-cache מול TheMealDB, ומצב האינדקסים שבזיכרון
+@router.get("/cache/stats")
+def get_cache_stats():
+    return {
+        **recipe_cache.stats(),
+        "single_flight": flight_stats(),
+        "derivation": recipe_derivation.stats(),
+        "nutrition": nutrition_service.stats(),
+        "measures": measure_parser.cache_stats(),
+        "indexes": {
+            "ingredient": ingredient_index.stats(),
+            "fuzzy": fuzzy_index.stats(),
+            "suggest": suggest_index.stats(),
+            "similar": similar_recipes.stats(),
+        },
+    }
+
+# סנכרון מלא/מצטבר של הקטלוג למאגר המקומי ברקע
+@router.post("/mirror")
+async def start_mirror(concurrency: int = Query(default=corpus_mirror.DEFAULT_CONCURRENCY, ge=1, le=32),
+                       fresh: bool = Query(default=False)):
+    started = corpus_mirror.start_background_mirror(concurrency, fresh)
+    return {"started": started, **corpus_mirror.status()}
+
+@router.get("/mirror/status")
+def get_mirror_status():
+    return corpus_mirror.status()
 
 # הוספה חדשה: endpoint ללוגו
 @router.get("/logo")
@@ -0,0 +1,59 @@
+"""
+מדידת זמני שאילתה של האינדקס ההפוך (/recipes/by-ingredients) על קורפוס סינתטי.
+
+    python -m benchmarks.bench_ingredient_index --recipes 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# לא נוגעים במאגר האמיתי
+os.environ.setdefault("STORE_DB_PATH", os.path.join(tempfile.gettempdir(), "foodgenius_bench.db"))
+
+from services.ingredient_index import IngredientIndex  # noqa: E402
+
+
+def synthetic_corpus(n: int, vocab: int = 2000, seed: int = 7):
+    rnd = random.Random(seed)
+    names = [f"ingredient {i}" for i in range(vocab)]
+    # התפלגות זיפפית: מעט רכיבים נפוצים מאוד (מלח, שמן) והרבה נדירים
+    weights = [1.0 / (i + 1) for i in range(vocab)]
+    for rid in range(n):
+        k = rnd.randint(5, 20)
+        picked = set(rnd.choices(names, weights=weights, k=k))
+        yield {"id": str(rid), "ingredients": [{"name": p} for p in picked]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = list(synthetic_corpus(args.recipes))
+    idx = IngredientIndex()
+    t0 = time.perf_counter()
+    idx.add_many(corpus)
+    idx._built = True
+    print(f"build: {args.recipes} recipes in {time.perf_counter() - t0:.2f}s ({idx.stats()['ingredients']} ingredients)")
+
+    rnd = random.Random(1)
+    for mode in ("weighted", "most", "all"):
+        for pantry_size in (3, 8):
+            timings = []
+            for _ in range(args.queries):
+                pantry = [f"ingredient {rnd.randint(0, 300)}" for _ in range(pantry_size)]
+                t = time.perf_counter()
+                idx.search(pantry, mode=mode, limit=20)
+                timings.append((time.perf_counter() - t) * 1000)
+            timings.sort()
+            p50 = timings[len(timings) // 2]
+            p95 = timings[int(len(timings) * 0.95)]
+            print(f"{mode:8s} pantry={pantry_size}: p50 {p50:.2f}ms  p95 {p95:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
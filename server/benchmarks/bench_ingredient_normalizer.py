@@ -0,0 +1,93 @@
+"""
+קצב נרמול שמות רכיבים (Aho-Corasick) לכל מיליון שורות רכיב, מול לולאת substring נאיבית.
+
+    python -m benchmarks.bench_ingredient_normalizer --lines 1000000
+"""
+
+import argparse
+import csv
+import random
+import time
+
+from services.ingredient_normalizer import (
+    ALIASES_PATH, FOOD_TABLE_PATH, canonical_ingredient, get_matcher, normalize_ingredient,
+)
+
+_PREFIXES = ["", "", "", "fresh ", "large ", "2 ", "finely chopped ", "organic ", "smoked ", "dried "]
+_SUFFIXES = ["", "", "", "s", ", chopped", ", to serve", " (optional)", ", finely sliced"]
+
+
+def vocabulary() -> list[str]:
+    names = []
+    for path, columns in ((ALIASES_PATH, ("canonical",)), (FOOD_TABLE_PATH, ("name",))):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                names.extend(row[c] for c in columns)
+                names.extend(row["aliases"].split("|"))
+    # שמות שלא במילון (פירות/מוצרים נדירים) – עוברים את כל האוטומט בלי התאמה
+    names += [f"unknown item {i}" for i in range(200)]
+    return names
+
+
+def synthetic_lines(n: int, seed: int = 11) -> list[str]:
+    rnd = random.Random(seed)
+    vocab = vocabulary()
+    return [
+        f"{rnd.choice(_PREFIXES)}{rnd.choice(vocab)}{rnd.choice(_SUFFIXES)}".title()
+        for _ in range(n)
+    ]
+
+
+def naive_match(name: str, keys: list[str]) -> str:
+    """הגישה הישנה: `if key in name` על כל המפתחות, ההתאמה הראשונה מנצחת"""
+    low = name.lower()
+    for key in keys:
+        if key in low:
+            return key
+    return ""
+
+
+def per_million(seconds: float, n: int) -> float:
+    return seconds / n * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--naive-lines", type=int, default=100_000)
+    args = parser.parse_args()
+
+    lines = synthetic_lines(args.lines)
+    t = time.perf_counter()
+    matcher = get_matcher()
+    print(f"automaton: {len(matcher)} states, built in {(time.perf_counter() - t) * 1000:.1f}ms")
+
+    # בלי cache של canonical_ingredient: כל שורה עוברת את האוטומט (הניקוי הטקסטואלי נשאר עם ה-cache שלו)
+    normalize_ingredient.cache_clear()
+    raw = canonical_ingredient.__wrapped__
+    t = time.perf_counter()
+    for line in lines:
+        raw(line)
+    cold = time.perf_counter() - t
+    print(f"aho-corasick uncached: {per_million(cold, len(lines)):.2f}s per 1M lines ({len(lines) / cold:,.0f} lines/s)")
+
+    canonical_ingredient.cache_clear()
+    t = time.perf_counter()
+    for line in lines:
+        canonical_ingredient(line)
+    warm = time.perf_counter() - t
+    info = canonical_ingredient.cache_info()
+    print(f"aho-corasick cached:   {per_million(warm, len(lines)):.2f}s per 1M lines "
+          f"({info.hits / max(info.hits + info.misses, 1):.0%} hit rate)")
+
+    keys = sorted({normalize_ingredient(n) for n in vocabulary()[:-200]})
+    sample = lines[:args.naive_lines]
+    t = time.perf_counter()
+    for line in sample:
+        naive_match(line, keys)
+    naive = time.perf_counter() - t
+    print(f"naive substring loop:  {per_million(naive, len(sample)):.2f}s per 1M lines ({len(keys)} keys)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+בדיקת מפענח הכמויות מול קורפוס "זהב" של strMeasure אמיתיים מ-TheMealDB, ומדידת קצב פענוח.
+
+    python -m benchmarks.bench_measure_parser --rounds 2000
+
+יוצא עם קוד שגיאה אם פענוח כלשהו שונה מהצפוי ב-benchmarks/data/measures_golden.json.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+from services.measure_parser import parse_measure, density_for
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "data", "measures_golden.json")
+
+
+def check_golden(cases: list[dict]) -> int:
+    failures = 0
+    for case in cases:
+        got = parse_measure(case["measure"], case["ingredient"])._asdict()
+        bad = [
+            k for k in ("quantity", "quantity_max", "unit", "kind", "grams")
+            if not _same(got[k], case[k])
+        ]
+        if bad:
+            failures += 1
+            print(f"MISMATCH {case['measure']!r} / {case['ingredient']!r}: "
+                  + ", ".join(f"{k} expected {case[k]!r} got {got[k]!r}" for k in bad))
+    print(f"golden: {len(cases) - failures}/{len(cases)} ok")
+    return failures
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, (int, float)):
+        return math.isclose(a, b, rel_tol=1e-6, abs_tol=1e-6)
+    return a == b
+
+
+def bench(cases: list[dict], rounds: int):
+    pairs = [(c["measure"], c["ingredient"]) for c in cases]
+
+    # בלי cache: כל קריאה עוברת את כל הביטויים הרגולריים
+    t = time.perf_counter()
+    for _ in range(rounds):
+        parse_measure.cache_clear()
+        density_for.cache_clear()
+        for m, i in pairs:
+            parse_measure(m, i)
+    cold = (time.perf_counter() - t) / (rounds * len(pairs)) * 1e6
+
+    # עם cache: כמו בשרת, שבו אותם צירופים חוזרים במתכונים רבים
+    t = time.perf_counter()
+    for _ in range(rounds):
+        for m, i in pairs:
+            parse_measure(m, i)
+    warm = (time.perf_counter() - t) / (rounds * len(pairs)) * 1e6
+    print(f"parse: cold {cold:.2f}µs/measure ({1e6 / cold:,.0f}/s) | cached {warm:.3f}µs/measure ({1e6 / warm:,.0f}/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        cases = json.load(f)
+    failures = check_golden(cases)
+    bench(cases, args.rounds)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
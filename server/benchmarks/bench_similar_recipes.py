@@ -0,0 +1,57 @@
+"""
+מדידת בנייה ושאילתות של "מתכונים דומים" (/recipes/{rid}/similar) על קורפוס סינתטי.
+
+    python -m benchmarks.bench_similar_recipes --recipes 10000 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# לא נוגעים במאגר האמיתי
+os.environ.setdefault("STORE_DB_PATH", os.path.join(tempfile.gettempdir(), "foodgenius_bench.db"))
+
+from benchmarks.bench_ingredient_index import synthetic_corpus  # noqa: E402
+from services.similar_recipes import SimilarRecipes  # noqa: E402
+
+
+def run(n: int, queries: int):
+    corpus = list(synthetic_corpus(n))
+    sim = SimilarRecipes()
+    t0 = time.perf_counter()
+    sim.build(corpus)
+    build = time.perf_counter() - t0
+
+    rnd = random.Random(3)
+    first, pre, live = [], [], []
+    for _ in range(queries):
+        r = corpus[rnd.randrange(n)]
+        t = time.perf_counter()
+        sim.similar(r["id"], 8)
+        first.append((time.perf_counter() - t) * 1000)
+        t = time.perf_counter()
+        sim.similar(r["id"], 8)
+        pre.append((time.perf_counter() - t) * 1000)
+        t = time.perf_counter()
+        sim._similar_to(r, 8)
+        live.append((time.perf_counter() - t) * 1000)
+    for t in (first, pre, live):
+        t.sort()
+    print(f"{n:>7} recipes: build {build:.2f}s | first query p50 {first[len(first) // 2]:.3f}ms "
+          f"p95 {first[int(len(first) * 0.95)]:.3f}ms | precomputed p50 {pre[len(pre) // 2]:.3f}ms | "
+          f"new recipe p50 {live[len(live) // 2]:.2f}ms p95 {live[int(len(live) * 0.95)]:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recipes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    for n in args.recipes:
+        run(n, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+בדיקת corpus_mirror מול benchmarks/fake_mealdb, על מאגר SQLite זמני:
+1. ריצה שנקטעת באמצע (ביטול) – חלק מהיחידות נרשמו כהושלמו.
+2. ריצה עם כשלים מוזרקים – ממשיכה את אותה ריצה, לא מבקשת שוב יחידות שהושלמו, ונשארת פתוחה.
+3. ריצה נקייה – משלימה רק את מה שחסר; כל הקטלוג במאגר.
+4. ריצה שנייה על קטלוג שלא השתנה – לא כותבת אף מתכון.
+
+    python -m benchmarks.check_corpus_mirror --meals 300
+
+יוצא עם קוד שגיאה אם אחד התנאים לא מתקיים.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+from benchmarks.fake_mealdb import FakeMealDB, build_catalog, serve
+
+
+def _letters_hit() -> set[str]:
+    return {u for u, n in FakeMealDB.hits.items() if n and u.startswith("search:")}
+
+
+async def _check(meals: int) -> list[str]:
+    # המודולים קוראים את ההגדרות מהסביבה בזמן import
+    from services import corpus_mirror, recipe_index
+    from services.external_recipe_service import close_client
+    from infrastructure.local_store import store
+
+    def done_units(run_id: int) -> set[str]:
+        with store() as cx:
+            return {u for (u,) in cx.execute("SELECT unit FROM mirror_units WHERE run_id = ?", (run_id,))}
+
+    problems = []
+
+    def expect(ok: bool, what: str):
+        print(f"  {'ok  ' if ok else 'FAIL'} {what}")
+        if not ok:
+            problems.append(what)
+
+    recipe_index.init_index()
+    try:
+        # 1) קטיעה באמצע
+        print("1) interrupted run")
+        FakeMealDB.delay = 0.02
+        task = asyncio.create_task(corpus_mirror.run_mirror(concurrency=2))
+        while corpus_mirror.STATUS["units_done"] < 8:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        run_id = corpus_mirror.STATUS["run_id"]
+        first = done_units(run_id)
+        expect(0 < len(first) < 36, f"{len(first)} letter units recorded before the cut")
+
+        # 2) ממשיכים, עם כשלים
+        print("2) resumed run with injected failures")
+        FakeMealDB.delay = 0.0
+        FakeMealDB.hits.clear()
+        FakeMealDB.fail = {"search:x", "search:q"}
+        hidden = next(rid for rid, m in FakeMealDB.catalog.items() if m["_hidden"])
+        FakeMealDB.fail.add(f"lookup:{hidden}")
+        result = await corpus_mirror.run_mirror(concurrency=4)
+        expect(result["run_id"] == run_id, "continued the interrupted run")
+        refetched = {f"letter:{u.split(':', 1)[1]}" for u in _letters_hit()} & first
+        expect(not refetched, f"completed units not fetched again ({sorted(refetched) or 'none'})")
+        expect(result["state"] == "failed" and result["errors"] == len(FakeMealDB.fail),
+               f"run left open with {result['errors']} errors")
+
+        # 3) ריצה נקייה
+        print("3) clean resume")
+        FakeMealDB.hits.clear()
+        FakeMealDB.fail = set()
+        result = await corpus_mirror.run_mirror(concurrency=4)
+        expect(result["run_id"] == run_id, "still the same run")
+        expect(_letters_hit() == {"search:x", "search:q"}, f"only failed letters fetched: {sorted(_letters_hit())}")
+        expect(result["state"] == "done", f"state {result['state']}")
+        expect(result["corpus_size"] == meals, f"corpus has {result['corpus_size']}/{meals} recipes")
+
+        # 4) ריצה שנייה – אין שינויים
+        print("4) second run over an unchanged catalog")
+        result = await corpus_mirror.run_mirror(concurrency=4)
+        expect(result["run_id"] != run_id, "a finished run is not resumed")
+        expect(result["meals_seen"] > 0 and result["meals_written"] == 0,
+               f"{result['meals_written']} of {result['meals_seen']} meals written")
+    finally:
+        await close_client()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--meals", type=int, default=300)
+    args = parser.parse_args()
+
+    FakeMealDB.catalog = build_catalog(args.meals)
+    server = serve()
+    os.environ["MEALDB_URL"] = f"http://127.0.0.1:{server.server_address[1]}/api/json/v1/1"
+    with tempfile.TemporaryDirectory(prefix="mirror-check-") as tmp:
+        os.environ["STORE_DB_PATH"] = os.path.join(tmp, "store.db")
+        try:
+            problems = asyncio.run(_check(args.meals))
+        finally:
+            server.shutdown()
+    print("all checks passed" if not problems else f"{len(problems)} check(s) failed")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+שרת TheMealDB מזויף לפיתוח ולבדיקת corpus_mirror – בלי רשת ובלי rate limit.
+
+קטלוג סינתטי קבוע (לפי --meals) שעונה לנקודות הקצה שה-mirror משתמש בהן:
+search.php?f=, list.php?c=list, filter.php?c=, lookup.php?i=.
+חלק מהמנות (--hidden) לא מופיעות בחיפוש לפי אות – מגיעים אליהן רק דרך קטגוריה + lookup.
+כשלים מוגדרים: --fail-rate (אחוז בקשות שמחזירות 500) ו---fail (בקשות מסוימות נכשלות תמיד,
+למשל "search:c" או "lookup:60007"), ו---delay לכל בקשה.
+
+    python -m benchmarks.fake_mealdb --port 8099 --meals 300 --fail-rate 0.05
+    MEALDB_URL=http://127.0.0.1:8099/api/json/v1/1 python -m services.corpus_mirror
+"""
+
+import argparse
+import json
+import random
+import string
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CATEGORIES = ("Beef", "Chicken", "Dessert", "Pasta", "Seafood", "Vegetarian")
+_WORDS = ("Spicy", "Creamy", "Roast", "Baked", "Garlic", "Lemon", "Honey", "Smoky", "Green", "Quick")
+_DISHES = ("Stew", "Curry", "Pie", "Salad", "Soup", "Tart", "Bake", "Skillet", "Wrap", "Bowl")
+_INGREDIENTS = ("Chicken", "Beef", "Onion", "Garlic", "Tomato", "Butter", "Flour", "Rice", "Lemon", "Carrots",
+                "Potatoes", "Milk", "Eggs", "Sugar", "Olive Oil", "Salt", "Pepper", "Cumin", "Spinach", "Cheese")
+_MEASURES = ("1 cup", "2 tbsp", "200g", "1/2 tsp", "3", "1 pinch", "400ml", "2 cloves", "1 1/2 cups", "to taste")
+FIRST_ID = 60000
+
+
+def build_catalog(count: int, hidden: float = 0.1, seed: int = 7) -> dict[str, dict]:
+    """מנות בפורמט של TheMealDB, לפי idMeal"""
+    rnd = random.Random(seed)
+    letters = string.ascii_lowercase
+    meals = {}
+    for i in range(count):
+        rid = str(FIRST_ID + i)
+        # האות הראשונה מפוזרת על כל האלפבית, כך שכל יחידת "letter" מקבלת מנות
+        title = f"{letters[i % len(letters)].upper()}{rnd.choice(_WORDS).lower()} {rnd.choice(_DISHES)} #{i}"
+        meal = {
+            "idMeal": rid, "strMeal": title, "strCategory": CATEGORIES[i % len(CATEGORIES)],
+            "strMealThumb": f"https://example.invalid/{rid}.jpg",
+            "strTags": ",".join(rnd.sample(_WORDS, 2)), "strSource": None,
+            "strInstructions": "Prep everything.\r\nCook until done.\r\nServe warm.",
+            "_hidden": rnd.random() < hidden,
+        }
+        for n, ing in enumerate(rnd.sample(_INGREDIENTS, rnd.randint(4, 10)), start=1):
+            meal[f"strIngredient{n}"] = ing
+            meal[f"strMeasure{n}"] = rnd.choice(_MEASURES)
+        meals[rid] = meal
+    return meals
+
+
+class FakeMealDB(BaseHTTPRequestHandler):
+    catalog: dict[str, dict] = {}
+    fail_rate = 0.0
+    fail: set[str] = set()
+    delay = 0.0
+    # כמה בקשות הגיעו לכל יחידה ("search:a", "lookup:60003" ...) – לבדיקות
+    hits: Counter = Counter()
+    _lock = threading.Lock()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status: int, body: dict):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    @staticmethod
+    def _public(meal: dict) -> dict:
+        return {k: v for k, v in meal.items() if not k.startswith("_")}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path.rsplit("/", 1)[-1]
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        unit = f"{endpoint.removesuffix('.php')}:{next(iter(params.values()), '')}"
+        with self._lock:
+            self.hits[unit] += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if unit in self.fail or random.random() < self.fail_rate:
+            self._json(500, {"error": "injected failure"})
+            return
+
+        meals = self.catalog.values()
+        if endpoint == "search.php" and "f" in params:
+            found = [self._public(m) for m in meals
+                     if not m["_hidden"] and m["strMeal"].lower().startswith(params["f"].lower())]
+        elif endpoint == "list.php" and params.get("c") == "list":
+            found = [{"strCategory": c} for c in CATEGORIES]
+        elif endpoint == "filter.php" and "c" in params:
+            found = [{"strMeal": m["strMeal"], "strMealThumb": m["strMealThumb"], "idMeal": m["idMeal"]}
+                     for m in meals if m["strCategory"] == params["c"]]
+        elif endpoint == "lookup.php" and "i" in params:
+            meal = self.catalog.get(params["i"])
+            found = [self._public(meal)] if meal else []
+        else:
+            self._json(404, {"error": "not found"})
+            return
+        # כמו ה-API האמיתי: אין תוצאות = "meals": null
+        self._json(200, {"meals": found or None})
+
+
+def serve(port: int = 0) -> ThreadingHTTPServer:
+    """מפעיל את השרת ב-thread ברקע (port=0 = פורט פנוי כלשהו) ומחזיר אותו"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeMealDB)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--meals", type=int, default=300, help="catalog size")
+    parser.add_argument("--hidden", type=float, default=0.1, help="share of meals missing from letter search")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--fail", action="append", default=[], help="unit that always fails, e.g. search:c")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds per request")
+    args = parser.parse_args()
+    FakeMealDB.catalog = build_catalog(args.meals, args.hidden)
+    FakeMealDB.fail_rate = args.fail_rate
+    FakeMealDB.fail = set(args.fail)
+    FakeMealDB.delay = args.delay
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), FakeMealDB)
+    print(f"fake mealdb on http://127.0.0.1:{args.port}/api/json/v1/1 ({args.meals} meals)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+שרת Ollama מזויף לפיתוח ולמדידות – בלי GPU ובלי מודל.
+
+עונה ל-/api/generate (רגיל ו-stream NDJSON) בתשובה קבועה, עם השהיה מוגדרת לפני הטוקן
+הראשון (prefill) ובין טוקנים (decode), ומחזיר את אותם שדות מדדים ש-Ollama מחזיר.
+/api/embed מחזיר וקטור "שקית מילים" מגובב – טקסטים עם מילים משותפות יוצאים דומים.
+
+    python -m benchmarks.fake_ollama --port 11434 --ttft 0.4 --token-delay 0.03
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBED_DIM = 64
+
+ANSWER = ("Yes, you can. Let it cool completely, portion it into airtight containers and freeze "
+          "for up to three months. Thaw overnight in the fridge and reheat until piping hot.")
+
+
+def fake_embedding(text: str) -> list[float]:
+    vec = [0.0] * EMBED_DIM
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        h = int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "little")
+        vec[h % EMBED_DIM] += 1.0 if h & 0x80000000 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    ttft = 0.4
+    token_delay = 0.03
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status: int, body: dict):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._json(200, {"models": [{"name": "llama3:latest"}]})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path == "/api/embed":
+            req = self._read_body()
+            texts = req.get("input") or []
+            if isinstance(texts, str):
+                texts = [texts]
+            self._json(200, {"model": req.get("model", "nomic-embed-text"), "embeddings": [fake_embedding(t) for t in texts]})
+            return
+        if self.path != "/api/generate":
+            self._json(404, {"error": "not found"})
+            return
+        req = self._read_body()
+        if not req.get("prompt"):
+            # prompt ריק = טעינת המודל בלבד (warmup)
+            self._json(200, {"model": req.get("model", "llama3"), "response": "", "done": True, "load_duration": 0})
+            return
+        tokens = [w + " " for w in ANSWER.split()]
+        num_predict = (req.get("options") or {}).get("num_predict")
+        done_reason = "length" if num_predict and num_predict < len(tokens) else "stop"
+        tokens = tokens[:num_predict] if num_predict else tokens
+        prompt_tokens = len((req.get("system", "") + req.get("prompt", "")).split())
+        started = time.perf_counter()
+
+        def stats(eval_count: int) -> dict:
+            total = int((time.perf_counter() - started) * 1e9)
+            prefill = int(self.ttft * 1e9)
+            return {
+                "model": req.get("model", "llama3"), "done": True, "done_reason": done_reason, "context": (req.get("context") or []) + list(range(prompt_tokens + eval_count)),
+                "total_duration": total, "load_duration": 0,
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": prefill,
+                "eval_count": eval_count, "eval_duration": max(total - prefill, 0),
+            }
+
+        time.sleep(self.ttft)
+        if not req.get("stream", True):
+            time.sleep(self.token_delay * len(tokens))
+            self._json(200, {**stats(len(tokens)), "response": "".join(tokens)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, tok in enumerate(tokens):
+                if i:
+                    time.sleep(self.token_delay)
+                self._chunk(json.dumps({"model": req.get("model", "llama3"), "response": tok, "done": False}).encode() + b"\n")
+            self._chunk(json.dumps({**stats(len(tokens)), "response": ""}).encode() + b"\n")
+            self._chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # הלקוח ניתק באמצע – כמו Ollama אמיתי, מפסיקים לייצר
+            print(f"generation aborted by client after {i} tokens", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft", type=float, default=0.4, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.03, help="seconds between tokens")
+    args = parser.parse_args()
+    FakeOllama.ttft = args.ttft
+    FakeOllama.token_delay = args.token_delay
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), FakeOllama)
+    print(f"fake ollama on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
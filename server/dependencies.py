@@ -1,4 +1,4 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 try:
@@ -32,3 +32,18 @@ def get_current_user(
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
+
+def get_requester_key(
+    request: Request,
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+) -> str:
+    """
+    מזהה למי שייכת הבקשה (לחלוקה הוגנת של משאבים) – בלי לחייב התחברות ובלי גישה ל-DB:
+    ה-email מה-token אם הוא תקין, אחרת כתובת ה-IP.
+    """
+    if creds:
+        try:
+            return "user:" + decode_token(creds.credentials).get("sub", "")
+        except Exception:
+            pass
+    return "ip:" + (request.client.host if request.client else "unknown")
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from infrastructure.local_store import store
+
+log = logging.getLogger(__name__)
+
+# מרווח בשעות בין ניקויים של רשומות שפג תוקפן מה-SQLite (0 = כבוי)
+PURGE_INTERVAL_HOURS = float(os.getenv("CACHE_PURGE_INTERVAL_HOURS", "6"))
+
+# כל ה-caches שנוצרו – לניקוי התקופתי
+_caches: list["TwoTierCache"] = []
+
+# כתיבות ל-SQLite מתוך לולאת האירועים: thread כותב יחיד, כך שסדר הכתיבות לאותו מפתח נשמר
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kv-cache-write")
+
+
+class TwoTierCache:
+    """
+    cache דו-שכבתי: LRU חסום בזיכרון התהליך מעל טבלת SQLite מתמידה.
+    כל ערך נשמר כ-JSON יחד עם זמן התפוגה שלו. get מחזיר גם ערכים שפג תוקפם –
+    ההחלטה אם להגיש ערך ישן (stale) נשארת אצל הקורא; לכן הניקוי התקופתי מוחק רק
+    רשומות שפג תוקפן לפני יותר מ-keep_stale שניות.
+
+    בתוך לולאת האירועים נוגעים סינכרונית רק ב-LRU: aget קורא מה-SQLite ב-thread,
+    ו-set כותב אליו ברקע.
+    """
+
+    def __init__(self, table: str, max_items: int = 1000, keep_stale: float = 0):
+        self.table = table
+        self.max_items = max_items
+        self.keep_stale = keep_stale
+        self._lru: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "evictions": 0, "purged": 0}
+        with store() as cx:
+            cx.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,          -- מפתח ה-cache
+                value TEXT NOT NULL,           -- הערך כ-JSON
+                expires_at REAL NOT NULL       -- זמן תפוגה (epoch seconds)
+            )
+            """)
+            cx.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_expires ON {table}(expires_at)")
+        _caches.append(self)
+
+    def get(self, key: str) -> tuple[Any, float] | None:
+        """מחזיר (value, expires_at) או None אם המפתח לא קיים באף שכבה"""
+        entry = self._memory_get(key)
+        return entry if entry is not None else self._load(key)
+
+    async def aget(self, key: str) -> tuple[Any, float] | None:
+        """כמו get, לקוראים בתוך לולאת האירועים"""
+        entry = self._memory_get(key)
+        return entry if entry is not None else await asyncio.to_thread(self._load, key)
+
+    def _memory_get(self, key: str) -> tuple[Any, float] | None:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+            return entry
+
+    def _load(self, key: str) -> tuple[Any, float] | None:
+        with store() as cx:
+            row = cx.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["db_hits"] += 1
+        entry = (json.loads(row[0]), row[1])
+        self._remember(key, entry)
+        return entry
+
+    def set(self, key: str, value: Any, ttl: float):
+        """הזיכרון מתעדכן מיד; בתוך לולאת האירועים הכתיבה ל-SQLite עוברת ל-thread הכותב"""
+        entry = (value, time.time() + ttl)
+        self._remember(key, entry)
+        raw = json.dumps(value, ensure_ascii=False)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(key, raw, entry[1])
+            return
+        _writer.submit(self._write_logged, key, raw, entry[1])
+
+    def _write(self, key: str, raw: str, expires_at: float):
+        with store() as cx:
+            cx.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                       (key, raw, expires_at))
+
+    def _write_logged(self, key: str, raw: str, expires_at: float):
+        try:
+            self._write(key, raw, expires_at)
+        except sqlite3.Error as e:
+            # הערך עדיין ב-LRU; רק השכבה המתמידה פספסה אותו
+            log.warning("cache write to %s failed: %s", self.table, e)
+
+    def purge_expired(self, older_than: float | None = None) -> int:
+        """מוחק מה-SQLite רשומות שפג תוקפן לפני יותר מ-older_than שניות (ברירת מחדל: keep_stale)"""
+        older_than = self.keep_stale if older_than is None else older_than
+        with store() as cx:
+            cur = cx.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time() - older_than,))
+        self.stats["purged"] += cur.rowcount
+        return cur.rowcount
+
+    def size(self) -> dict:
+        with store() as cx:
+            rows = cx.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {"memory": len(self._lru), "memory_max": self.max_items, "db": rows}
+
+    def _remember(self, key: str, entry: tuple[Any, float]):
+        with self._lock:
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+                self.stats["evictions"] += 1
+
+
+async def periodic_purge():
+    """לולאת רקע: ניקוי כל ה-caches בהפעלה ואז כל PURGE_INTERVAL_HOURS שעות"""
+    while True:
+        for cache in list(_caches):
+            try:
+                removed = await asyncio.to_thread(cache.purge_expired)
+            except sqlite3.Error as e:
+                log.warning("cache purge of %s failed: %s", cache.table, e)
+                continue
+            if removed:
+                log.info("cache %s: purged %d expired rows", cache.table, removed)
+        await asyncio.sleep(PURGE_INTERVAL_HOURS * 3600)
@@ -0,0 +1,40 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+# -------------------------------
+# מאגר מקומי (SQLite) לנתוני cache ומתכונים
+# -------------------------------
+
+# קובץ נפרד מ-foodgenius.db כדי שנתוני cache לא יתערבבו עם המשתמשים וההזמנות
+STORE_DB_PATH = os.getenv(
+    "STORE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "foodgenius_store.db"),
+)
+
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    cx = sqlite3.connect(STORE_DB_PATH, timeout=10)
+    if not _initialized:
+        # WAL מאפשר קריאות במקביל לכתיבה (ה-refresh ברקע לא חוסם בקשות)
+        cx.execute("PRAGMA journal_mode=WAL")
+        _initialized = True
+    cx.execute("PRAGMA synchronous=NORMAL")
+    return cx
+
+
+@contextmanager
+def store():
+    """
+    פותח חיבור למאגר המקומי, מבצע commit בסיום (או rollback בשגיאה) וסוגר.
+    שימוש: with store() as cx: cx.execute(...)
+    """
+    cx = _connect()
+    try:
+        with cx:
+            yield cx
+    finally:
+        cx.close()
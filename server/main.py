@@ -1,12 +1,17 @@
 import os
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from api import recipe_routes
-from api.orders import router as orders_router
 
+# טוענים את .env לפני ייבוא ה-routers כדי שההגדרות ברמת המודול יראו אותו
 load_dotenv()
 
+from api import recipe_routes
+from api.orders import router as orders_router
+from services import external_recipe_service, corpus_mirror, recipe_derivation, ollama_client, chat_sessions, recipe_vectors
+from infrastructure import kv_cache
+
 try:
     from api import auth, ai
     from server.infrastructure.db import init_db
@@ -15,7 +20,7 @@ except ModuleNotFoundError:
     from infrastructure.db import init_db
 
 app = FastAPI(title="FoodGenius API")
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"], expose_headers=["X-Total-Count", "X-Next-Offset"])
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(recipe_routes.router, prefix="/recipes", tags=["recipes"])
@@ -23,8 +28,32 @@ app.include_router(ai.router, prefix="/ai", tags=["ai"])
 app.include_router(orders_router, prefix="/orders", tags=["orders"])
 
 @app.on_event("startup")
-def _startup():
+async def _startup():
     init_db()
+    chat_sessions.purge_expired()
+    if kv_cache.PURGE_INTERVAL_HOURS > 0:
+        app.state.purge_task = asyncio.create_task(kv_cache.periodic_purge())
+    await external_recipe_service.start_client()
+    await ollama_client.start_client()
+    if ollama_client.OLLAMA_WARMUP:
+        app.state.warmup_task = asyncio.create_task(ollama_client.warmup())
+    if corpus_mirror.MIRROR_INTERVAL_HOURS > 0:
+        app.state.mirror_task = asyncio.create_task(corpus_mirror.periodic_mirror())
+    if recipe_vectors.RAG_ENABLED:
+        app.state.vectors_task = asyncio.create_task(recipe_vectors.recipe_vectors.periodic_sync())
+    # הנוסחאות של השדות הנגזרים השתנו מאז הריצה הקודמת – מחשבים מחדש את המאגר ברקע
+    if recipe_derivation.needs_backfill():
+        app.state.derive_task = asyncio.create_task(recipe_derivation.backfill_in_background())
+
+@app.on_event("shutdown")
+async def _shutdown():
+    for name in ("mirror_task", "vectors_task", "purge_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    ai.cancel_prefetches()
+    await external_recipe_service.close_client()
+    await ollama_client.close_client()
 
 @app.get("/health")
 def health():
@@ -0,0 +1,99 @@
+"""
+מדיניות יצירה לפי העומס: איזה מודל, כמה טוקנים לתשובה (num_predict), איזה חלון הקשר
+(num_ctx) וכמה מקום מקבל ההקשר של המתכון ב-prompt.
+
+שלוש רמות לפי עומק התור של Ollama ומהירות היצירה שנמדדה (טוקנים לשנייה):
+- normal: המודל הגדול, תשובה והקשר מלאים.
+- busy: אותו מודל, תשובה והקשר קצרים יותר – כל יצירה מחזיקה את התור פחות זמן.
+- overloaded: המודל הקטן (OLLAMA_FALLBACK_MODEL, אם הוגדר) עם תשובה קצרה.
+אם המודל הגדול יוצר לאט מ-POLICY_MIN_TPS בזמן שיש תור, עולים רמה אחת.
+
+num_ctx לא משתנה בתוך אותו מודל: Ollama טוען מחדש את המודל כשמשנים אותו,
+וזה היה עולה יותר ממה שחוסכים. לכן ברמת busy מקצרים את ה-prompt עצמו.
+"""
+
+import os
+from typing import NamedTuple
+
+from services import llm_telemetry
+from services.chat_sessions import ANSWER_RESERVE, NUM_CTX, estimate_tokens
+from services.ollama_client import OLLAMA_MODEL
+from services.ollama_scheduler import INTERACTIVE, scheduler
+
+# -------- הגדרות --------
+FALLBACK_MODEL = os.getenv("OLLAMA_FALLBACK_MODEL", "")
+FALLBACK_NUM_CTX = int(os.getenv("OLLAMA_FALLBACK_NUM_CTX", "2048"))
+# מכמה בקשות שמחכות (או רצות במקביל מעבר לאחת) עוברים רמה
+BUSY_DEPTH = int(os.getenv("POLICY_BUSY_DEPTH", "2"))
+OVERLOADED_DEPTH = int(os.getenv("POLICY_OVERLOADED_DEPTH", "5"))
+MIN_TPS = float(os.getenv("POLICY_MIN_TPS", "8"))
+
+LEVELS = ("normal", "busy", "overloaded")
+# לכל רמה: (num_predict, טוקנים מקסימליים להקשר המתכון / RAG)
+LIMITS = {
+    "normal": (ANSWER_RESERVE, 1200),
+    "busy": (256, 600),
+    "overloaded": (192, 400),
+}
+
+# מקום ב-num_ctx ל-system prompt ולתבנית של Ollama
+PROMPT_OVERHEAD_TOKENS = 64
+
+STATS = {"chosen": {level: 0 for level in LEVELS}, "context_trimmed": 0}
+
+
+class Policy(NamedTuple):
+    level: str
+    model: str
+    num_predict: int
+    num_ctx: int
+    context_tokens: int
+
+    def context_budget(self, used_tokens: int) -> int:
+        """כמה טוקנים אפשר לתת להקשר, כשכבר יש used_tokens (היסטוריה + שאלה) ב-prompt"""
+        free = self.num_ctx - self.num_predict - PROMPT_OVERHEAD_TOKENS - used_tokens
+        return max(min(self.context_tokens, free), 0)
+
+
+def _load() -> int:
+    """בקשות שמחכות בתור האינטראקטיבי + כמה רצות כרגע מעבר לראשונה"""
+    return scheduler.depth(INTERACTIVE) + max(scheduler.active() - 1, 0)
+
+
+def choose() -> Policy:
+    load = _load()
+    index = 2 if load >= OVERLOADED_DEPTH else 1 if load >= BUSY_DEPTH else 0
+    tps = llm_telemetry.tokens_per_second(OLLAMA_MODEL)
+    if load and tps is not None and tps < MIN_TPS:
+        index = min(index + 1, 2)
+    level = LEVELS[index]
+    num_predict, context_tokens = LIMITS[level]
+    STATS["chosen"][level] += 1
+    if level == "overloaded" and FALLBACK_MODEL:
+        return Policy(level, FALLBACK_MODEL, num_predict, FALLBACK_NUM_CTX, context_tokens)
+    return Policy(level, OLLAMA_MODEL, num_predict, NUM_CTX, context_tokens)
+
+
+def models() -> list[str]:
+    """כל המודלים שהמדיניות עשויה לבחור (לחיפוש תשובה שמורה בכל אחד מהם)"""
+    return [OLLAMA_MODEL] + ([FALLBACK_MODEL] if FALLBACK_MODEL and FALLBACK_MODEL != OLLAMA_MODEL else [])
+
+
+def fit(text: str, budget_tokens: int) -> str:
+    """מקצר טקסט לתקציב הטוקנים (בגבול מילה); בלי תקציב – מחרוזת ריקה"""
+    if budget_tokens <= 0:
+        if text:
+            STATS["context_trimmed"] += 1
+        return ""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    STATS["context_trimmed"] += 1
+    cut = text[:budget_tokens * 4]
+    return cut[:cut.rfind(" ")] + " ..." if " " in cut else cut
+
+
+def stats() -> dict:
+    return {
+        **STATS, "load": _load(), "fallback_model": FALLBACK_MODEL or None,
+        "tokens_per_second": {m: round(llm_telemetry.tokens_per_second(m) or 0, 1) for m in models()},
+    }
@@ -0,0 +1,158 @@
+"""
+cache לתשובות ה-AI: אותה שאלה על אותו מתכון לא מייצרת שוב תשובה מלאה ב-Ollama.
+
+המפתח הוא (מודל, hash של ה-system prompt, recipe_id, שאלה מנורמלת), כך ששינוי מודל או
+prompt לא מחזיר תשובות ישנות. האחסון הוא TwoTierCache (LRU בזיכרון מעל SQLite) עם TTL.
+
+אופציונלי (AI_CACHE_SEMANTIC=1): כשאין התאמה מדויקת, מחפשים שאלה קרובה על אותו מתכון
+לפי דמיון קוסינוס בין embeddings מעל סף (AI_CACHE_SIM_THRESHOLD).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+
+import httpx
+import numpy as np
+
+from infrastructure.kv_cache import TwoTierCache
+from services.ollama_client import ollama_embed
+
+log = logging.getLogger(__name__)
+
+# -------- הגדרות --------
+# תשובה על מתכון לא משתנה; שאלה כללית (בלי מתכון) נשמרת לזמן קצר יותר
+TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
+GENERAL_TTL = int(os.getenv("AI_CACHE_GENERAL_TTL", str(24 * 3600)))
+SEMANTIC = os.getenv("AI_CACHE_SEMANTIC", "0") == "1"
+SIM_THRESHOLD = float(os.getenv("AI_CACHE_SIM_THRESHOLD", "0.92"))
+# כמה שאלות (עם embedding) שומרים בזיכרון לכל מתכון לחיפוש הקרוב
+SEMANTIC_PER_SCOPE = 50
+
+_cache = TwoTierCache("ai_answer_cache", max_items=int(os.getenv("AI_CACHE_MAX_ITEMS", "5000")))
+
+# scope → [(key, embedding מנורמל)]; בזיכרון בלבד – אחרי הפעלה מחדש מתמלא מחדש מהשאלות החדשות
+_vectors: dict[str, list[tuple[str, np.ndarray]]] = {}
+# embedding אחרון לכל שאלה מנורמלת – lookup שנכשל ו-store שאחריו מחשבים אותו פעם אחת
+_recent_vecs: OrderedDict[str, np.ndarray] = OrderedDict()
+
+STATS = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "embed_errors": 0, "hit_ms_total": 0.0}
+
+_PUNCT_RE = re.compile(r"[^\w\s']+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """"Can I  FREEZE it?!" → "can i freeze it" """
+    q = _PUNCT_RE.sub(" ", question.lower())
+    return _SPACE_RE.sub(" ", q).strip()
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _scope(model: str, system: str, recipe_id: str | None) -> str:
+    return f"{model}|{_hash(system)[:12]}|{recipe_id or ''}"
+
+
+def make_key(model: str, system: str, recipe_id: str | None, question: str) -> str:
+    return _hash(f"{_scope(model, system, recipe_id)}|{normalize_question(question)}")
+
+
+async def _fresh(key: str) -> dict | None:
+    entry = await _cache.aget(key)
+    if entry is None:
+        return None
+    value, expires_at = entry
+    return value if expires_at > time.time() else None
+
+
+async def _embed(question: str) -> np.ndarray | None:
+    q = normalize_question(question)
+    if q in _recent_vecs:
+        return _recent_vecs[q]
+    try:
+        vec = np.asarray((await ollama_embed([q]))[0], dtype=np.float32)
+    except (httpx.HTTPError, KeyError, IndexError) as e:
+        STATS["embed_errors"] += 1
+        log.warning("question embedding failed: %s", e)
+        return None
+    norm = np.linalg.norm(vec)
+    if not norm:
+        return None
+    _recent_vecs[q] = vec / norm
+    if len(_recent_vecs) > 256:
+        _recent_vecs.popitem(last=False)
+    return _recent_vecs[q]
+
+
+async def lookup_any(models: list[str], system: str, recipe_id: str | None, question: str) -> dict | None:
+    """
+    תשובה שמורה מהמודל הראשון ברשימה שיש לו כזו: {"answer", "question", "similarity", "model"} או None.
+    similarity הוא 1.0 בהתאמה מדויקת, אחרת הדמיון לשאלה הקרובה שנמצאה.
+    נספר hit/miss אחד לכל קריאה, גם כשבודקים כמה מודלים.
+    """
+    t0 = time.perf_counter()
+    hit, similarity, found_in = None, 1.0, None
+    for model in models:
+        hit = await _fresh(make_key(model, system, recipe_id, question))
+        if hit is not None:
+            found_in = model
+            break
+    if hit is None and SEMANTIC:
+        scopes = [(m, _vectors.get(_scope(m, system, recipe_id))) for m in models]
+        scopes = [(m, c) for m, c in scopes if c]
+        # embedding אחד לשאלה, מול השאלות השמורות של כל המודלים
+        vec = await _embed(question) if scopes else None
+        for model, candidates in scopes:
+            if vec is None:
+                break
+            sims = np.stack([v for _, v in candidates]) @ vec
+            best = int(np.argmax(sims))
+            if sims[best] >= SIM_THRESHOLD:
+                hit = await _fresh(candidates[best][0])
+                if hit is not None:
+                    similarity, found_in = round(float(sims[best]), 3), model
+                    STATS["semantic_hits"] += 1
+                    break
+    if hit is None:
+        STATS["misses"] += 1
+        return None
+    STATS["hits"] += 1
+    STATS["hit_ms_total"] += (time.perf_counter() - t0) * 1000
+    return {**hit, "similarity": similarity, "model": found_in}
+
+
+async def contains(model: str, system: str, recipe_id: str | None, question: str) -> bool:
+    """יש תשובה תקפה לשאלה הזו בדיוק (בלי לספור hit/miss ובלי embedding)"""
+    return await _fresh(make_key(model, system, recipe_id, question)) is not None
+
+
+async def store(model: str, system: str, recipe_id: str | None, question: str, answer: str):
+    if not answer.strip():
+        return
+    key = make_key(model, system, recipe_id, question)
+    _cache.set(key, {"answer": answer, "question": normalize_question(question)}, TTL if recipe_id else GENERAL_TTL)
+    STATS["stores"] += 1
+    if SEMANTIC:
+        vec = await _embed(question)
+        if vec is not None:
+            bucket = _vectors.setdefault(_scope(model, system, recipe_id), [])
+            bucket[:] = [(k, v) for k, v in bucket if k != key][-(SEMANTIC_PER_SCOPE - 1):]
+            bucket.append((key, vec))
+
+
+def stats() -> dict:
+    total = STATS["hits"] + STATS["misses"]
+    return {
+        **{k: v for k, v in STATS.items() if k != "hit_ms_total"},
+        "hit_ratio": round(STATS["hits"] / total, 3) if total else 0.0,
+        "avg_hit_ms": round(STATS["hit_ms_total"] / STATS["hits"], 2) if STATS["hits"] else None,
+        "semantic": SEMANTIC,
+        "tiers": _cache.stats,
+        "size": _cache.size(),
+    }
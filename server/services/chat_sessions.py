@@ -0,0 +1,223 @@
+"""
+שיחות AI מרובות-תורות: ההיסטוריה נשמרת בשרת (SQLite) והלקוח מחזיק רק session_id.
+
+לכל תור בונים prompt בתקציב טוקנים: ההקשר של המתכון, סיכום קצר של התורות הישנות
+ואחריו התורות האחרונות במלואן. תורות שלא נכנסות לתקציב יוצאות מההיסטוריה ונכנסות
+לסיכום (שאלה + המשפט הראשון של התשובה), והסיכום עצמו חסום בגודל.
+
+אם התור הקודם נוצר ב-Ollama באותו מודל, שומרים את ה-context שהוא החזיר (הטוקנים של כל
+השיחה עד עכשיו) ושולחים בתור הבא רק את השאלה החדשה – בלי לעבד מחדש את המתכון וההיסטוריה.
+כשה-context מתקרב לגבול חלון ההקשר של המודל, חוזרים ל-prompt מקוצר.
+"""
+
+import os
+import re
+import time
+import uuid
+from array import array
+
+from infrastructure.local_store import store
+
+# -------- הגדרות --------
+SESSION_TTL = int(os.getenv("CHAT_SESSION_TTL", str(24 * 3600)))
+# כמה טוקנים מותר להיסטוריה (בלי ההקשר של המתכון והשאלה החדשה)
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKENS", "1200"))
+SUMMARY_TOKEN_BUDGET = HISTORY_TOKEN_BUDGET // 4
+# חלון ההקשר של המודל ומקום שנשמר לתשובה – context ארוך מזה לא נשלח שוב
+NUM_CTX = int(os.getenv("CHAT_NUM_CTX", "2048"))
+ANSWER_RESERVE = 512
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s")
+
+STATS = {"sessions": 0, "turns": 0, "context_reused": 0, "prompt_rebuilt": 0, "turns_summarized": 0}
+
+
+def _init():
+    with store() as cx:
+        cx.execute("""
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,            -- get_requester_key
+            recipe_id TEXT,
+            summary TEXT NOT NULL DEFAULT '',
+            summarized_upto INTEGER NOT NULL DEFAULT 0,  -- כמה תורות כבר בסיכום
+            model TEXT,                     -- המודל שיצר את ה-context
+            context BLOB,                   -- context של Ollama (int32)
+            context_turn INTEGER NOT NULL DEFAULT 0,     -- אחרי איזה תור ה-context תקף
+            updated_at REAL NOT NULL
+        )
+        """)
+        cx.execute("""
+        CREATE TABLE IF NOT EXISTS chat_turns (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,           -- מספר התור בשיחה (1, 2, ...)
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            tokens INTEGER NOT NULL,        -- אומדן טוקנים של השאלה + התשובה
+            PRIMARY KEY (session_id, seq)
+        )
+        """)
+
+
+def estimate_tokens(text: str) -> int:
+    """אומדן גס (~4 תווים לטוקן באנגלית) – מספיק לתקציב, בלי tokenizer"""
+    return len(text) // 4 + 1
+
+
+def _pack(context: list[int] | None) -> bytes | None:
+    return array("i", context).tobytes() if context else None
+
+
+def _unpack(blob: bytes | None) -> list[int] | None:
+    if not blob:
+        return None
+    a = array("i")
+    a.frombytes(blob)
+    return a.tolist()
+
+
+# -------- שיחות --------
+def open_session(session_id: str | None, owner: str, recipe_id: str | None) -> dict:
+    """
+    מחזיר את השיחה הקיימת, או פותח חדשה אם אין מזהה, אם השיחה פגה,
+    אם היא של משתמש אחר או של מתכון אחר.
+    """
+    if session_id:
+        with store() as cx:
+            row = cx.execute(
+                "SELECT id, owner, recipe_id, summary, summarized_upto, model, context, context_turn, updated_at "
+                "FROM chat_sessions WHERE id = ?", (session_id,),
+            ).fetchone()
+            turns = cx.execute("SELECT COUNT(*) FROM chat_turns WHERE session_id = ?", (session_id,)).fetchone()[0]
+        if row and row[1] == owner and row[2] == recipe_id and row[8] > time.time() - SESSION_TTL:
+            return {
+                "id": row[0], "owner": row[1], "recipe_id": row[2], "summary": row[3], "summarized_upto": row[4],
+                "model": row[5], "context": _unpack(row[6]), "context_turn": row[7], "turns": turns,
+            }
+
+    session = {
+        "id": uuid.uuid4().hex, "owner": owner, "recipe_id": recipe_id, "summary": "", "summarized_upto": 0,
+        "model": None, "context": None, "context_turn": 0, "turns": 0,
+    }
+    with store() as cx:
+        cx.execute(
+            "INSERT INTO chat_sessions (id, owner, recipe_id, updated_at) VALUES (?, ?, ?, ?)",
+            (session["id"], owner, recipe_id, time.time()),
+        )
+    STATS["sessions"] += 1
+    return session
+
+
+def reusable_context(session: dict, question: str, model: str,
+                     num_ctx: int = NUM_CTX, answer_reserve: int = ANSWER_RESERVE) -> list[int] | None:
+    """ה-context של התור הקודם, אם הוא נוצר באותו מודל ועדיין יש מקום בחלון לשאלה ולתשובה"""
+    ctx = session["context"]
+    if not ctx or session["model"] != model or session["context_turn"] != session["turns"]:
+        return None
+    if len(ctx) + estimate_tokens(question) + answer_reserve > num_ctx:
+        return None
+    STATS["context_reused"] += 1
+    return ctx
+
+
+def _summary_line(question: str, answer: str) -> str:
+    first = _SENTENCE_RE.split(answer.strip(), maxsplit=1)[0]
+    return f"- Q: {question.strip()[:120]} A: {first[:160]}"
+
+
+def _trim_summary(summary: str) -> str:
+    lines = summary.splitlines()
+    # השורות הישנות ביותר יוצאות ראשונות
+    while lines and estimate_tokens("\n".join(lines)) > SUMMARY_TOKEN_BUDGET:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def history_prompt(session: dict) -> str:
+    """
+    ההיסטוריה בתקציב HISTORY_TOKEN_BUDGET: התורות האחרונות במלואן, והישנות יותר
+    עוברות לסיכום (נשמר בשיחה כדי לא לחשב אותו שוב).
+    """
+    if not session["turns"]:
+        return ""
+    STATS["prompt_rebuilt"] += 1
+    with store() as cx:
+        rows = cx.execute(
+            "SELECT seq, question, answer, tokens FROM chat_turns WHERE session_id = ? AND seq > ? ORDER BY seq",
+            (session["id"], session["summarized_upto"]),
+        ).fetchall()
+
+    budget = HISTORY_TOKEN_BUDGET - estimate_tokens(session["summary"])
+    keep_from = len(rows)
+    for i in range(len(rows) - 1, -1, -1):
+        if rows[i][3] > budget:
+            break
+        budget -= rows[i][3]
+        keep_from = i
+
+    if keep_from:
+        dropped = rows[:keep_from]
+        lines = [session["summary"]] if session["summary"] else []
+        lines += [_summary_line(q, a) for _, q, a, _ in dropped]
+        session["summary"] = _trim_summary("\n".join(lines))
+        session["summarized_upto"] = dropped[-1][0]
+        STATS["turns_summarized"] += len(dropped)
+        with store() as cx:
+            cx.execute(
+                "UPDATE chat_sessions SET summary = ?, summarized_upto = ? WHERE id = ?",
+                (session["summary"], session["summarized_upto"], session["id"]),
+            )
+
+    parts = []
+    if session["summary"]:
+        parts.append("Earlier in this conversation:\n" + session["summary"])
+    for _, q, a, _ in rows[keep_from:]:
+        parts.append(f"User: {q}\nAssistant: {a}")
+    return "\n\n".join(parts) + "\n\n" if parts else ""
+
+
+def record_turn(session: dict, question: str, answer: str, context: list[int] | None = None, model: str | None = None):
+    """שומר את התור; context (אם Ollama החזיר) נשמר לשימוש בתור הבא"""
+    session["turns"] += 1
+    session["context"] = context
+    session["model"] = model if context else None
+    session["context_turn"] = session["turns"] if context else 0
+    with store() as cx:
+        cx.execute(
+            "INSERT OR REPLACE INTO chat_turns (session_id, seq, question, answer, tokens) VALUES (?, ?, ?, ?, ?)",
+            (session["id"], session["turns"], question, answer, estimate_tokens(question) + estimate_tokens(answer)),
+        )
+        cx.execute(
+            "UPDATE chat_sessions SET model = ?, context = ?, context_turn = ?, updated_at = ? WHERE id = ?",
+            (session["model"], _pack(context), session["context_turn"], time.time(), session["id"]),
+        )
+    STATS["turns"] += 1
+
+
+def first_questions(recipe_id: str, limit: int) -> list[str]:
+    """השאלה הראשונה של השיחות האחרונות על המתכון (מהחדשה לישנה)"""
+    with store() as cx:
+        rows = cx.execute(
+            "SELECT t.question FROM chat_turns t JOIN chat_sessions s ON s.id = t.session_id "
+            "WHERE s.recipe_id = ? AND t.seq = 1 ORDER BY s.updated_at DESC LIMIT ?",
+            (recipe_id, limit),
+        ).fetchall()
+    return [q for (q,) in rows]
+
+
+def purge_expired() -> int:
+    cutoff = time.time() - SESSION_TTL
+    with store() as cx:
+        cx.execute(
+            "DELETE FROM chat_turns WHERE session_id IN (SELECT id FROM chat_sessions WHERE updated_at < ?)", (cutoff,)
+        )
+        return cx.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (cutoff,)).rowcount
+
+
+def stats() -> dict:
+    with store() as cx:
+        sessions = cx.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+    return {**STATS, "stored_sessions": sessions}
+
+
+_init()
@@ -0,0 +1,240 @@
+"""
+מראה (mirror) מלאה של קטלוג TheMealDB למאגר המקומי.
+
+עובר על נקודות הקצה של אותיות (search.php?f=), קטגוריות (list.php / filter.php)
+ו-lookup למתכונים שלא הגיעו דרך האותיות, עם מאגר מקבילי חסום.
+כל מתכון עובר דרך _adapt ונכתב ל-recipe_index; מתכון שה-hash שלו לא השתנה מדולג.
+כל יחידת עבודה שהסתיימה נרשמת, כך שריצה שנקטעה ממשיכה מהמקום שבו עצרה.
+
+הרצה ידנית (מתוך תיקיית server):
+    python -m services.corpus_mirror --concurrency 4
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import string
+import threading
+import time
+
+from infrastructure.local_store import store
+from services import recipe_index
+from services.external_recipe_service import _adapt_many, close_client, get_meals
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = int(os.getenv("MEALDB_MIRROR_CONCURRENCY", "4"))
+# מרווח בשעות בין סנכרונים אוטומטיים ברקע (0 = כבוי)
+MIRROR_INTERVAL_HOURS = float(os.getenv("MEALDB_MIRROR_INTERVAL_HOURS", "0"))
+
+# מדדי התקדמות ותפוקה של הריצה הנוכחית/האחרונה
+STATUS = {
+    "state": "idle",            # idle / running / done / failed
+    "run_id": None,
+    "units_total": 0,
+    "units_done": 0,
+    "meals_seen": 0,
+    "meals_written": 0,
+    "meals_unchanged": 0,
+    "errors": 0,
+    "started_at": None,
+    "finished_at": None,
+}
+
+_task: asyncio.Task | None = None
+# הכתיבה למאגר (נגזרות, FTS5, האינדקסים שבזיכרון) רצה ב-thread, מחוץ ללולאת האירועים;
+# יחידות שהסתיימו יחד נכתבות בזו אחר זו
+_ingest_lock = threading.Lock()
+
+
+def _init_tables():
+    with store() as cx:
+        cx.execute("""
+        CREATE TABLE IF NOT EXISTS mirror_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at REAL NOT NULL,
+            finished_at REAL,
+            status TEXT NOT NULL            -- running / done / failed
+        )
+        """)
+        cx.execute("""
+        CREATE TABLE IF NOT EXISTS mirror_units (
+            run_id INTEGER NOT NULL,
+            unit TEXT NOT NULL,             -- letter:a / lookup:52772
+            done_at REAL NOT NULL,
+            PRIMARY KEY (run_id, unit)
+        )
+        """)
+
+
+def _open_run(fresh: bool) -> tuple[int, set[str]]:
+    """מחזיר (run_id, יחידות שכבר הושלמו). ריצה שלא הסתיימה ממשיכה, אלא אם fresh"""
+    with store() as cx:
+        row = cx.execute("SELECT id FROM mirror_runs WHERE status != 'done' ORDER BY id DESC LIMIT 1").fetchone()
+        if row and not fresh:
+            run_id = row[0]
+            cx.execute("UPDATE mirror_runs SET status = 'running' WHERE id = ?", (run_id,))
+            done = {u for (u,) in cx.execute("SELECT unit FROM mirror_units WHERE run_id = ?", (run_id,))}
+            return run_id, done
+        if row:
+            cx.execute("UPDATE mirror_runs SET status = 'failed', finished_at = ? WHERE id = ?", (time.time(), row[0]))
+        cur = cx.execute("INSERT INTO mirror_runs (started_at, status) VALUES (?, 'running')", (time.time(),))
+        return cur.lastrowid, set()
+
+
+def _unit_done(run_id: int, unit: str):
+    with _ingest_lock, store() as cx:
+        cx.execute("INSERT OR IGNORE INTO mirror_units (run_id, unit, done_at) VALUES (?, ?, ?)", (run_id, unit, time.time()))
+        STATUS["units_done"] += 1
+
+
+def _close_run(run_id: int, status: str):
+    with store() as cx:
+        cx.execute("UPDATE mirror_runs SET status = ?, finished_at = ? WHERE id = ?", (status, time.time(), run_id))
+    if status == "done":
+        recipe_index.set_meta("mirrored_at", str(time.time()))
+
+
+def _ingest(meals: list[dict]):
+    with _ingest_lock:
+        recipes = _adapt_many(meals)
+        written = recipe_index.upsert_many(recipes)
+        STATUS["meals_seen"] += len(recipes)
+        STATUS["meals_written"] += written
+        STATUS["meals_unchanged"] += len(recipes) - written
+
+
+async def run_mirror(concurrency: int = DEFAULT_CONCURRENCY, fresh: bool = False) -> dict:
+    """מריץ סנכרון מלא/מצטבר ומחזיר את מדדי הריצה"""
+    _init_tables()
+    run_id, done = _open_run(fresh)
+    STATUS.update(
+        state="running", run_id=run_id, units_total=0, units_done=len(done), meals_seen=0,
+        meals_written=0, meals_unchanged=0, errors=0, started_at=time.time(), finished_at=None,
+    )
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _unit(unit: str, path: str, params: dict) -> list[dict] | None:
+        if unit in done:
+            return None
+        async with sem:
+            try:
+                meals = await get_meals(path, params)
+            except Exception as e:
+                STATUS["errors"] += 1
+                log.warning("mirror unit %s failed: %s", unit, e)
+                return None
+        return meals
+
+    try:
+        # 1) אותיות – מחזירות מתכונים מלאים
+        letters = string.ascii_lowercase + string.digits
+        STATUS["units_total"] += len(letters)
+
+        async def _letter(ch: str):
+            unit = f"letter:{ch}"
+            meals = await _unit(unit, "/search.php", {"f": ch})
+            if meals is not None:
+                await asyncio.to_thread(_ingest, meals)
+                await asyncio.to_thread(_unit_done, run_id, unit)
+
+        await asyncio.gather(*(_letter(ch) for ch in letters))
+
+        # 2) קטגוריות – מחזירות רק מזהים; משמשות לגילוי מתכונים שהאותיות פספסו
+        categories = [c["strCategory"] for c in await get_meals("/list.php", {"c": "list"}) if c.get("strCategory")]
+        STATUS["units_total"] += len(categories)
+        missing: set[str] = set()
+
+        async def _category(cat: str):
+            # קטגוריות לא נרשמות כהושלמו: הן זולות, וצריך אותן בכל ריצה כדי לגלות מה עוד חסר
+            meals = await _unit(f"category:{cat}", "/filter.php", {"c": cat})
+            ids = [m["idMeal"] for m in meals or []]
+            if ids:
+                known = await asyncio.to_thread(recipe_index.get_many, ids)
+                missing.update(rid for rid in ids if rid not in known)
+            if meals is not None:
+                STATUS["units_done"] += 1
+
+        await asyncio.gather(*(_category(c) for c in categories))
+
+        # 3) lookup למתכונים שחסרים במאגר (כולל אלה שכבר הושלמו בריצה שנקטעה, לצורך אחוז ההתקדמות)
+        done_lookups = {u.split(":", 1)[1] for u in done if u.startswith("lookup:")}
+        STATUS["units_total"] += len(missing | done_lookups)
+
+        async def _lookup(rid: str):
+            unit = f"lookup:{rid}"
+            meals = await _unit(unit, "/lookup.php", {"i": rid})
+            if meals is not None:
+                await asyncio.to_thread(_ingest, meals)
+                await asyncio.to_thread(_unit_done, run_id, unit)
+
+        await asyncio.gather(*(_lookup(rid) for rid in sorted(missing)))
+    except asyncio.CancelledError:
+        # הריצה נשארת "פתוחה" ותמשיך בפעם הבאה
+        STATUS["state"] = "idle"
+        raise
+    except Exception:
+        _close_run(run_id, "failed")
+        STATUS.update(state="failed", finished_at=time.time())
+        raise
+
+    # ריצה עם שגיאות נשארת פתוחה – הריצה הבאה תשלים רק את היחידות שנכשלו
+    if STATUS["errors"]:
+        STATUS.update(state="failed", finished_at=time.time())
+    else:
+        _close_run(run_id, "done")
+        STATUS.update(state="done", finished_at=time.time())
+    return status()
+
+
+def status() -> dict:
+    elapsed = (STATUS["finished_at"] or time.time()) - STATUS["started_at"] if STATUS["started_at"] else 0.0
+    return {
+        **STATUS,
+        "elapsed_sec": round(elapsed, 2),
+        "meals_per_sec": round(STATUS["meals_seen"] / elapsed, 2) if elapsed else 0.0,
+        "progress": round(STATUS["units_done"] / STATUS["units_total"], 3) if STATUS["units_total"] else 0.0,
+        "corpus_size": recipe_index.count(),
+    }
+
+
+def start_background_mirror(concurrency: int = DEFAULT_CONCURRENCY, fresh: bool = False) -> bool:
+    """מפעיל סנכרון ברקע בתוך לולאת האירועים של השרת. מחזיר False אם כבר רץ סנכרון"""
+    global _task
+    if _task is not None and not _task.done():
+        return False
+    _task = asyncio.create_task(_run_logged(concurrency, fresh))
+    return True
+
+
+async def _run_logged(concurrency: int, fresh: bool):
+    try:
+        await run_mirror(concurrency, fresh)
+    except Exception as e:
+        log.exception("mirror failed: %s", e)
+
+
+async def periodic_mirror():
+    """לולאת רקע: סנכרון מצטבר כל MIRROR_INTERVAL_HOURS שעות"""
+    while True:
+        start_background_mirror()
+        await asyncio.sleep(MIRROR_INTERVAL_HOURS * 3600)
+
+
+async def _main(concurrency: int, fresh: bool):
+    try:
+        result = await run_mirror(concurrency, fresh)
+    finally:
+        await close_client()
+    for k, v in result.items():
+        print(f"{k}: {v}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mirror the TheMealDB catalog into the local recipe store")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--fresh", action="store_true", help="start a new run instead of resuming an interrupted one")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.concurrency, args.fresh))
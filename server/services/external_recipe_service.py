@@ -1,18 +1,200 @@
-import requests
+import asyncio
+import os
+import httpx
+from services import recipe_cache, recipe_derivation, recipe_index
+from services.fuzzy_index import fuzzy_index
+from services.single_flight import SingleFlight
 
-def get_external_recipes(query: str):
-    url = f"https://www.themealdb.com/api/json/v1/1/search.php?s={query}"
-    r = requests.get(url, timeout=20); r.raise_for_status()
-    meals = r.json().get("meals") or []
-    return [_adapt(meal) for meal in meals]
+# כתובת הבסיס של TheMealDB (ניתן להחליף לשרת מקומי/מזויף דרך משתנה סביבה)
+MEALDB_URL = os.getenv("MEALDB_URL", "https://www.themealdb.com/api/json/v1/1")
+
+# כמה מזהים חסרים ב-cache נשלפים במקביל מ-TheMealDB בבקשת batch אחת
+BATCH_CONCURRENCY = int(os.getenv("MEALDB_BATCH_CONCURRENCY", "8"))
+
+# תקרה על מספר התוצאות בחיפוש הסלחני (fallback כשאין התאמה מדויקת)
+FUZZY_MAX_RESULTS = 50
+
+# מאחד קריאות זהות ל-TheMealDB שרצות במקביל (אותו חיפוש / אותו מזהה)
+_flight = SingleFlight()
+
+# לקוח HTTP משותף לכל הקריאות ל-TheMealDB – נפתח ב-startup ונסגר ב-shutdown
+_client: httpx.AsyncClient | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    """
+    יוצר AsyncClient עם keep-alive ו-pool חיבורים.
+    כל הקריאות הולכות לאותו host, ולכן מגבלות ה-pool הן בפועל מגבלות per-host.
+    """
+    timeout = httpx.Timeout(
+        connect=float(os.getenv("MEALDB_CONNECT_TIMEOUT", "3")),
+        read=float(os.getenv("MEALDB_READ_TIMEOUT", "10")),
+        write=5.0,
+        pool=float(os.getenv("MEALDB_POOL_TIMEOUT", "5")),
+    )
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("MEALDB_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("MEALDB_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=30.0,
+    )
+    return httpx.AsyncClient(base_url=MEALDB_URL, timeout=timeout, limits=limits)
+
+
+async def start_client():
+    """נקרא ב-startup של האפליקציה"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def close_client():
+    """נקרא ב-shutdown של האפליקציה – סוגר את כל החיבורים הפתוחים"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """מחזיר את הלקוח המשותף (ויוצר אותו אם האפליקציה לא עלתה דרך startup, למשל בסקריפטים)"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def get_meals(path: str, params: dict) -> list[dict]:
+    r = await get_client().get(path, params=params)
+    r.raise_for_status()
+    return r.json().get("meals") or []
+
+
+async def get_external_recipes(query: str, limit: int = 50, offset: int = 0) -> tuple[int, list[dict]]:
+    """חיפוש מתכונים. מחזיר (מספר התוצאות הכולל, העמוד המבוקש)"""
+    # אחרי מראה מלאה של הקטלוג האינדקס המקומי מספיק; TheMealDB נשאל רק אם לא נמצא דבר
+    if recipe_index.is_mirrored():
+        total = recipe_index.search_count(query)
+        if total:
+            return total, recipe_index.search(query, limit, offset)
+        fuzzy = _fuzzy_search(query, limit, offset)
+        if fuzzy[0]:
+            return fuzzy
+    # שאילתה "קרה" (שלא נראתה ב-cache) מושכת קודם מ-TheMealDB ומזינה את האינדקס המקומי;
+    # התשובה עצמה מגיעה מהאינדקס (BM25 על כותרת/תגיות/רכיבים/הוראות)
+    upstream = await recipe_cache.cached("search", query.strip().lower(), lambda: _fetch_recipes(query))
+    total = recipe_index.search_count(query)
+    if total:
+        return total, recipe_index.search(query, limit, offset)
+    if upstream:
+        page = upstream[offset:offset + limit]
+        _refresh_derived(page)
+        return len(upstream), page
+    # אין התאמה מדויקת בשום מקום – ננסה התאמה סלחנית לשגיאות כתיב מהמאגר המקומי
+    return _fuzzy_search(query, limit, offset)
+
+
+def _fuzzy_search(query: str, limit: int, offset: int) -> tuple[int, list[dict]]:
+    ids = fuzzy_index.search(query, limit=FUZZY_MAX_RESULTS)
+    page = ids[offset:offset + limit]
+    recipes = recipe_index.get_many(page)
+    return len(ids), [recipes[rid] for rid in page if rid in recipes]
+
+
+async def get_external_recipe_by_id(rid: str):
+    recipe = await recipe_cache.cached("lookup", str(rid).strip(), lambda: _load_recipe_by_id(rid))
+    if recipe:
+        _refresh_derived([recipe])
+    return recipe
+
+
+def _refresh_derived(recipes: list[dict]):
+    # ערך ישן ב-cache (לפני שינוי בנוסחאות) – מחושב מחדש ונשמר חזרה בשתי השכבות
+    for r in recipe_derivation.ensure_derived(recipes):
+        recipe_cache.put("lookup", r["id"], r)
+        recipe_index.upsert(r)
+
+
+async def get_external_recipes_by_ids(ids: list[str], concurrency: int = BATCH_CONCURRENCY) -> list[dict]:
+    """
+    שליפה של כמה מתכונים בבת אחת. הפגיעות ב-cache חוזרות מיד, ורק ההחטאות נשלפות
+    במקביל עם מגבלת concurrency. מחזיר רשימה לפי סדר ids: {"id", "recipe", "error"}.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _bounded_load(rid: str):
+        async with sem:
+            return await _load_recipe_by_id(rid)
+
+    async def _one(rid: str):
+        return await recipe_cache.cached("lookup", rid, lambda: _bounded_load(rid))
+
+    unique = list(dict.fromkeys(str(i).strip() for i in ids if str(i).strip()))
+    results = await asyncio.gather(*(_one(rid) for rid in unique), return_exceptions=True)
+    by_id = dict(zip(unique, results))
+    _refresh_derived([r for r in results if isinstance(r, dict)])
+
+    out = []
+    for rid in (str(i).strip() for i in ids):
+        res = by_id.get(rid)
+        if isinstance(res, Exception):
+            out.append({"id": rid, "recipe": None, "error": str(res) or res.__class__.__name__})
+        elif res is None:
+            out.append({"id": rid, "recipe": None, "error": "not found"})
+        else:
+            out.append({"id": rid, "recipe": res, "error": None})
+    return out
+
+
+async def _load_recipe_by_id(rid: str):
+    # אחרי מראה מלאה המאגר המקומי מתעדכן ע"י הסנכרון המצטבר, אין צורך לשאול את TheMealDB
+    if recipe_index.is_mirrored():
+        local = recipe_index.get(rid)
+        if local is not None:
+            return local
+    return await _fetch_recipe_by_id(rid)
+
+
+async def _fetch_recipes(query: str):
+    return await _flight.do(f"search:{query.strip().lower()}", lambda: _fetch_recipes_upstream(query))
+
+
+async def _fetch_recipes_upstream(query: str):
+    meals = await get_meals("/search.php", {"s": query})
+    recipes = _adapt_many(meals)
+    recipe_index.upsert_many(recipes)
+    # תוצאות החיפוש מכילות את המתכון המלא – שומרים גם לפי מזהה כדי לחסוך lookup
+    for r in recipes:
+        recipe_cache.put("lookup", r["id"], r)
+    return recipes
+
+
+async def _fetch_recipe_by_id(rid: str):
+    return await _flight.do(f"lookup:{str(rid).strip()}", lambda: _fetch_recipe_by_id_upstream(rid))
+
+
+async def _fetch_recipe_by_id_upstream(rid: str):
+    meals = await get_meals("/lookup.php", {"i": rid})
+    if not meals:
+        return None
+    recipe = _adapt(meals[0])
+    recipe_index.upsert(recipe)
+    return recipe
+
+
+def flight_stats() -> dict:
+    return {**_flight.stats, "inflight": _flight.inflight()}
 
-def get_external_recipe_by_id(rid: str):
-    url = f"https://www.themealdb.com/api/json/v1/1/lookup.php?i={rid}"
-    r = requests.get(url, timeout=20); r.raise_for_status()
-    meals = r.json().get("meals") or []
-    return _adapt(meals[0]) if meals else None
 
 def _adapt(meal: dict):
+    return _adapt_many([meal])[0]
+
+
+def _adapt_many(meals: list[dict]) -> list[dict]:
+    """ממיר מנות TheMealDB למתכונים ומחשב להם את השדות הנגזרים במעבר אחד"""
+    return recipe_derivation.derive_many([_to_recipe(m) for m in meals])
+
+
+def _to_recipe(meal: dict) -> dict:
     ingredients = [
         {
             "name": (meal.get(f"strIngredient{i}") or "").strip(),
@@ -29,7 +211,7 @@ def _adapt(meal: dict):
         "title": meal["strMeal"],
         "image": meal["strMealThumb"],
         "tags": (meal.get("strTags") or "").split(",") if meal.get("strTags") else [],
-        "nutrition": {"cal": 300, "protein": "?", "fat": "?", "carbs": "?"},  # placeholder
+        "nutrition": None,   # ממולא ע"י recipe_derivation.derive_many
         "ingredients": ingredients,
         "steps": steps,
         "source": meal.get("strSource"),
@@ -0,0 +1,134 @@
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import chain, islice
+
+from services import recipe_index
+
+# -------------------------------
+# אינדקס טריגרמות לחיפוש סלחני לשגיאות כתיב ("chiken", "lasagne")
+# -------------------------------
+# המילון בנוי מהמילים שבכותרות ובשמות הרכיבים של המאגר המקומי.
+# כל מילה מפורקת לטריגרמות; שאילתה מחפשת מילים עם הכי הרבה טריגרמות משותפות,
+# עם תקרה על מספר המועמדים, כך שזמן התגובה תלוי בגודל המילון ולא בגודל הקורפוס.
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+MIN_SIMILARITY = 0.3         # Jaccard מינימלי בין טריגרמות השאילתה למילה
+MAX_CANDIDATES = 200         # כמה מילים עוברות לחישוב דמיון מלא לכל מילת שאילתה
+MAX_POSTING = 5000           # טריגרמה שמופיעה ביותר מילים מזה נחשבת "רעש" ומדולגת
+MAX_RECIPES_PER_WORD = 1000  # כמה מתכונים נלקחים לכל מילה דומה (כותרות קודם)
+
+# משקל המילה לפי המקום שבו הופיעה במתכון
+TITLE_WEIGHT = 1.0
+INGREDIENT_WEIGHT = 0.7
+
+
+@lru_cache(maxsize=65536)
+def trigrams(word: str) -> frozenset[str]:
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class FuzzyIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._word_id: dict[str, int] = {}
+        self._words: list[str] = []
+        self._grams: dict[str, list[int]] = defaultdict(list)       # טריגרמה → מזהי מילים
+        # מילה → מתכונים שבהם הופיעה בכותרת / ברכיבים (dict משמש כ-set ששומר סדר)
+        self._in_title: list[dict[str, None]] = []
+        self._in_ingredients: list[dict[str, None]] = []
+        # מתכון → (מילים בכותרת, מילים ברכיבים) שהוא תרם – כדי להסיר אותן כשהמתכון משתנה
+        self._words_of: dict[str, tuple[frozenset[int], frozenset[int]]] = {}
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._lock:
+            if not self._built:
+                self.add_many(recipe_index.iter_all())
+                self._built = True
+
+    def _word(self, w: str) -> int:
+        wid = self._word_id.get(w)
+        if wid is None:
+            wid = len(self._words)
+            self._word_id[w] = wid
+            self._words.append(w)
+            self._in_title.append({})
+            self._in_ingredients.append({})
+            for g in trigrams(w):
+                self._grams[g].append(wid)
+        return wid
+
+    def _word_ids(self, text: str) -> frozenset[int]:
+        return frozenset(self._word(w) for w in _WORD_RE.findall(text.lower()) if len(w) >= 3)
+
+    def add_many(self, recipes):
+        with self._lock:
+            for r in recipes:
+                rid = str(r["id"])
+                title = self._word_ids(r.get("title") or "")
+                ingredients = self._word_ids(" ".join(i.get("name") or "" for i in r.get("ingredients") or []))
+                old_title, old_ingredients = self._words_of.get(rid, (frozenset(), frozenset()))
+                # מתכון שהשתנה: מילים שכבר לא בו יוצאות (המילה עצמה נשארת במילון)
+                for wid in old_title - title:
+                    self._in_title[wid].pop(rid, None)
+                for wid in old_ingredients - ingredients:
+                    self._in_ingredients[wid].pop(rid, None)
+                for wid in title:
+                    self._in_title[wid][rid] = None
+                for wid in ingredients:
+                    self._in_ingredients[wid][rid] = None
+                self._words_of[rid] = (title, ingredients)
+
+    def on_recipes_changed(self, recipes: list[dict]):
+        if self._built:
+            self.add_many(recipes)
+
+    def _similar_words(self, qword: str) -> list[tuple[int, float]]:
+        qgrams = trigrams(qword)
+        counts: Counter[int] = Counter()
+        for g in qgrams:
+            posting = self._grams.get(g)
+            if posting and len(posting) <= MAX_POSTING:
+                counts.update(posting)
+        out = []
+        for wid, shared in counts.most_common(MAX_CANDIDATES):
+            sim = shared / (len(qgrams) + len(trigrams(self._words[wid])) - shared)
+            if sim >= MIN_SIMILARITY:
+                out.append((wid, sim))
+        return out
+
+    def search(self, query: str, limit: int = 50) -> list[str]:
+        """מחזיר מזהי מתכונים מדורגים לפי דמיון מילות השאילתה לכותרת/רכיבים"""
+        self._ensure_built()
+        qwords = [w for w in _WORD_RE.findall((query or "").lower()) if len(w) >= 3]
+        if not qwords:
+            return []
+        scores: Counter[str] = Counter()
+        with self._lock:
+            for qw in qwords:
+                best: dict[str, float] = {}
+                for wid, sim in self._similar_words(qw):
+                    hits = chain(
+                        ((rid, TITLE_WEIGHT) for rid in self._in_title[wid]),
+                        ((rid, INGREDIENT_WEIGHT) for rid in self._in_ingredients[wid]),
+                    )
+                    for rid, weight in islice(hits, MAX_RECIPES_PER_WORD):
+                        s = sim * weight
+                        if s > best.get(rid, 0.0):
+                            best[rid] = s
+                for rid, s in best.items():
+                    scores[rid] += s
+        return [rid for rid, _ in scores.most_common(limit)]
+
+    def stats(self) -> dict:
+        return {"words": len(self._words), "trigrams": len(self._grams), "built": self._built}
+
+
+fuzzy_index = FuzzyIndex()
+recipe_index.add_listener(fuzzy_index.on_recipes_changed)
@@ -0,0 +1,190 @@
+import math
+import threading
+
+import numpy as np
+
+from services import recipe_index
+from services.ingredient_normalizer import canonical_ingredient
+from services.recipe_derivation import ingredient_ids
+
+# -------------------------------
+# אינדקס הפוך: רכיב מנורמל → מזהי מתכונים
+# -------------------------------
+# כל מתכון מקבל מספר פנימי רציף (doc). לכל רכיב נשמרת רשימת docs ממוינת
+# (posting list), שנדחסת למערך int32 של NumPy בפעם הראשונה שהיא נדרשת לשאילתה.
+# הדירוג נעשה בבת אחת עם np.bincount על כל ה-postings של פריטי המזווה.
+
+MODES = ("weighted", "most", "all")
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._doc_ids: list[str] = []            # doc → recipe id
+        self._doc_of: dict[str, int] = {}        # recipe id → doc
+        self._doc_terms: list[tuple[str, ...]] = []
+        self._postings: dict[str, list[int]] = {}
+        self._arrays: dict[str, np.ndarray] = {}  # postings דחוסים (נבנים לפי דרישה)
+        self._sizes = np.zeros(0, dtype=np.int32)  # מספר הרכיבים בכל מתכון
+        self._expand_cache: dict[str, tuple[str, ...]] = {}
+
+    # ---------- בנייה ועדכון ----------
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._lock:
+            if not self._built:
+                self.add_many(recipe_index.iter_all())
+                self._built = True
+
+    def add_many(self, recipes):
+        with self._lock:
+            sizes = []
+            for r in recipes:
+                terms = tuple(ingredient_ids(r))
+                rid = str(r["id"])
+                doc = self._doc_of.get(rid)
+                if doc is None:
+                    doc = len(self._doc_ids)
+                    self._doc_ids.append(rid)
+                    self._doc_of[rid] = doc
+                    self._doc_terms.append(())
+                    sizes.append(0)
+                self._replace_terms(doc, terms)
+                if doc < len(self._sizes):
+                    self._sizes[doc] = len(terms)
+                else:
+                    sizes[doc - len(self._sizes)] = len(terms)
+            if sizes:
+                self._sizes = np.concatenate([self._sizes, np.asarray(sizes, dtype=np.int32)])
+
+    def _replace_terms(self, doc: int, terms: tuple[str, ...]):
+        old = self._doc_terms[doc]
+        if old == terms:
+            return
+        for t in set(old) - set(terms):
+            self._postings[t].remove(doc)
+            self._arrays.pop(t, None)
+        for t in set(terms) - set(old):
+            plist = self._postings.get(t)
+            if plist is None:
+                self._postings[t] = [doc]
+                self._expand_cache.clear()  # מילון הרכיבים השתנה
+            elif plist[-1] < doc:
+                plist.append(doc)
+            else:
+                # עדכון מתכון ישן: שומרים על הרשימה ממוינת
+                plist.append(doc)
+                plist.sort()
+            self._arrays.pop(t, None)
+        self._doc_terms[doc] = terms
+
+    def on_recipes_changed(self, recipes: list[dict]):
+        # עדכון מצטבר רק אם האינדקס כבר נבנה; אחרת הבנייה הראשונה תקרא הכל מהמאגר
+        if self._built:
+            self.add_many(recipes)
+
+    # ---------- שאילתות ----------
+    def _array(self, term: str) -> np.ndarray:
+        arr = self._arrays.get(term)
+        if arr is None:
+            arr = np.asarray(self._postings.get(term, ()), dtype=np.int32)
+            self._arrays[term] = arr
+        return arr
+
+    def _expand(self, item: str) -> tuple[str, ...]:
+        """פריט מזווה "chicken" תואם גם ל-"chicken breast" / "chicken thigh" (התאמה במילים שלמות)"""
+        cached = self._expand_cache.get(item)
+        if cached is None:
+            if item in self._postings:
+                exact = (item,)
+            else:
+                exact = ()
+            padded = f" {item} "
+            cached = exact + tuple(t for t in self._postings if t != item and padded in f" {t} ")
+            self._expand_cache[item] = cached
+        return cached
+
+    def _item_docs(self, item: str) -> np.ndarray:
+        terms = self._expand(item)
+        if not terms:
+            return np.zeros(0, dtype=np.int32)
+        if len(terms) == 1:
+            return self._array(terms[0])
+        return np.unique(np.concatenate([self._array(t) for t in terms]))
+
+    def search(self, pantry: list[str], mode: str = "weighted", limit: int = 20) -> list[dict]:
+        """
+        מדרג מתכונים לפי פריטי המזווה:
+        - all: רק מתכונים שמשתמשים בכל הפריטים
+        - most: מתכונים שמשתמשים לפחות בחצי מהפריטים
+        - weighted: כל מתכון שמשתמש בפריט אחד לפחות, לפי חלק הרכיבים שלו שמכוסה (משוקלל IDF)
+        מחזיר [{"id", "matched", "missing_count", "score"}] ממוין מהטוב לגרוע.
+        """
+        self._ensure_built()
+        items = list(dict.fromkeys(t for t in (canonical_ingredient(p) for p in pantry) if t))
+        if not items or not self._doc_ids:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_ids)
+            item_docs = [self._item_docs(it) for it in items]
+            covered_terms = {t for it in items for t in self._expand(it)}
+            covered_arrays = [self._array(t) for t in covered_terms]
+            sizes = self._sizes
+
+        # IDF לכל פריט: פריט נדיר (זעפרן) שווה יותר מפריט נפוץ (מלח)
+        idf = np.array([math.log((n_docs + 1) / (len(d) + 1)) + 1.0 for d in item_docs])
+        lengths = np.array([len(d) for d in item_docs])
+        if lengths.sum() == 0:
+            return []
+        all_docs = np.concatenate(item_docs)
+        matched = np.bincount(all_docs, minlength=n_docs)
+        weight = np.bincount(all_docs, weights=np.repeat(idf, lengths), minlength=n_docs)
+
+        k = len(items)
+        if mode == "all":
+            candidates = np.flatnonzero(matched == k)
+        elif mode == "most":
+            candidates = np.flatnonzero(matched >= math.ceil(k / 2))
+        else:
+            candidates = np.flatnonzero(matched > 0)
+        if candidates.size == 0:
+            return []
+
+        # כמה מרכיבי המתכון מכוסים ע"י המזווה ("chicken" יכול לכסות גם breast וגם stock)
+        covered = np.bincount(np.concatenate(covered_arrays), minlength=n_docs)[candidates]
+        missing = np.maximum(sizes[candidates] - covered, 0)
+        # כיסוי: כמה מהמתכון "נסגר" עם מה שיש בבית, והכמה מהמזווה נוצל
+        coverage = covered / np.maximum(sizes[candidates], 1)
+        usage = weight[candidates] / idf.sum()
+        score = 0.6 * coverage + 0.4 * usage
+
+        # מיון: ציון יורד, ואז פחות רכיבים חסרים
+        order = np.lexsort((missing, -score))[:limit]
+        top = candidates[order]
+
+        results = []
+        for pos, doc in zip(order, top):
+            used = [it for it, docs in zip(items, item_docs) if _contains(docs, doc)]
+            results.append({
+                "id": self._doc_ids[doc],
+                "matched": used,
+                "missing_count": int(missing[pos]),
+                "score": round(float(score[pos]), 4),
+            })
+        return results
+
+    def stats(self) -> dict:
+        return {"recipes": len(self._doc_ids), "ingredients": len(self._postings), "built": self._built}
+
+
+def _contains(sorted_docs: np.ndarray, doc: int) -> bool:
+    i = np.searchsorted(sorted_docs, doc)
+    return i < len(sorted_docs) and sorted_docs[i] == doc
+
+
+# instance יחיד לכל השרת, מתעדכן אוטומטית כשמתכונים נכנסים למאגר
+ingredient_index = IngredientIndex()
+recipe_index.add_listener(ingredient_index.on_recipes_changed)
@@ -0,0 +1,155 @@
+import csv
+import os
+import re
+from collections import deque
+from functools import lru_cache
+
+# -------------------------------
+# נרמול שמות רכיבים
+# -------------------------------
+# "Chicken Breasts" / "chicken breast," → "chicken breast"
+# משמש את האינדקס ההפוך של הרכיבים, כך שאותו רכיב נכתב תמיד באותה צורה.
+
+_NON_WORD = re.compile(r"[^a-z0-9\s]+")
+_SPACES = re.compile(r"\s+")
+
+# יחיד/רבים נפוצים ב-TheMealDB שהכלל הכללי לא מכסה
+_IRREGULAR = {"leaves": "leaf", "tomatoes": "tomato", "potatoes": "potato", "loaves": "loaf", "molasses": "molasses",
+              "chillies": "chilli", "chilies": "chili", "cookies": "cookie", "brownies": "brownie"}
+
+
+def _singular(word: str) -> str:
+    if word in _IRREGULAR:
+        return _IRREGULAR[word]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def normalize_ingredient(name: str) -> str:
+    """מחזיר צורה קנונית של שם רכיב (אותיות קטנות, בלי סימנים, ביחיד)"""
+    text = _NON_WORD.sub(" ", (name or "").lower())
+    return " ".join(_singular(w) for w in _SPACES.split(text.strip()) if w)
+
+
+# -------------------------------
+# זיהוי רכיב קנוני מתוך מילון כינויים (Aho-Corasick)
+# -------------------------------
+# המילון: data/ingredient_aliases.csv (כינוי → שם קנוני, "garbanzo beans" → "chickpea")
+# ועוד כל שמות המזונות בטבלת ההרכב (כל אחד ממופה לעצמו).
+# האוטומט בנוי על רצפי מילים, כך שכל התאמה נופלת על גבולות מילים ("pea" לא נמצא בתוך "peanut"),
+# ומעבר אחד על השם נותן לכל מיקום את הכינוי הארוך ביותר שמסתיים בו ("chicken stock" ולא "chicken").
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+ALIASES_PATH = os.getenv("INGREDIENT_ALIASES_PATH", os.path.join(DATA_DIR, "ingredient_aliases.csv"))
+FOOD_TABLE_PATH = os.getenv("FOOD_TABLE_PATH", os.path.join(DATA_DIR, "food_composition.csv"))
+
+# מילים שמתארות הכנה ולא את הרכיב עצמו – מדלגים עליהן כשמחפשים את "מילת הראש" (האחרונה)
+_DESCRIPTORS = frozenset({
+    "chopped", "sliced", "diced", "minced", "grated", "shredded", "crushed", "peeled", "halved",
+    "quartered", "cubed", "trimmed", "softened", "melted", "beaten", "rinsed", "drained", "deseeded",
+    "finely", "roughly", "thinly", "freshly", "fresh", "skinless", "boneless", "optional",
+    "to", "taste", "for", "serving", "serve", "garnish", "and", "or", "of",
+})
+
+
+class AhoCorasick:
+    """אוטומט Aho-Corasick על רצפי מילים: patterns = {("chicken", "stock"): "chicken stock", ...}"""
+
+    def __init__(self, patterns: dict[tuple[str, ...], str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, str] | None] = [None]   # (אורך במילים, ערך) של ההתאמה הארוכה שמסתיימת כאן
+        for words, value in patterns.items():
+            state = 0
+            for w in words:
+                nxt = self._goto[state].get(w)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][w] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                state = nxt
+            self._out[state] = (len(words), value)
+
+        # קישורי fail ב-BFS; מצב בלי התאמה משלו יורש את ההתאמה של הסיפא הארוכה ביותר
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for w, child in self._goto[state].items():
+                queue.append(child)
+                f = self._fail[state]
+                while f and w not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(w, 0)
+                if self._out[child] is None:
+                    self._out[child] = self._out[self._fail[child]]
+
+    def longest_at(self, words: list[str]) -> list[tuple[int, str] | None]:
+        """לכל מיקום i: (אורך, ערך) של הכינוי הארוך ביותר שמסתיים במילה i, או None"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        result = []
+        for w in words:
+            while state and w not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(w, 0)
+            result.append(out[state])
+        return result
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+def _load_patterns() -> dict[tuple[str, ...], str]:
+    patterns: dict[tuple[str, ...], str] = {}
+
+    def add(alias: str, canonical: str):
+        words = tuple(normalize_ingredient(alias).split())
+        if words:
+            patterns.setdefault(words, canonical)
+
+    with open(ALIASES_PATH, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            canonical = normalize_ingredient(row["canonical"])
+            add(canonical, canonical)
+            for alias in row["aliases"].split("|"):
+                add(alias, canonical)
+    if os.path.exists(FOOD_TABLE_PATH):
+        with open(FOOD_TABLE_PATH, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                for term in [row["name"], *row["aliases"].split("|")]:
+                    add(term, normalize_ingredient(term))
+    return patterns
+
+
+_matcher: AhoCorasick | None = None
+
+
+def get_matcher() -> AhoCorasick:
+    global _matcher
+    if _matcher is None:
+        _matcher = AhoCorasick(_load_patterns())
+    return _matcher
+
+
+@lru_cache(maxsize=65536)
+def canonical_ingredient(name: str) -> str:
+    """
+    שם קנוני של רכיב: "2 Boneless Skinless Chicken Breasts" → "chicken breast", "Garbanzo beans" → "chickpea".
+    הכינוי חייב להסתיים ב"מילת הראש" (המילה האחרונה שאינה תיאור הכנה), כך ש-"tomato ketchup"
+    לא הופך ל-"tomato". בלי התאמה מוחזר השם המנורמל כמו שהוא.
+    """
+    normalized = normalize_ingredient(name)
+    words = normalized.split()
+    head = len(words)
+    while head and words[head - 1] in _DESCRIPTORS:
+        head -= 1
+    if not head:
+        return normalized
+    match = get_matcher().longest_at(words[:head])[head - 1]
+    return match[1] if match else normalized
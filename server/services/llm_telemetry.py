@@ -0,0 +1,192 @@
+"""
+מדדי שימוש ב-Ollama לכל קריאה: כמה טוקנים נכנסו ויצאו ולאן הלך הזמן.
+
+Ollama מחזיר בסוף כל בקשה prompt_eval_count / eval_count ואת משכי השלבים (בננו-שניות):
+load_duration (טעינת המודל לזיכרון), prompt_eval_duration (prefill – עיבוד ה-prompt)
+ו-eval_duration (יצירת התשובה). ollama_client מעביר לכאן כל תשובה, ומכאן נבנים
+היסטוגרמות לכל (route, מודל): טוקנים לשנייה, עלות ה-prefill, TTFT, זמן כולל, וטעינות "קרות".
+
+ה-route נקבע ב-contextvar (set_route) בתחילת הבקשה – קריאה ל-Ollama מתוך אותה בקשה
+(או task שנוצר ממנה) נרשמת תחתיו. LLM_TELEMETRY_LOG=1 כותב שורת לוג לכל קריאה.
+"""
+
+import bisect
+import contextvars
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+# -------- הגדרות --------
+LOG_EACH = os.getenv("LLM_TELEMETRY_LOG", "0") == "1"
+# load_duration ארוך מזה = המודל נטען מהדיסק (ולא היה כבר בזיכרון)
+COLD_LOAD_MS = float(os.getenv("LLM_COLD_LOAD_MS", "1000"))
+
+# גבולות הדליים (ערך ≤ גבול); הערכים מעבר לאחרון נספרים ב-"+Inf"
+MS_BUCKETS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+TPS_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+_route: contextvars.ContextVar[str] = contextvars.ContextVar("llm_route", default="other")
+
+
+def set_route(name: str):
+    """משייך את הקריאות ל-Ollama מכאן והלאה (בבקשה / ב-task הנוכחי) ל-route"""
+    _route.set(name)
+
+
+class Histogram:
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | str | None:
+        """הערכה לפי הדליים: הגבול העליון של הדלי שבו נופל האחוזון ("+Inf" מעבר לאחרון)"""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else "+Inf"
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": round(self.sum / self.count, 1) if self.count else None,
+            "p50": self.quantile(0.5), "p95": self.quantile(0.95),
+            "buckets": {str(b): c for b, c in zip(self.bounds + ("+Inf",), self.counts)},
+        }
+
+
+class _Series:
+    """כל המדדים של route אחד ומודל אחד"""
+
+    def __init__(self):
+        self.counters = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cold_loads": 0,
+                         "cancelled": 0, "errors": 0}
+        self.hist = {
+            "tokens_per_sec": Histogram(TPS_BUCKETS),
+            "prefill_ms": Histogram(MS_BUCKETS),
+            "prefill_tokens": Histogram(TOKEN_BUCKETS),
+            "ttft_ms": Histogram(MS_BUCKETS),
+            "load_ms": Histogram(MS_BUCKETS),
+            "total_ms": Histogram(MS_BUCKETS),
+        }
+
+    def snapshot(self) -> dict:
+        return {**self.counters, **{name: h.snapshot() for name, h in self.hist.items()}}
+
+
+_series: dict[tuple[str, str], _Series] = {}
+# טוקנים לשנייה (ממוצע נע) לכל מודל – לכל ה-routes יחד
+_tps: dict[str, float] = {}
+_started = time.time()
+
+
+def _get(route: str, model: str) -> _Series:
+    series = _series.get((route, model))
+    if series is None:
+        series = _series[(route, model)] = _Series()
+    return series
+
+
+def record(model: str, final: dict, ttft_ms: float | None = None, wall_ms: float | None = None, kind: str = "generate"):
+    """
+    final = התשובה המלאה (בלי stream) או השורה האחרונה ב-stream.
+    ttft_ms – מהשליחה ל-Ollama ועד הטוקן הראשון (רק ב-stream).
+    """
+    route = _route.get()
+    series = _get(route, model)
+    c, h = series.counters, series.hist
+
+    def ms(key: str) -> float:
+        return (final.get(key) or 0) / 1e6
+
+    prompt_tokens, eval_tokens = final.get("prompt_eval_count") or 0, final.get("eval_count") or 0
+    load_ms, prefill_ms, eval_ms = ms("load_duration"), ms("prompt_eval_duration"), ms("eval_duration")
+    total_ms = ms("total_duration") or wall_ms or 0
+    tps = eval_tokens / (eval_ms / 1000) if eval_tokens and eval_ms else None
+
+    c["calls"] += 1
+    c["prompt_tokens"] += prompt_tokens
+    c["completion_tokens"] += eval_tokens
+    if load_ms >= COLD_LOAD_MS:
+        c["cold_loads"] += 1
+        log.info("ollama cold load of %s took %.0fms", model, load_ms)
+    h["load_ms"].observe(load_ms)
+    h["total_ms"].observe(total_ms)
+    if "prompt_eval_duration" in final:
+        h["prefill_ms"].observe(prefill_ms)
+    if prompt_tokens:
+        h["prefill_tokens"].observe(prompt_tokens)
+    if ttft_ms is not None:
+        h["ttft_ms"].observe(ttft_ms)
+    if tps is not None:
+        h["tokens_per_sec"].observe(tps)
+        _tps[model] = tps if model not in _tps else 0.8 * _tps[model] + 0.2 * tps
+
+    if LOG_EACH:
+        log.info(
+            "llm %s route=%s model=%s load=%.0fms prefill=%.0fms/%d tok ttft=%s eval=%.0fms/%d tok (%s tok/s) total=%.0fms",
+            kind, route, model, load_ms, prefill_ms, prompt_tokens,
+            f"{ttft_ms:.0f}ms" if ttft_ms is not None else "-", eval_ms, eval_tokens,
+            f"{tps:.1f}" if tps is not None else "-", total_ms,
+        )
+
+
+def record_failure(model: str, cancelled: bool, tokens: int = 0, wall_ms: float | None = None):
+    """קריאה שלא הגיעה לסוף: ביטול (הלקוח התנתק / דדליין) או שגיאה מ-Ollama"""
+    route = _route.get()
+    series = _get(route, model)
+    series.counters["cancelled" if cancelled else "errors"] += 1
+    series.counters["completion_tokens"] += tokens
+    if LOG_EACH:
+        log.info("llm %s route=%s model=%s after %d tok, %s",
+                 "cancelled" if cancelled else "failed", route, model, tokens,
+                 f"{wall_ms:.0f}ms" if wall_ms is not None else "-")
+
+
+def tokens_per_second(model: str) -> float | None:
+    return _tps.get(model)
+
+
+def snapshot() -> dict:
+    routes: dict[str, dict] = {}
+    for (route, model), series in sorted(_series.items()):
+        routes.setdefault(route, {})[model] = series.snapshot()
+    return {
+        "since": _started,
+        "tokens_per_second": {m: round(v, 1) for m, v in _tps.items()},
+        "routes": routes,
+    }
+
+
+def prometheus() -> str:
+    """אותם מדדים בפורמט הטקסט של Prometheus"""
+    items = sorted(_series.items())
+    lines = []
+    # כל השורות של מדד אחד צריכות להיות רצופות
+    for name in _Series().counters:
+        lines.append(f"# TYPE llm_{name}_total counter")
+        for (route, model), series in items:
+            lines.append(f'llm_{name}_total{{route="{route}",model="{model}"}} {series.counters[name]}')
+    for name in _Series().hist:
+        lines.append(f"# TYPE llm_{name} histogram")
+        for (route, model), series in items:
+            labels, h, cumulative = f'route="{route}",model="{model}"', series.hist[name], 0
+            for bound, c in zip(h.bounds + ("+Inf",), h.counts):
+                cumulative += c
+                lines.append(f'llm_{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"llm_{name}_sum{{{labels}}} {round(h.sum, 3)}")
+            lines.append(f"llm_{name}_count{{{labels}}} {h.count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,227 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+from services.ingredient_normalizer import normalize_ingredient, canonical_ingredient
+
+# -------------------------------
+# פענוח כמויות (strMeasure של TheMealDB) לגרמים
+# -------------------------------
+# "1 cup", "200g", "1/2 tsp", "1½ cups", "2-3 large", "2 x 400g tins", "Pinch".
+# יחידות נפח מומרות לגרמים לפי טבלת צפיפות לרכיב (קמח קל ממים, דבש כבד ממנו),
+# יחידות ספירה ("2 large", "3 cloves") מוחזרות ככמות ומשקל היחידה נקבע ע"י מי שקורא.
+# התוצאה נשמרת ב-cache לפי (measure, ingredient) – ב-TheMealDB אותם צירופים חוזרים שוב ושוב.
+
+
+class Measure(NamedTuple):
+    quantity: float | None       # בטווח ("2-3") – הגבול התחתון
+    quantity_max: float | None
+    unit: str | None             # שם קנוני ("g", "ml", "tbsp", "clove", ...)
+    kind: str                    # "mass" | "volume" | "count" | "none"
+    grams: float | None          # None כשאי אפשר לדעת בלי משקל יחידה של המזון
+
+
+# -------- יחידות --------
+# קנוני → (סוג, גרמים/מ"ל ליחידה, כינויים)
+_UNITS = {
+    "g": ("mass", 1.0, ("g", "gr", "grm", "gram", "grams", "gramme", "grammes")),
+    "kg": ("mass", 1000.0, ("kg", "kgs", "kilo", "kilos", "kilogram", "kilograms")),
+    "oz": ("mass", 28.35, ("oz", "ounce", "ounces")),
+    "lb": ("mass", 453.6, ("lb", "lbs", "pound", "pounds")),
+    "can": ("mass", 400.0, ("can", "cans", "tin", "tins")),
+    "knob": ("mass", 15.0, ("knob", "knobs")),
+    "handful": ("mass", 30.0, ("handful", "handfuls")),
+    "bunch": ("mass", 50.0, ("bunch", "bunches")),
+    "ml": ("volume", 1.0, ("ml", "mls", "millilitre", "millilitres", "milliliter", "milliliters")),
+    "cl": ("volume", 10.0, ("cl", "centilitre", "centilitres")),
+    "dl": ("volume", 100.0, ("dl", "decilitre", "decilitres")),
+    "l": ("volume", 1000.0, ("l", "ltr", "litre", "litres", "liter", "liters")),
+    "fl oz": ("volume", 29.57, ("fl oz", "fl. oz", "floz", "fluid ounce", "fluid ounces")),
+    "tsp": ("volume", 5.0, ("tsp", "tsps", "tspn", "teaspoon", "teaspoons", "tea spoon")),
+    "dsp": ("volume", 10.0, ("dsp", "dessertspoon", "dessertspoons", "dessert spoon", "dessert spoons")),
+    "tbsp": ("volume", 15.0, ("tbsp", "tbsps", "tbs", "tbls", "tblsp", "tblspn", "tbl", "tablespoon",
+                              "tablespoons", "table spoon", "table spoons")),
+    "cup": ("volume", 240.0, ("cup", "cups")),
+    "pint": ("volume", 568.0, ("pint", "pints", "pt")),
+    "quart": ("volume", 946.0, ("quart", "quarts", "qt")),
+    "pinch": ("volume", 0.31, ("pinch", "pinches")),
+    "dash": ("volume", 0.62, ("dash", "dashes")),
+    "splash": ("volume", 5.0, ("splash", "splashes")),
+    "drizzle": ("volume", 10.0, ("drizzle",)),
+    "sprinkling": ("volume", 1.0, ("sprinkling", "sprinkle")),
+    # יחידות ספירה: הערך הוא מכפיל גודל (large = יחידה גדולה מהממוצע)
+    "piece": ("count", 1.0, ("piece", "pieces", "whole", "medium", "pcs", "pc")),
+    "large": ("count", 1.25, ("large", "big")),
+    "small": ("count", 0.75, ("small",)),
+    "clove": ("count", 1.0, ("clove", "cloves")),
+    "slice": ("count", 1.0, ("slice", "slices", "rasher", "rashers")),
+    "fillet": ("count", 1.0, ("fillet", "fillets")),
+    "stick": ("count", 1.0, ("stick", "sticks", "stalk", "stalks")),
+    "sprig": ("count", 1.0, ("sprig", "sprigs")),
+    "leaf": ("count", 1.0, ("leaf", "leaves")),
+    "sheet": ("count", 1.0, ("sheet", "sheets")),
+    "packet": ("count", 1.0, ("packet", "packets", "pack", "packs", "sachet", "sachets")),
+}
+_ALIAS = {alias: canon for canon, (_, _, aliases) in _UNITS.items() for alias in aliases}
+# חלופות ארוכות קודם ("fl oz" לפני "oz", "tbsp" לפני "tbs"); אחרי היחידה לא תבוא אות ("200g" כן, "grated" לא)
+_UNIT_ALT = "|".join(re.escape(a) for a in sorted(_ALIAS, key=len, reverse=True))
+
+# -------- צפיפות (גרם למ"ל) לפי רכיב --------
+# ברירת מחדל: מים. המפתחות מנורמלים כמו שמות רכיבים, ההתאמה לפי רצף המילים הארוך ביותר.
+DEFAULT_DENSITY = 1.0
+_DENSITY_RAW = {
+    "flour": 0.53, "plain flour": 0.53, "self raising flour": 0.53, "bread flour": 0.55,
+    "cornflour": 0.5, "cornstarch": 0.5, "cocoa": 0.42, "cocoa powder": 0.42,
+    "sugar": 0.85, "caster sugar": 0.85, "brown sugar": 0.83, "icing sugar": 0.5, "powdered sugar": 0.5,
+    "honey": 1.42, "maple syrup": 1.32, "golden syrup": 1.4, "syrup": 1.37, "molasses": 1.4,
+    "butter": 0.96, "oil": 0.92, "olive oil": 0.91, "vegetable oil": 0.92,
+    "milk": 1.03, "cream": 1.0, "double cream": 0.99, "yogurt": 1.03, "sour cream": 1.0,
+    "rice": 0.85, "oat": 0.41, "rolled oat": 0.41, "breadcrumb": 0.45, "couscous": 0.7,
+    "cheese": 0.4, "grated cheese": 0.4, "parmesan": 0.4, "cheddar cheese": 0.4,
+    "salt": 1.2, "sea salt": 1.0, "black pepper": 0.5, "pepper": 0.5, "baking powder": 0.9,
+    "bicarbonate of soda": 0.9, "baking soda": 0.9, "yeast": 0.6,
+    "cumin": 0.5, "paprika": 0.46, "cinnamon": 0.56, "turmeric": 0.6, "chilli powder": 0.5,
+    "curry powder": 0.5, "garam masala": 0.5, "ground ginger": 0.5, "nutmeg": 0.5, "oregano": 0.2,
+    "thyme": 0.2, "dried herb": 0.2, "parsley": 0.25, "coriander": 0.25, "basil": 0.25, "mint": 0.25,
+    "pea": 0.6, "sweetcorn": 0.7, "lentil": 0.8, "chickpea": 0.7, "raisin": 0.65, "sultana": 0.65,
+    "almond": 0.6, "ground almond": 0.4, "walnut": 0.5, "peanut": 0.6, "peanut butter": 1.08,
+    "desiccated coconut": 0.35, "chocolate chip": 0.6, "onion": 0.6, "mushroom": 0.4, "spinach": 0.2,
+    "tomato puree": 1.1, "tomato paste": 1.1, "ketchup": 1.15, "soy sauce": 1.15, "mayonnaise": 0.91,
+    "coconut milk": 0.97, "stock": 1.0, "water": 1.0, "wine": 0.99, "vinegar": 1.01,
+}
+_DENSITY = {normalize_ingredient(k): v for k, v in _DENSITY_RAW.items()}
+_DENSITY_MAX_WORDS = max(len(k.split()) for k in _DENSITY)
+
+# -------- ביטויים רגולריים (מקומפלים פעם אחת) --------
+_UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅕": "1/5", "⅖": "2/5",
+    "⅗": "3/5", "⅘": "4/5", "⅙": "1/6", "⅚": "5/6", "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+_UNICODE_RE = re.compile(r"(\d)?\s*([" + "".join(_UNICODE_FRACTIONS) + "])")
+_THOUSANDS_RE = re.compile(r"(\d),(\d{3})(?!\d)")
+_DECIMAL_COMMA_RE = re.compile(r"(\d),(\d)")
+_LEADING_DOT_RE = re.compile(r"(?<![\d.])\.(\d)")                                   # ".5 cup" → "0.5 cup"
+_HYPHEN_MIXED_RE = re.compile(r"(?<![\d/.])(\d+)\s*-\s*(\d+/\d+)")                  # "1-1/2" → "1 1/2"
+
+_QTY = r"\d+(?:\.\d+)?(?:\s+\d+/\d+)?(?:/\d+)?"
+_UNIT = rf"(?:{_UNIT_ALT})(?![a-z])\.?"
+_RANGE_SEP = r"\s*(?:-|–|to|or)\s*"
+_MULTIPLIED_RE = re.compile(rf"^({_QTY})\s*[x×]\s*({_QTY})\s*({_UNIT})")           # "2 x 400g tins"
+_PAREN_RE = re.compile(rf"\(\s*({_QTY})\s*({_UNIT})\s*\)")                        # "1 (400g) can"
+_LEADING_RE = re.compile(rf"^({_QTY})(?:{_RANGE_SEP}({_QTY}))?\s*(?:({_UNIT}))?")  # "2-3 tbsp"
+_UNIT_ONLY_RE = re.compile(rf"^(?:a\s+|an\s+)?({_UNIT})")                          # "Pinch", "a handful"
+_ANY_QTY_RE = re.compile(rf"(?<![\d/.])({_QTY})(?:\s*({_UNIT}))?")                  # "Juice of 1"
+_NONE = Measure(None, None, None, "none", None)
+
+
+def _number(text: str) -> float:
+    """"1 1/2" / "3/4" / "2.5" → float"""
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            num, den = part.split("/", 1)
+            total += float(num) / max(float(den), 1.0)
+        else:
+            total += float(part)
+    return total
+
+
+def _clean(measure: str) -> str:
+    text = (measure or "").strip().lower().replace("⁄", "/")
+    text = _UNICODE_RE.sub(lambda m: (m.group(1) + " " if m.group(1) else "") + _UNICODE_FRACTIONS[m.group(2)], text)
+    text = _THOUSANDS_RE.sub(r"\1\2", text)
+    text = _DECIMAL_COMMA_RE.sub(r"\1.\2", text)
+    # במתכונים אמריקאיים "1-1/2" הוא מספר מעורב ולא טווח
+    text = _HYPHEN_MIXED_RE.sub(r"\1 \2", text)
+    return _LEADING_DOT_RE.sub(r"0.\1", text)
+
+
+@lru_cache(maxsize=4096)
+def density_for(ingredient: str) -> float:
+    """צפיפות (גרם למ"ל) של רכיב, לפי רצף המילים הארוך ביותר שמופיע בטבלה"""
+    exact = _DENSITY.get(normalize_ingredient(ingredient))
+    if exact is not None:
+        return exact
+    # כינוי נרדף ("all purpose flour" → "plain flour") ואז רצף המילים הארוך ביותר
+    words = canonical_ingredient(ingredient).split()
+    for n in range(min(_DENSITY_MAX_WORDS, len(words)), 0, -1):
+        for i in range(len(words) - n + 1):
+            d = _DENSITY.get(" ".join(words[i:i + n]))
+            if d is not None:
+                return d
+    return DEFAULT_DENSITY
+
+
+def _measure(qty: float, qty_max: float | None, unit_text: str | None, ingredient: str) -> Measure:
+    mid = (qty + qty_max) / 2 if qty_max is not None else qty
+    if not unit_text:
+        return Measure(qty, qty_max, None, "count", None)
+    canon = _ALIAS[unit_text.rstrip(".")]
+    kind, factor, _ = _UNITS[canon]
+    if kind == "mass":
+        grams = mid * factor
+    elif kind == "volume":
+        grams = mid * factor * density_for(ingredient)
+    else:
+        # יחידות ספירה: הכמות מוכפלת במכפיל הגודל ("2 large" = 2.5 יחידות רגילות), המשקל נקבע לפי המזון
+        unit = "piece" if canon in ("large", "small") else canon
+        return Measure(qty * factor, qty_max * factor if qty_max is not None else None, unit, "count", None)
+    return Measure(qty, qty_max, canon, kind, round(grams, 2))
+
+
+@lru_cache(maxsize=16384)
+def parse_measure(measure: str, ingredient: str = "") -> Measure:
+    """מפענח strMeasure לכמות, יחידה קנונית וגרמים (כשאפשר) עבור הרכיב הנתון"""
+    try:
+        return _parse(measure, ingredient)
+    except (ValueError, ZeroDivisionError, KeyError):
+        # כמות משובשת ("1½/2 cups") – עדיף "לא ידוע" מאשר להפיל את כל המתכון
+        return _NONE
+
+
+def _parse(measure: str, ingredient: str) -> Measure:
+    text = _clean(measure)
+    if not text:
+        return _NONE
+
+    m = _MULTIPLIED_RE.match(text)
+    if m:
+        inner = _measure(_number(m.group(2)), None, m.group(3), ingredient)
+        if inner.grams is not None:
+            count = _number(m.group(1))
+            return Measure(count, None, inner.unit, inner.kind, round(inner.grams * count, 2))
+
+    m = _LEADING_RE.match(text)
+    if m:
+        qty = _number(m.group(1))
+        qty_max = _number(m.group(2)) if m.group(2) else None
+        if qty_max is not None and qty_max < qty:
+            qty_max = None   # "3-2" אינו טווח – נשארים עם הכמות הראשונה
+        unit_text = m.group(3)
+        # "1 (400g) can" – המשקל שבסוגריים מדויק יותר מהיחידה
+        paren = _PAREN_RE.search(text, m.end())
+        if paren and (unit_text is None or _UNITS[_ALIAS[unit_text.rstrip(".")]][0] != "mass"):
+            inner = _measure(_number(paren.group(1)), None, paren.group(2), ingredient)
+            if inner.grams is not None:
+                mid = (qty + qty_max) / 2 if qty_max is not None else qty
+                return Measure(qty, qty_max, inner.unit, inner.kind, round(inner.grams * mid, 2))
+        if unit_text is None:
+            # "2 large", "3 medium" – היחידה יכולה לבוא אחרי מילה נוספת ("2 tins chopped", "1 heaped tbsp")
+            later = re.match(rf"\s*(?:heaped|level|rounded|generous|good|scant|[a-z]+ed)?\s*({_UNIT})", text[m.end():])
+            if later:
+                unit_text = later.group(1)
+        return _measure(qty, qty_max, unit_text, ingredient)
+
+    m = _UNIT_ONLY_RE.match(text)
+    if m:
+        return _measure(1.0, None, m.group(1), ingredient)
+
+    # "Juice of 1", "zest of 2" – מספר באמצע הטקסט
+    m = _ANY_QTY_RE.search(text)
+    if m:
+        return _measure(_number(m.group(1)), None, m.group(2), ingredient)
+    return _NONE
+
+
+def cache_stats() -> dict:
+    return {"parse": parse_measure.cache_info()._asdict(), "density": density_for.cache_info()._asdict()}
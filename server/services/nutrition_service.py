@@ -0,0 +1,118 @@
+import csv
+import os
+
+import numpy as np
+
+from services.ingredient_normalizer import normalize_ingredient, canonical_ingredient
+from services.measure_parser import parse_measure
+
+# -------------------------------
+# חישוב ערכים תזונתיים למתכון
+# -------------------------------
+# טבלת הרכב מזון (ערכים ל-100 גרם) נטענת פעם אחת למערכי NumPy.
+# כל שורת רכיב מתורגמת ל-(מתכון, מזון, גרמים), והסכומים לכל המתכונים
+# מחושבים במעבר וקטורי אחד (np.add.at) על כל השורות יחד.
+
+FOOD_TABLE_PATH = os.getenv(
+    "FOOD_TABLE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "food_composition.csv"),
+)
+
+# עמודות מטריצת המאקרו, באותו סדר כמו שדות Nutrition
+MACROS = ("cal", "protein", "fat", "carbs")
+
+# כמות ברירת מחדל לרכיב בלי כמות ("salt", "to taste") – קורט, כמעט לא משפיע
+DEFAULT_GRAMS = 5.0
+# משקל יחידה כשהמזון לא בטבלה או שאין לו משקל יחידה ("2 packets")
+DEFAULT_PIECE_GRAMS = 50.0
+# כמה שמות רכיבים (כפי שהגיעו) זוכרים עם המזון שהותאם להם
+MATCH_CACHE_MAX = 16384
+
+
+class NutritionService:
+    def __init__(self, path: str = FOOD_TABLE_PATH):
+        names, macros, piece = [], [], []
+        self._alias: dict[str, int] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                idx = len(names)
+                names.append(row["name"])
+                macros.append([float(row["kcal"]), float(row["protein"]), float(row["fat"]), float(row["carbs"])])
+                piece.append(float(row["piece_g"]))
+                for alias in [row["name"], *row["aliases"].split("|")]:
+                    self._alias.setdefault(normalize_ingredient(alias), idx)
+        self.names = names
+        self.per_gram = np.asarray(macros, dtype=np.float64) / 100.0   # (foods, 4)
+        self.piece_g = np.asarray(piece, dtype=np.float64)
+        self._max_words = max(len(a.split()) for a in self._alias)
+        # שם → אינדקס מזון; כשמתמלא יוצאים הוותיקים ביותר
+        self._matches: dict[str, int] = {}
+        self._match_stats = {"hits": 0, "misses": 0}
+
+    # ---------- התאמת רכיב למזון ----------
+    def match(self, name: str) -> int:
+        """מחזיר את אינדקס המזון בטבלה, או -1. השם עובר קודם דרך המנרמל המשותף ("garbanzo beans" → "chickpea")"""
+        idx = self._matches.get(name)
+        if idx is not None:
+            self._match_stats["hits"] += 1
+            return idx
+        self._match_stats["misses"] += 1
+        idx = self._match(name)
+        if len(self._matches) >= MATCH_CACHE_MAX:
+            self._matches.pop(next(iter(self._matches)), None)
+        self._matches[name] = idx
+        return idx
+
+    def _match(self, name: str) -> int:
+        canonical = canonical_ingredient(name)
+        idx = self._alias.get(canonical)
+        if idx is not None:
+            return idx
+        # לשם הקנוני אין שורה משלו ("pork mince") – רצף המילים הארוך ביותר שיש לו
+        words = canonical.split()
+        for n in range(min(self._max_words, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                idx = self._alias.get(" ".join(words[i:i + n]))
+                if idx is not None:
+                    return idx
+        return -1
+
+    def grams(self, amount: str, name: str, food: int) -> float:
+        """משקל בגרמים של שורת רכיב; יחידות ספירה ("2 large") לפי משקל יחידה של המזון"""
+        m = parse_measure(amount, name)
+        if m.grams is not None:
+            return m.grams
+        if m.kind == "count":
+            piece = self.piece_g[food] if food >= 0 else 0.0
+            mid = (m.quantity + m.quantity_max) / 2 if m.quantity_max is not None else m.quantity
+            return mid * (piece if piece > 0 else DEFAULT_PIECE_GRAMS)
+        return DEFAULT_GRAMS
+
+    # ---------- חישוב ----------
+    def compute_many(self, recipes_ingredients: list[list[dict]]) -> list[dict]:
+        """מחשב {"cal","protein","fat","carbs"} (סה"כ למתכון) לכל רשימת רכיבים, במעבר אחד"""
+        rows, foods, grams = [], [], []
+        for r, ingredients in enumerate(recipes_ingredients):
+            for ing in ingredients or []:
+                name = ing.get("name") or ""
+                food = self.match(name)
+                if food < 0:
+                    continue
+                rows.append(r)
+                foods.append(food)
+                grams.append(self.grams(ing.get("amount") or "", name, food))
+
+        totals = np.zeros((len(recipes_ingredients), len(MACROS)), dtype=np.float64)
+        if rows:
+            foods_arr = np.asarray(foods, dtype=np.int32)
+            np.add.at(totals, np.asarray(rows, dtype=np.int32),
+                      self.per_gram[foods_arr] * np.asarray(grams, dtype=np.float64)[:, None])
+        totals = np.round(totals, 1)
+        return [dict(zip(MACROS, map(float, t))) for t in totals]
+
+    def stats(self) -> dict:
+        match_cache = {**self._match_stats, "size": len(self._matches), "max_size": MATCH_CACHE_MAX}
+        return {"foods": len(self.names), "aliases": len(self._alias), "match_cache": match_cache}
+
+
+nutrition_service = NutritionService()
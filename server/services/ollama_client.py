@@ -1,17 +1,191 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator
 
 import httpx
 
-async def ollama_generate(prompt: str, system: str = "", temperature: float = 0.3) -> str:
-    url = "http://localhost:11434/api/generate"
+from services import llm_telemetry
+
+log = logging.getLogger(__name__)
+
+# -------- הגדרות (מתוך .env) --------
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434").rstrip("/")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+# כמה זמן Ollama משאיר את המודל טעון בזיכרון אחרי הבקשה האחרונה ("30m", "1h", "-1" = תמיד)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# טעינת המודל ב-startup, לפני השאלה הראשונה
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "1") == "1"
+
+# לקוח HTTP משותף לכל הקריאות ל-Ollama – נפתח ב-startup ונסגר ב-shutdown
+_client: httpx.AsyncClient | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    """
+    AsyncClient עם keep-alive ו-pool חיבורים מול Ollama.
+    read הוא הזמן המקסימלי בין חלקים של התשובה (ב-stream) או עד התשובה המלאה (בלי stream).
+    """
+    timeout = httpx.Timeout(
+        connect=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3")),
+        read=float(os.getenv("OLLAMA_READ_TIMEOUT", "120")),
+        write=10.0,
+        pool=float(os.getenv("OLLAMA_POOL_TIMEOUT", "10")),
+    )
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10")),
+        max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=60.0,
+    )
+    return httpx.AsyncClient(base_url=OLLAMA_URL, timeout=timeout, limits=limits)
+
+
+async def start_client():
+    """נקרא ב-startup של האפליקציה"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def close_client():
+    """נקרא ב-shutdown של האפליקציה – סוגר את כל החיבורים הפתוחים"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """מחזיר את הלקוח המשותף (ויוצר אותו אם האפליקציה לא עלתה דרך startup, למשל בסקריפטים)"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def _payload(prompt: str, system: str, stream: bool, model: str | None, temperature: float | None,
+             num_predict: int | None, num_ctx: int | None, options: dict | None,
+             context: list[int] | None = None) -> dict:
+    # פרמטרי דגימה ואורך הולכים תחת "options"; Ollama מתעלם מהם ברמה העליונה
+    opts = {
+        k: v for k, v in (("temperature", temperature), ("num_predict", num_predict), ("num_ctx", num_ctx))
+        if v is not None
+    }
+    opts.update(options or {})
     payload = {
-        "model": "llama3",
+        "model": model or OLLAMA_MODEL,
         "prompt": prompt,
         "system": system,
-        "temperature": temperature,
-        "stream": False
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
     }
+    if opts:
+        payload["options"] = opts
+    if context:
+        # ה-context שהוחזר בתשובה הקודמת: Ollama ממשיך ממנו בלי לעבד מחדש את כל השיחה
+        payload["context"] = context
+    return payload
+
+
+async def ollama_generate_json(prompt: str, system: str = "", temperature: float | None = 0.3, *,
+                               model: str | None = None, num_predict: int | None = None,
+                               num_ctx: int | None = None, options: dict | None = None,
+                               context: list[int] | None = None) -> dict:
+    """התשובה המלאה של Ollama: response, context והמדדים"""
+    payload = _payload(prompt, system, False, model, temperature, num_predict, num_ctx, options, context)
+    started = time.perf_counter()
+    try:
+        response = await get_client().post("/api/generate", json=payload)
+        response.raise_for_status()
+    except (httpx.HTTPError, asyncio.CancelledError) as e:
+        llm_telemetry.record_failure(payload["model"], isinstance(e, asyncio.CancelledError),
+                                     wall_ms=(time.perf_counter() - started) * 1000)
+        raise
+    result = response.json()
+    llm_telemetry.record(payload["model"], result, wall_ms=(time.perf_counter() - started) * 1000)
+    return result
+
+
+async def ollama_generate(prompt: str, system: str = "", temperature: float | None = 0.3, *,
+                          model: str | None = None, num_predict: int | None = None,
+                          num_ctx: int | None = None, options: dict | None = None,
+                          context: list[int] | None = None) -> str:
+    result = await ollama_generate_json(prompt, system, temperature, model=model, num_predict=num_predict,
+                                        num_ctx=num_ctx, options=options, context=context)
+    return result["response"]
+
+
+async def ollama_generate_stream(prompt: str, system: str = "", temperature: float | None = 0.3, *,
+                                 model: str | None = None, num_predict: int | None = None,
+                                 num_ctx: int | None = None, options: dict | None = None,
+                                 context: list[int] | None = None) -> AsyncIterator[dict]:
+    """
+    אותה בקשה במצב stream: Ollama מחזיר NDJSON – שורת JSON לכל חלק של התשובה
+    ({"response": "...", "done": false}) ושורה אחרונה עם "done": true והמדדים.
+    מחזיר את החלקים אחד-אחד ברגע שהם מגיעים.
+    """
+    payload = _payload(prompt, system, True, model, temperature, num_predict, num_ctx, options, context)
+    started = time.perf_counter()
+    ttft_ms, tokens, finished = None, 0, False
+    try:
+        async with get_client().stream("POST", "/api/generate", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("response"):
+                    tokens += 1
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                if chunk.get("done"):
+                    finished = True
+                    llm_telemetry.record(payload["model"], chunk, ttft_ms=ttft_ms,
+                                         wall_ms=(time.perf_counter() - started) * 1000, kind="stream")
+                yield chunk
+    except BaseException as e:
+        # נסגר לפני השורה האחרונה: ביטול מצד הקורא (GeneratorExit / CancelledError) או שגיאה
+        if not finished:
+            llm_telemetry.record_failure(payload["model"], isinstance(e, (GeneratorExit, asyncio.CancelledError)),
+                                         tokens, (time.perf_counter() - started) * 1000)
+        raise
+
+
+async def warmup(model: str | None = None):
+    """
+    טוען את המודל לזיכרון של Ollama (בקשה עם prompt ריק) כדי שהשאלה הראשונה
+    לא תשלם את זמן הטעינה. כישלון רק נרשם ללוג – השרת עולה גם בלי Ollama.
+    """
+    llm_telemetry.set_route("warmup")
+    try:
+        response = await get_client().post(
+            "/api/generate", json={"model": model or OLLAMA_MODEL, "prompt": "", "stream": False, "keep_alive": OLLAMA_KEEP_ALIVE},
+        )
+        response.raise_for_status()
+        llm_telemetry.record(model or OLLAMA_MODEL, response.json(), kind="warmup")
+        log.info("ollama model %s loaded", model or OLLAMA_MODEL)
+    except httpx.HTTPError as e:
+        log.warning("ollama warmup failed: %s", e)
+
+
+# -------- embeddings --------
+OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        response = await client.post(url, json=payload)
+async def ollama_embed(texts: list[str], model: str | None = None) -> list[list[float]]:
+    """וקטור לכל טקסט, בבקשה אחת (/api/embed מקבל רשימה ב-"input")"""
+    model = model or OLLAMA_EMBED_MODEL
+    started = time.perf_counter()
+    try:
+        response = await get_client().post(
+            "/api/embed", json={"model": model, "input": texts, "keep_alive": OLLAMA_KEEP_ALIVE},
+        )
         response.raise_for_status()
-        return response.json()["response"]
+    except httpx.HTTPError:
+        llm_telemetry.record_failure(model, False, wall_ms=(time.perf_counter() - started) * 1000)
+        raise
+    result = response.json()
+    llm_telemetry.record(model, result, wall_ms=(time.perf_counter() - started) * 1000, kind="embed")
+    return result["embeddings"]
@@ -0,0 +1,228 @@
+"""
+תור מול Ollama: מגביל כמה יצירות רצות במקביל, ושאר הבקשות ממתינות בתור חסום.
+
+- שתי עדיפויות: interactive (משתמש מחכה לתשובה) לפני background (prefetch וכו').
+- הוגנות: בתוך כל עדיפות התור מסתובב בין המשתמשים (round-robin), כך שמשתמש אחד
+  ששולח הרבה שאלות לא מעכב את כולם.
+- לחץ חוזר (backpressure): בקשה שלא תגיע לתורה בזמן נדחית מיד עם 429/503 ו-Retry-After,
+  במקום לחכות עד ש-httpx יפיל אותה אחרי שהעבודה כבר בוזבזה.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+
+class SchedulerBusy(Exception):
+    """הבקשה נדחתה: status_code הוא 429 (המשתמש חרג מחלקו) או 503 (השרת עמוס)"""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Ticket:
+    """מקום שהוקצה לבקשה; מוחזר ל-release בסיום"""
+
+    __slots__ = ("user", "priority", "enqueued_at", "started_at", "released")
+
+    def __init__(self, user: str, priority: str):
+        self.user = user
+        self.priority = priority
+        self.enqueued_at = time.perf_counter()
+        self.started_at = None
+        self.released = False
+
+
+class OllamaScheduler:
+    def __init__(self, concurrency: int, max_queue: int, max_background_queue: int,
+                 max_per_user: int, max_wait: float, expected_seconds: float):
+        self.concurrency = concurrency
+        self.max_queue = {INTERACTIVE: max_queue, BACKGROUND: max_background_queue}
+        self.max_per_user = max_per_user
+        self.max_wait = max_wait
+        # זמן יצירה ממוצע (ממוצע נע) – משמש להערכת זמן ההמתנה בתור
+        self.service_seconds = expected_seconds
+        self._active = 0
+        # לכל עדיפות: משתמש → התור שלו; סדר המפתחות הוא סדר הסבב
+        self._queues: dict[str, OrderedDict[str, deque[tuple[Ticket, asyncio.Future]]]] = {
+            p: OrderedDict() for p in PRIORITIES
+        }
+        self._waits_ms: deque[float] = deque(maxlen=1000)
+        self.stats = {
+            "admitted": 0, "queued": 0, "completed": 0, "rejected_user_limit": 0, "rejected_queue_full": 0,
+            "rejected_wait": 0, "timeouts": 0, "cancelled_waiting": 0,
+        }
+
+    # -------- מצב התור --------
+    def depth(self, priority: str | None = None) -> int:
+        priorities = (priority,) if priority else PRIORITIES
+        return sum(len(q) for p in priorities for q in self._queues[p].values())
+
+    def active(self) -> int:
+        return self._active
+
+    def interactive_busy(self) -> bool:
+        """
+        יש משתמשים שמחכים בתור – עבודות רקע צריכות לוותר. מקומות תפוסים לבדם לא נחשבים:
+        slot בעדיפות רקע ממילא מחכה מאחורי כל משתמש.
+        """
+        return self.depth(INTERACTIVE) > 0
+
+    def estimated_wait(self, priority: str = INTERACTIVE) -> float:
+        """הערכה (בשניות) כמה תחכה בקשה חדשה בעדיפות הזו"""
+        ahead = self.depth(INTERACTIVE) if priority == INTERACTIVE else self.depth()
+        if self._active < self.concurrency and not ahead:
+            return 0.0
+        return math.ceil((ahead + 1) / self.concurrency) * self.service_seconds
+
+    # -------- הקצאה ושחרור --------
+    def _can_start_now(self, priority: str) -> bool:
+        ahead = self.depth(INTERACTIVE) if priority == INTERACTIVE else self.depth()
+        return self._active < self.concurrency and not ahead
+
+    def _start(self, ticket: Ticket) -> Ticket:
+        self._active += 1
+        ticket.started_at = time.perf_counter()
+        self._waits_ms.append((ticket.started_at - ticket.enqueued_at) * 1000)
+        self.stats["admitted"] += 1
+        return ticket
+
+    def _admit_or_reject(self, user: str, priority: str, max_wait: float):
+        queue = self._queues[priority]
+        if len(queue.get(user, ())) >= self.max_per_user:
+            self.stats["rejected_user_limit"] += 1
+            raise SchedulerBusy(429, max(1, round(self.service_seconds)), "too many pending requests")
+        if self.depth(priority) >= self.max_queue[priority]:
+            self.stats["rejected_queue_full"] += 1
+            raise SchedulerBusy(503, max(1, round(self.estimated_wait(priority))), "AI queue is full")
+        estimate = self.estimated_wait(priority)
+        if estimate > max_wait:
+            self.stats["rejected_wait"] += 1
+            raise SchedulerBusy(503, max(1, round(estimate)), "AI is busy")
+
+    def check(self, user: str, priority: str = INTERACTIVE, max_wait: float | None = None):
+        """דחייה מוקדמת (SchedulerBusy) בלי להיכנס לתור – למשל לפני שמתחילים תשובה בהזרמה"""
+        if not self._can_start_now(priority):
+            self._admit_or_reject(user, priority, self.max_wait if max_wait is None else max_wait)
+
+    async def acquire(self, user: str, priority: str = INTERACTIVE, max_wait: float | None = None) -> Ticket:
+        max_wait = self.max_wait if max_wait is None else max_wait
+        ticket = Ticket(user, priority)
+        if self._can_start_now(priority):
+            return self._start(ticket)
+
+        self._admit_or_reject(user, priority, max_wait)
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(user, deque()).append((ticket, future))
+        self.stats["queued"] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            if future.done():
+                return future.result()
+            self._remove(ticket)
+            self.stats["timeouts"] += 1
+            raise SchedulerBusy(503, max(1, round(self.estimated_wait(priority))), "AI is busy") from None
+        except asyncio.CancelledError:
+            # הלקוח התנתק בזמן ההמתנה; אם המקום כבר הוקצה לו – מחזירים אותו
+            if future.done() and not future.cancelled():
+                granted = future.result()
+                granted.started_at = None  # לא נכנס לממוצע זמן היצירה
+                self.release(granted)
+            else:
+                self._remove(ticket)
+                future.cancel()
+            self.stats["cancelled_waiting"] += 1
+            raise
+
+    def release(self, ticket: Ticket):
+        if ticket.released:
+            return
+        ticket.released = True
+        self._active -= 1
+        self.stats["completed"] += 1
+        if ticket.started_at is not None:
+            elapsed = time.perf_counter() - ticket.started_at
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * elapsed
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user: str, priority: str = INTERACTIVE, max_wait: float | None = None):
+        ticket = await self.acquire(user, priority, max_wait)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _remove(self, ticket: Ticket):
+        queue = self._queues[ticket.priority]
+        waiters = queue.get(ticket.user)
+        if not waiters:
+            return
+        for item in waiters:
+            if item[0] is ticket:
+                waiters.remove(item)
+                break
+        if not waiters:
+            del queue[ticket.user]
+
+    def _next(self) -> tuple[Ticket, asyncio.Future] | None:
+        for p in PRIORITIES:
+            queue = self._queues[p]
+            while queue:
+                user, waiters = next(iter(queue.items()))
+                item = waiters.popleft()
+                # המשתמש עובר לסוף הסבב (או יוצא ממנו אם התור שלו התרוקן)
+                del queue[user]
+                if waiters:
+                    queue[user] = waiters
+                if not item[1].done():
+                    return item
+        return None
+
+    def _dispatch(self):
+        while self._active < self.concurrency:
+            item = self._next()
+            if item is None:
+                return
+            ticket, future = item
+            future.set_result(self._start(ticket))
+
+    def snapshot(self) -> dict:
+        waits = sorted(self._waits_ms)
+
+        def pct(q: float):
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))], 1) if waits else None
+
+        return {
+            **self.stats,
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "queue_depth": {p: self.depth(p) for p in PRIORITIES},
+            "waiting_users": {p: len(self._queues[p]) for p in PRIORITIES},
+            "wait_ms_p50": pct(0.5),
+            "wait_ms_p95": pct(0.95),
+            "avg_generation_s": round(self.service_seconds, 2),
+            "estimated_wait_s": round(self.estimated_wait(), 1),
+        }
+
+
+scheduler = OllamaScheduler(
+    # Ollama מריץ כברירת מחדל יצירה אחת בכל פעם (OLLAMA_NUM_PARALLEL בצד שלו)
+    concurrency=int(os.getenv("OLLAMA_CONCURRENCY", "1")),
+    max_queue=int(os.getenv("OLLAMA_QUEUE_MAX", "20")),
+    max_background_queue=int(os.getenv("OLLAMA_BACKGROUND_QUEUE_MAX", "50")),
+    max_per_user=int(os.getenv("OLLAMA_QUEUE_PER_USER", "3")),
+    max_wait=float(os.getenv("OLLAMA_QUEUE_MAX_WAIT", "30")),
+    expected_seconds=float(os.getenv("OLLAMA_EXPECTED_SECONDS", "8")),
+)
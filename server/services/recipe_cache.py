@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+from infrastructure.kv_cache import TwoTierCache
+
+log = logging.getLogger(__name__)
+
+# -------- TTL לפי סוג הבקשה (בשניות) --------
+TTL = {
+    "search": int(os.getenv("MEALDB_CACHE_SEARCH_TTL", str(6 * 3600))),
+    "lookup": int(os.getenv("MEALDB_CACHE_LOOKUP_TTL", str(24 * 3600))),
+}
+# תוצאה ריקה (חיפוש בלי תוצאות / מזהה שלא קיים) נשמרת לזמן קצר יותר
+NEGATIVE_TTL = int(os.getenv("MEALDB_CACHE_NEGATIVE_TTL", "600"))
+
+# ערך שפג תוקפו עדיין מוגש (ומרוענן ברקע), אז נמחק מהדיסק רק כשהוא ישן מאוד
+KEEP_STALE = int(os.getenv("MEALDB_CACHE_KEEP_STALE", str(7 * 24 * 3600)))
+
+_cache = TwoTierCache("mealdb_cache", max_items=int(os.getenv("MEALDB_CACHE_MAX_ITEMS", "2000")), keep_stale=KEEP_STALE)
+
+# מונים לגודל ה-cache: hit טרי, hit שפג תוקפו (הוגש מיד + רענון ברקע), miss
+STATS = {"hits": 0, "stale": 0, "misses": 0, "negative_hits": 0, "refreshes": 0, "refresh_errors": 0}
+
+# רענונים שרצים כרגע ברקע (לפי מפתח) – מונע רענון כפול ושומר רפרנס ל-task
+_refreshing: dict[str, asyncio.Task] = {}
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == []
+
+
+def _ttl(kind: str, value: Any) -> int:
+    return NEGATIVE_TTL if _is_empty(value) else TTL[kind]
+
+
+async def cached(kind: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    מחזיר ערך מה-cache או טוען אותו דרך loader.
+    ערך שפג תוקפו מוגש מיד, ובמקביל מתוזמן רענון שלו ברקע (stale-while-revalidate).
+    """
+    ck = f"{kind}:{key}"
+    entry = await _cache.aget(ck)
+    if entry is not None:
+        value, expires_at = entry
+        if expires_at > time.time():
+            STATS["hits"] += 1
+            if _is_empty(value):
+                STATS["negative_hits"] += 1
+            return value
+        STATS["stale"] += 1
+        _schedule_refresh(kind, ck, loader)
+        return value
+
+    STATS["misses"] += 1
+    value = await loader()
+    _cache.set(ck, value, _ttl(kind, value))
+    return value
+
+
+def put(kind: str, key: str, value: Any):
+    """שומר ערך ידנית (למשל מתכון שנשלף בדרך אחרת)"""
+    _cache.set(f"{kind}:{key}", value, _ttl(kind, value))
+
+
+def _schedule_refresh(kind: str, ck: str, loader: Callable[[], Awaitable[Any]]):
+    if ck in _refreshing:
+        return
+
+    async def _refresh():
+        try:
+            value = await loader()
+            _cache.set(ck, value, _ttl(kind, value))
+            STATS["refreshes"] += 1
+        except Exception as e:
+            # הערך הישן נשאר ב-cache; ננסה שוב בבקשה הבאה
+            STATS["refresh_errors"] += 1
+            log.warning("cache refresh failed for %s: %s", ck, e)
+        finally:
+            _refreshing.pop(ck, None)
+
+    _refreshing[ck] = asyncio.create_task(_refresh())
+
+
+def stats() -> dict:
+    total = STATS["hits"] + STATS["stale"] + STATS["misses"]
+    return {
+        **STATS,
+        "hit_ratio": round((STATS["hits"] + STATS["stale"]) / total, 3) if total else 0.0,
+        "tiers": _cache.stats,
+        "size": _cache.size(),
+        "refreshing": len(_refreshing),
+    }
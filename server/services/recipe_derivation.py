@@ -0,0 +1,173 @@
+"""
+שדות נגזרים שנשמרים עם כל מתכון: ערכים תזונתיים, מזהי רכיבים מנורמלים, תגיות ואומדן זמן בישול.
+
+החישוב רץ פעם אחת כשמתכון נכנס למאגר (או ל-cache) ולא בכל בקשה. כל תוצאה מסומנת
+ב-DERIVATION_VERSION; כשהנוסחאות משתנות מעלים את הגרסה, ומתכון ישן מחושב מחדש בפעם הבאה
+שהוא נקרא. מילוי מחדש של כל המאגר רץ במאגר תהליכים (ProcessPoolExecutor).
+
+הרצה ידנית (מתוך תיקיית server):
+    python -m services.recipe_derivation --workers 4
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from services.ingredient_normalizer import canonical_ingredient
+from services.nutrition_service import nutrition_service
+
+log = logging.getLogger(__name__)
+
+# להעלות בכל שינוי בנוסחאות (טבלת מזון, מפענח כמויות, מנרמל, אומדן זמן)
+DERIVATION_VERSION = 1
+
+BACKFILL_WORKERS = int(os.getenv("DERIVATION_WORKERS", str(min(4, os.cpu_count() or 1))))
+BACKFILL_CHUNK = 500
+
+# זמן בישול: סכום הזמנים שמופיעים בהוראות; בלי זמנים – אומדן לפי מספר השלבים
+_TIME_RE = re.compile(r"(\d+(?:\.\d+)?)(?:\s*(?:-|–|to)\s*(\d+(?:\.\d+)?))?\s*(hours?|hrs?|minutes?|mins?)\b", re.I)
+BASE_MINUTES = 10
+MINUTES_PER_STEP = 5
+MAX_COOK_TIME_MIN = 24 * 60
+
+STATS = {"derived": 0, "lazy_recomputes": 0, "backfilled": 0, "backfill_state": "idle", "backfill_seconds": None}
+
+
+def estimate_cook_time(steps: list[str]) -> int:
+    """דקות: "bake for 1 hour 20 minutes" → 80, "simmer 10-15 mins" → 15"""
+    minutes = 0.0
+    for step in steps:
+        for m in _TIME_RE.finditer(step):
+            value = float(m.group(2) or m.group(1))
+            minutes += value * 60 if m.group(3).lower().startswith("h") else value
+    if not minutes:
+        minutes = BASE_MINUTES + MINUTES_PER_STEP * len(steps)
+    return int(min(round(minutes), MAX_COOK_TIME_MIN))
+
+
+def _ingredient_ids(recipe: dict) -> list[str]:
+    return sorted({canonical_ingredient(i.get("name", "")) for i in recipe.get("ingredients") or []} - {""})
+
+
+def derive_many(recipes: list[dict]) -> list[dict]:
+    """מחשב את השדות הנגזרים לכל המתכונים (במקום) – הערכים התזונתיים במעבר וקטורי אחד"""
+    nutrition = nutrition_service.compute_many([r.get("ingredients") or [] for r in recipes])
+    for r, n in zip(recipes, nutrition):
+        r["nutrition"] = n
+        r["derived"] = {
+            "version": DERIVATION_VERSION,
+            "ingredient_ids": _ingredient_ids(r),
+            "tags": sorted({t.strip().lower() for t in r.get("tags") or []} - {""}),
+            "cook_time_min": estimate_cook_time(r.get("steps") or []),
+        }
+    STATS["derived"] += len(recipes)
+    return recipes
+
+
+def is_current(recipe: dict) -> bool:
+    return (recipe.get("derived") or {}).get("version") == DERIVATION_VERSION
+
+
+def ensure_derived(recipes: list[dict]) -> list[dict]:
+    """מחשב מחדש רק מתכונים שהנגזרת שלהם חסרה או מגרסה ישנה; מחזיר את אלה שחושבו"""
+    stale = [r for r in recipes if r and not is_current(r)]
+    if stale:
+        derive_many(stale)
+        STATS["lazy_recomputes"] += len(stale)
+    return stale
+
+
+def ingredient_ids(recipe: dict) -> list[str]:
+    """מזהי הרכיבים המנורמלים של מתכון – מהנגזרת השמורה אם היא עדכנית"""
+    derived = recipe.get("derived") or {}
+    if derived.get("version") == DERIVATION_VERSION:
+        return derived["ingredient_ids"]
+    return _ingredient_ids(recipe)
+
+
+# -------- מילוי מחדש של כל המאגר --------
+def _derive_chunk(recipes: list[dict]) -> list[dict]:
+    # רץ בתהליך עובד
+    return derive_many(recipes)
+
+
+def _stale_chunks(recipes, size: int):
+    chunk = []
+    for r in recipes:
+        if not is_current(r):
+            chunk.append(r)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def needs_backfill() -> bool:
+    from services import recipe_index
+    return recipe_index.get_meta("derivation_version") != str(DERIVATION_VERSION) and recipe_index.count() > 0
+
+
+def backfill(workers: int = BACKFILL_WORKERS, chunk: int = BACKFILL_CHUNK) -> dict:
+    """מחשב מחדש את כל המתכונים במאגר שהנגזרת שלהם לא עדכנית וכותב אותם חזרה"""
+    from services import recipe_index
+
+    STATS["backfill_state"] = "running"
+    t0 = time.time()
+    done = 0
+    try:
+        chunks = _stale_chunks(recipe_index.iter_all(), chunk)
+        if workers <= 1:
+            for c in chunks:
+                done += recipe_index.upsert_many(derive_many(c))
+        else:
+            # spawn: התהליך הראשי עשוי להריץ threads (שרת), ו-fork מהם לא בטוח
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                pending = set()
+                for c in chunks:
+                    pending.add(pool.submit(_derive_chunk, c))
+                    # לא יותר משתי מנות לכל עובד בזיכרון
+                    if len(pending) >= workers * 2:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for f in finished:
+                            done += recipe_index.upsert_many(f.result())
+                for f in pending:
+                    done += recipe_index.upsert_many(f.result())
+        recipe_index.set_meta("derivation_version", str(DERIVATION_VERSION))
+        STATS["backfill_state"] = "done"
+    except Exception:
+        STATS["backfill_state"] = "failed"
+        raise
+    finally:
+        STATS["backfilled"] += done
+        STATS["backfill_seconds"] = round(time.time() - t0, 2)
+    return {"recomputed": done, "seconds": STATS["backfill_seconds"], "version": DERIVATION_VERSION}
+
+
+async def backfill_in_background():
+    """נקרא ב-startup כשגרסת הנגזרת השתנתה; עד שמסתיים, מתכונים ישנים מחושבים בקריאה"""
+    try:
+        result = await asyncio.to_thread(backfill)
+        log.info("derivation backfill: %s", result)
+    except Exception as e:
+        log.exception("derivation backfill failed: %s", e)
+
+
+def stats() -> dict:
+    return {**STATS, "version": DERIVATION_VERSION}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute derived recipe fields")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    parser.add_argument("--chunk", type=int, default=BACKFILL_CHUNK)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for k, v in backfill(args.workers, args.chunk).items():
+        print(f"{k}: {v}")
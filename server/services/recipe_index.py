@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import re
+import time
+
+from infrastructure.local_store import store
+from services import recipe_derivation
+
+log = logging.getLogger(__name__)
+
+# -------------------------------
+# אינדקס מתכונים מקומי (SQLite FTS5)
+# -------------------------------
+# כל מתכון שעובר דרך השירות נשמר כאן בצורת _adapt, ובמקביל נכנס לטבלת FTS5
+# על הכותרת, התגיות, שמות הרכיבים וההוראות. החיפוש מדורג לפי BM25.
+# ה-payload כולל את השדות הנגזרים (services/recipe_derivation); מתכון שנקרא עם נגזרת
+# מגרסה ישנה מחושב מחדש ונכתב חזרה.
+
+# משקלי BM25 לכל עמודה: id (לא מאונדקס), title, tags, ingredients, instructions
+_BM25_WEIGHTS = (0.0, 10.0, 4.0, 3.0, 1.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# פונקציות שנקראות עם רשימת המתכונים שהשתנו אחרי כל upsert (אינדקסים בזיכרון וכו')
+_listeners = []
+
+
+def add_listener(fn):
+    """רישום callback שיקבל list[dict] של מתכונים חדשים/מעודכנים"""
+    _listeners.append(fn)
+
+
+def init_index():
+    with store() as cx:
+        cx.execute("""
+        CREATE TABLE IF NOT EXISTS recipes (
+            id TEXT PRIMARY KEY,            -- idMeal
+            payload TEXT NOT NULL,          -- המתכון בצורת _adapt (JSON)
+            content_hash TEXT NOT NULL,     -- hash של ה-payload לזיהוי שינויים
+            updated_at REAL NOT NULL
+        )
+        """)
+        cx.execute("""
+        CREATE TABLE IF NOT EXISTS recipe_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """)
+        cx.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+            id UNINDEXED, title, tags, ingredients, instructions,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """)
+
+
+def content_hash(recipe: dict) -> str:
+    raw = json.dumps(recipe, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def upsert_many(recipes: list[dict]) -> int:
+    """
+    מוסיף/מעדכן מתכונים באינדקס. מתכון שה-hash שלו לא השתנה מדולג.
+    מחזיר את מספר המתכונים שנכתבו בפועל.
+    """
+    if not recipes:
+        return 0
+    changed = []
+    now = time.time()
+    with store() as cx:
+        for r in recipes:
+            rid = str(r["id"])
+            h = content_hash(r)
+            row = cx.execute("SELECT content_hash FROM recipes WHERE id = ?", (rid,)).fetchone()
+            if row and row[0] == h:
+                continue
+            cx.execute(
+                "INSERT OR REPLACE INTO recipes (id, payload, content_hash, updated_at) VALUES (?, ?, ?, ?)",
+                (rid, json.dumps(r, ensure_ascii=False), h, now),
+            )
+            cx.execute("DELETE FROM recipes_fts WHERE id = ?", (rid,))
+            cx.execute(
+                "INSERT INTO recipes_fts (id, title, tags, ingredients, instructions) VALUES (?, ?, ?, ?, ?)",
+                (
+                    rid,
+                    r.get("title") or "",
+                    " ".join(r.get("tags") or []),
+                    " ".join(i.get("name", "") for i in r.get("ingredients") or []),
+                    " ".join(r.get("steps") or []),
+                ),
+            )
+            changed.append(r)
+    if changed:
+        for fn in _listeners:
+            try:
+                fn(changed)
+            except Exception as e:
+                log.warning("recipe index listener %s failed: %s", getattr(fn, "__name__", fn), e)
+    return len(changed)
+
+
+def upsert(recipe: dict) -> bool:
+    return upsert_many([recipe]) > 0
+
+
+def _refresh_derived(recipes: list[dict]) -> list[dict]:
+    stale = recipe_derivation.ensure_derived(recipes)
+    if stale:
+        upsert_many(stale)
+    return recipes
+
+
+def get(rid: str) -> dict | None:
+    with store() as cx:
+        row = cx.execute("SELECT payload FROM recipes WHERE id = ?", (str(rid),)).fetchone()
+    return _refresh_derived([json.loads(row[0])])[0] if row else None
+
+
+def get_many(ids: list[str]) -> dict[str, dict]:
+    """שליפה של כמה מתכונים בבת אחת; מחזיר {id: recipe} רק למזהים שקיימים"""
+    ids = [str(i) for i in ids]
+    out = {}
+    with store() as cx:
+        # SQLite מגביל את מספר הפרמטרים בשאילתה – שולפים במנות
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            for rid, payload in cx.execute(f"SELECT id, payload FROM recipes WHERE id IN ({marks})", chunk):
+                out[rid] = json.loads(payload)
+    _refresh_derived(list(out.values()))
+    return out
+
+
+def iter_all(batch: int = 1000):
+    """מעבר על כל המתכונים במאגר (לבניית אינדקסים בזיכרון). הנגזרות מוחזרות כפי שנשמרו"""
+    with store() as cx:
+        cur = cx.execute("SELECT payload FROM recipes ORDER BY rowid")
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            for (payload,) in rows:
+                yield json.loads(payload)
+
+
+def _fts_query(text: str) -> str:
+    # כל מילה הופכת ל-prefix query במירכאות (מונע תחביר FTS מהמשתמש); המילים מחוברות ב-AND
+    tokens = _TOKEN_RE.findall(text.lower())
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def search(query: str, limit: int = 50, offset: int = 0) -> list[dict]:
+    """חיפוש מלא-טקסט מדורג BM25. מחזיר מתכונים בצורת _adapt"""
+    match = _fts_query(query)
+    if not match:
+        return []
+    weights = ", ".join(str(w) for w in _BM25_WEIGHTS)
+    with store() as cx:
+        rows = cx.execute(
+            f"""
+            SELECT r.payload
+            FROM recipes_fts f JOIN recipes r ON r.id = f.id
+            WHERE recipes_fts MATCH ?
+            ORDER BY bm25(recipes_fts, {weights})
+            LIMIT ? OFFSET ?
+            """,
+            (match, limit, offset),
+        ).fetchall()
+    return _refresh_derived([json.loads(row[0]) for row in rows])
+
+
+def search_count(query: str) -> int:
+    """מספר ההתאמות הכולל לשאילתה (לצורך עימוד)"""
+    match = _fts_query(query)
+    if not match:
+        return 0
+    with store() as cx:
+        return cx.execute("SELECT COUNT(*) FROM recipes_fts WHERE recipes_fts MATCH ?", (match,)).fetchone()[0]
+
+
+def get_meta(key: str) -> str | None:
+    with store() as cx:
+        row = cx.execute("SELECT value FROM recipe_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_meta(key: str, value: str):
+    with store() as cx:
+        cx.execute("INSERT OR REPLACE INTO recipe_meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def is_mirrored() -> bool:
+    """האם הושלמה לפחות פעם אחת מראה מלאה של הקטלוג (services/corpus_mirror)"""
+    return get_meta("mirrored_at") is not None
+
+
+def count() -> int:
+    with store() as cx:
+        return cx.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+
+init_index()
@@ -0,0 +1,287 @@
+"""
+אינדקס וקטורי של המתכונים לעיגון (RAG) של הצ'אט הכללי.
+
+כל מתכון הופך לטקסט קצר (כותרת, תגיות, רכיבים, תחילת ההוראות) שמקבל embedding דרך
+Ollama. הווקטורים (מנורמלים, float32) יושבים בקובץ אחד שממופה לזיכרון (np.memmap),
+ושורה לכל מתכון נרשמת ב-SQLite יחד עם hash של הטקסט והמודל – כך שסנכרון מחשב
+embedding רק למתכונים חדשים או שהשתנו, במנות, ובעדיפות רקע בתור של Ollama.
+
+שאלה בצ'אט הכללי מקבלת embedding, מוכפלת בכל המטריצה (במנות) ו-TOP_K המתכונים
+הקרובים נכנסים ל-prompt כשורה קצרה אחת כל אחד.
+
+הרצה ידנית (מתוך תיקיית server):
+    python -m services.recipe_vectors --batch 32
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import httpx
+import numpy as np
+
+from infrastructure.local_store import STORE_DB_PATH, store
+from services import llm_telemetry, recipe_index
+from services.ollama_client import OLLAMA_EMBED_MODEL, close_client, ollama_embed
+from services.ollama_scheduler import BACKGROUND, SchedulerBusy, scheduler
+
+log = logging.getLogger(__name__)
+
+# -------- הגדרות --------
+RAG_ENABLED = os.getenv("RAG_ENABLED", "1") == "1"
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+# מתחת לדמיון הזה המתכון לא נחשב רלוונטי לשאלה
+RAG_MIN_SCORE = float(os.getenv("RAG_MIN_SCORE", "0.3"))
+EMBED_BATCH = int(os.getenv("RAG_EMBED_BATCH", "32"))
+SYNC_INTERVAL_SEC = float(os.getenv("RAG_SYNC_INTERVAL_SEC", "300"))
+VECTORS_PATH = os.getenv("RAG_VECTORS_PATH", os.path.splitext(STORE_DB_PATH)[0] + "_vectors.f32")
+
+# כמה שורות מכפילים בבת אחת בחיפוש (זיכרון חסום גם במטריצה גדולה)
+SEARCH_BLOCK = 8192
+MAX_STEPS_CHARS = 300
+SNIPPET_INGREDIENTS = 8
+
+STATS = {"embedded": 0, "sync_runs": 0, "sync_errors": 0, "last_sync_seconds": None, "queries": 0,
+         "query_errors": 0, "grounded": 0}
+
+
+def _init():
+    with store() as cx:
+        cx.execute("""
+        CREATE TABLE IF NOT EXISTS recipe_vectors (
+            id TEXT PRIMARY KEY,            -- idMeal
+            row INTEGER NOT NULL UNIQUE,    -- השורה בקובץ הווקטורים
+            text_hash TEXT NOT NULL         -- hash של הטקסט + המודל (שינוי = embedding מחדש)
+        )
+        """)
+
+
+def doc_text(recipe: dict) -> str:
+    """הטקסט שמקבל embedding – מה שמאפיין את המתכון, בלי כמויות"""
+    names = ", ".join(i.get("name", "") for i in recipe.get("ingredients") or [])
+    tags = ", ".join(recipe.get("tags") or [])
+    steps = " ".join(recipe.get("steps") or [])[:MAX_STEPS_CHARS]
+    return f"{recipe.get('title', '')}. Tags: {tags}. Ingredients: {names}. {steps}"
+
+
+def _text_hash(text: str, model: str) -> str:
+    return hashlib.sha1(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def snippet(recipe: dict) -> str:
+    """שורה אחת ל-prompt: כותרת, תגיות, רכיבים עיקריים וזמן"""
+    names = [i.get("name", "") for i in recipe.get("ingredients") or []][:SNIPPET_INGREDIENTS]
+    tags = f" [{', '.join(recipe['tags'])}]" if recipe.get("tags") else ""
+    minutes = (recipe.get("derived") or {}).get("cook_time_min")
+    time_txt = f"; ~{minutes} min" if minutes else ""
+    return f"- {recipe.get('title', '')}{tags}: {', '.join(names)}{time_txt}"
+
+
+class RecipeVectors:
+    def __init__(self, path: str = VECTORS_PATH, model: str = OLLAMA_EMBED_MODEL):
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self._sync_lock = asyncio.Lock()
+        self._loaded = False
+        self._dirty = True
+        self._dim = 0
+        self._matrix: np.memmap | None = None
+        self._ids: list[str] = []          # מזהה לפי שורה
+        self._row_of: dict[str, int] = {}
+        self._hash_of: dict[str, str] = {}
+
+    # ---------- קובץ הווקטורים ----------
+    def _load(self):
+        if recipe_index.get_meta("vectors_model") not in (None, self.model):
+            # מודל אחר = מרחב וקטורים אחר (ואולי מימד אחר) – מתחילים מחדש
+            log.info("embedding model changed to %s, re-embedding all recipes", self.model)
+            self._reset()
+            recipe_index.set_meta("vectors_dim", "")
+        recipe_index.set_meta("vectors_model", self.model)
+        with store() as cx:
+            rows = cx.execute("SELECT id, row, text_hash FROM recipe_vectors ORDER BY row").fetchall()
+        dim = recipe_index.get_meta("vectors_dim")
+        self._ids = [rid for rid, _, _ in rows]
+        self._row_of = {rid: row for rid, row, _ in rows}
+        self._hash_of = {rid: h for rid, _, h in rows}
+        self._dim = int(dim) if dim else 0
+        if self._dim and rows and os.path.exists(self.path):
+            capacity = os.path.getsize(self.path) // (4 * self._dim)
+            if capacity >= len(rows):
+                self._matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+            else:
+                # הקובץ קצר מהרישום (נמחק/נקטע) – מתחילים מחדש
+                log.warning("vector file %s is shorter than its index, re-embedding", self.path)
+                self._reset()
+        self._loaded = True
+
+    def _reset(self):
+        with store() as cx:
+            cx.execute("DELETE FROM recipe_vectors")
+        self._ids, self._row_of, self._hash_of = [], {}, {}
+        self._matrix = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _ensure_capacity(self, rows: int):
+        """מגדיל את הקובץ (פי 2) כשאין מקום לשורות חדשות"""
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, 1024)
+        if self._matrix is not None:
+            self._matrix.flush()
+        with open(self.path, "ab") as f:
+            f.truncate(new_capacity * self._dim * 4)
+        self._matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(new_capacity, self._dim))
+
+    def _write(self, recipes: list[dict], hashes: list[str], vectors: list[list[float]]):
+        x = np.asarray(vectors, dtype=np.float32)
+        x /= np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-9)
+        with self._lock:
+            if not self._dim:
+                self._dim = x.shape[1]
+                recipe_index.set_meta("vectors_dim", str(self._dim))
+            rows = []
+            for r in recipes:
+                rid = str(r["id"])
+                if rid not in self._row_of:
+                    self._row_of[rid] = len(self._ids)
+                    self._ids.append(rid)
+                rows.append(self._row_of[rid])
+            self._ensure_capacity(len(self._ids))
+            self._matrix[rows] = x
+            self._matrix.flush()
+        with store() as cx:
+            cx.executemany(
+                "INSERT OR REPLACE INTO recipe_vectors (id, row, text_hash) VALUES (?, ?, ?)",
+                [(str(r["id"]), row, h) for r, row, h in zip(recipes, rows, hashes)],
+            )
+        for r, h in zip(recipes, hashes):
+            self._hash_of[str(r["id"])] = h
+        STATS["embedded"] += len(recipes)
+
+    # ---------- סנכרון מצטבר ----------
+    def _stale(self):
+        for r in recipe_index.iter_all():
+            text = doc_text(r)
+            h = _text_hash(text, self.model)
+            if self._hash_of.get(str(r["id"])) != h:
+                yield r, text, h
+
+    async def sync(self, batch: int = EMBED_BATCH) -> dict:
+        """embedding למתכונים חדשים/שהשתנו בלבד, במנות; כל מנה ממתינה למקום בתור כעבודת רקע"""
+        async with self._sync_lock:
+            if not self._loaded:
+                self._load()
+            self._dirty = False
+            t0 = time.time()
+            done = 0
+            pending: list[tuple[dict, str, str]] = []
+            try:
+                for item in self._stale():
+                    pending.append(item)
+                    if len(pending) >= batch:
+                        done += await self._embed_batch(pending)
+                        pending = []
+                if pending:
+                    done += await self._embed_batch(pending)
+            except (httpx.HTTPError, SchedulerBusy, KeyError) as e:
+                # ננסה שוב בסנכרון הבא; מה שכבר נכתב נשמר
+                self._dirty = True
+                STATS["sync_errors"] += 1
+                log.warning("recipe embedding sync stopped after %s recipes: %s", done, e)
+            STATS["sync_runs"] += 1
+            STATS["last_sync_seconds"] = round(time.time() - t0, 2)
+            return {"embedded": done, "total": len(self._ids), "seconds": STATS["last_sync_seconds"]}
+
+    async def _embed_batch(self, items: list[tuple[dict, str, str]]) -> int:
+        async with scheduler.slot("system:embeddings", BACKGROUND):
+            vectors = await ollama_embed([text for _, text, _ in items], self.model)
+        self._write([r for r, _, _ in items], [h for _, _, h in items], vectors)
+        return len(items)
+
+    def on_recipes_changed(self, recipes: list[dict]):
+        # מסמנים בלבד – הסנכרון הבא (periodic_sync) יחשב רק את מה שהשתנה
+        self._dirty = True
+
+    async def periodic_sync(self):
+        """לולאת רקע: סנכרון בהפעלה ואז כל SYNC_INTERVAL_SEC כשהמאגר השתנה"""
+        llm_telemetry.set_route("rag_sync")
+        while True:
+            if self._dirty:
+                result = await self.sync()
+                if result["embedded"]:
+                    log.info("recipe vectors: %s", result)
+            await asyncio.sleep(SYNC_INTERVAL_SEC)
+
+    # ---------- שאילתה ----------
+    def search(self, query: np.ndarray, k: int = RAG_TOP_K) -> list[tuple[str, float]]:
+        """[(id, score)] של k המתכונים הקרובים ביותר לווקטור (מנורמל)"""
+        with self._lock:
+            n = len(self._ids)
+            matrix, ids = self._matrix, self._ids[:n]
+        if not n or matrix is None or query.shape[0] != matrix.shape[1]:
+            return []
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, SEARCH_BLOCK):
+            stop = min(start + SEARCH_BLOCK, n)
+            scores[start:stop] = matrix[start:stop] @ query
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[j], float(scores[j])) for j in top]
+
+    async def context_for(self, question: str, k: int = RAG_TOP_K) -> str:
+        """קטע ל-prompt עם המתכונים הרלוונטיים לשאלה, או "" אם אין (או שה-embedding נכשל)"""
+        if not self._loaded:
+            self._load()
+        if not self._ids:
+            return ""
+        STATS["queries"] += 1
+        try:
+            q = np.asarray((await ollama_embed([question], self.model))[0], dtype=np.float32)
+        except (httpx.HTTPError, KeyError, IndexError) as e:
+            STATS["query_errors"] += 1
+            log.warning("question embedding failed: %s", e)
+            return ""
+        q /= max(float(np.linalg.norm(q)), 1e-9)
+        hits = [rid for rid, score in self.search(q, k) if score >= RAG_MIN_SCORE]
+        recipes = recipe_index.get_many(hits)
+        lines = [snippet(recipes[rid]) for rid in hits if rid in recipes]
+        if not lines:
+            return ""
+        STATS["grounded"] += 1
+        return "Recipes from our catalog that may help:\n" + "\n".join(lines) + "\n\n"
+
+    def stats(self) -> dict:
+        return {**STATS, "enabled": RAG_ENABLED, "model": self.model, "vectors": len(self._ids), "dim": self._dim,
+                "dirty": self._dirty, "path": self.path}
+
+
+_init()
+recipe_vectors = RecipeVectors()
+recipe_index.add_listener(recipe_vectors.on_recipes_changed)
+
+
+async def _main(batch: int):
+    llm_telemetry.set_route("rag_sync")
+    try:
+        result = await recipe_vectors.sync(batch)
+    finally:
+        await close_client()
+    for k, v in result.items():
+        print(f"{k}: {v}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed new or changed recipes into the local vector index")
+    parser.add_argument("--batch", type=int, default=EMBED_BATCH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.batch))
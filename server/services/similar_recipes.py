@@ -0,0 +1,184 @@
+import threading
+import logging
+
+import numpy as np
+from scipy import sparse
+
+from services import recipe_index
+from services.recipe_derivation import ingredient_ids
+
+log = logging.getLogger(__name__)
+
+# -------------------------------
+# "מתכונים דומים" לפי וקטורי רכיבים
+# -------------------------------
+# מטריצה דלילה (CSR) של מתכון × רכיב עם משקלי TF-IDF, שורות מנורמלות ל-L2,
+# כך שמכפלה פנימית = דמיון קוסינוס. השכנים של כל המתכונים מחושבים מראש במנות
+# (X[batch] @ X.T); בקורפוס גדול הם מחושבים לפי דרישה ונשמרים. כשהקורפוס משתנה
+# הבנייה מחדש רצה ב-thread ברקע (עם השהיה קצרה שמאחדת שינויים רצופים); עד אז
+# מתכון חדש מחושב מול המטריצה הקיימת בזמן השאילתה.
+
+TOP_K = 12
+BATCH_SIZE = 512
+REBUILD_DELAY_SEC = 30.0
+# חישוב כל-מול-כל הוא O(n²); מעל הסף הזה השכנים מחושבים לפי דרישה לכל מתכון ונשמרים
+PRECOMPUTE_MAX_RECIPES = 20_000
+
+
+class SimilarRecipes:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._dirty = False
+        self._timer: threading.Timer | None = None
+        self._vocab: dict[str, int] = {}
+        self._idf: np.ndarray | None = None
+        self._ids: list[str] = []
+        self._row_of: dict[str, int] = {}
+        self._matrix: sparse.csr_matrix | None = None
+        self._matrix_t: sparse.csc_matrix | None = None
+        self._neighbors: np.ndarray | None = None      # (n, TOP_K) אינדקסי שורות, -1 = אין
+        self._scores: np.ndarray | None = None
+        self._computed: np.ndarray | None = None       # אילו שורות כבר חושבו
+
+    # ---------- בנייה ----------
+    def build(self, recipes=None):
+        """בונה את המטריצה ואת רשימות השכנים. ברירת מחדל: כל המאגר המקומי"""
+        recipes = recipe_index.iter_all() if recipes is None else recipes
+        ids, rows, cols = [], [], []
+        vocab: dict[str, int] = {}
+        for r in recipes:
+            terms = ingredient_ids(r)
+            row = len(ids)
+            ids.append(str(r["id"]))
+            for t in terms:
+                rows.append(row)
+                cols.append(vocab.setdefault(t, len(vocab)))
+
+        n = len(ids)
+        x = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32))),
+            shape=(n, max(len(vocab), 1)),
+        )
+        # IDF: רכיב נפוץ (מלח, מים) כמעט לא תורם לדמיון
+        df = np.bincount(x.indices, minlength=x.shape[1]).astype(np.float32)
+        idf = (np.log((1 + n) / (1 + df)) + 1.0).astype(np.float32)
+        x = _l2_normalize(x @ sparse.diags(idf))
+
+        neighbors = np.full((n, TOP_K), -1, dtype=np.int32)
+        scores = np.zeros((n, TOP_K), dtype=np.float32)
+        computed = np.zeros(n, dtype=bool)
+        xt = x.T.tocsc()
+        if n <= PRECOMPUTE_MAX_RECIPES:
+            for start in range(0, n, BATCH_SIZE):
+                stop = min(start + BATCH_SIZE, n)
+                _top_k_rows(x, xt, start, stop, neighbors, scores)
+            computed[:] = True
+        with self._lock:
+            self._vocab, self._idf = vocab, idf
+            self._ids = ids
+            self._row_of = {rid: i for i, rid in enumerate(ids)}
+            self._matrix, self._matrix_t = x, xt
+            self._neighbors, self._scores, self._computed = neighbors, scores, computed
+            self._built = True
+
+    def on_recipes_changed(self, recipes: list[dict]):
+        # בנייה מחדש כבדה – מאחדים שינויים רצופים ובונים ב-thread ברקע
+        if not self._built:
+            return
+        with self._lock:
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(REBUILD_DELAY_SEC, self._rebuild)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _rebuild(self):
+        with self._lock:
+            self._timer = None
+            self._dirty = False
+        try:
+            self.build()
+        except Exception as e:
+            log.exception("similar recipes rebuild failed: %s", e)
+
+    # ---------- שאילתה ----------
+    def similar(self, rid: str, limit: int = TOP_K) -> list[dict]:
+        """מחזיר [{"id", "score"}] של המתכונים הדומים ביותר"""
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+        with self._lock:
+            row = self._row_of.get(str(rid))
+            if row is not None:
+                if not self._computed[row]:
+                    # שורה בודדת: מכפלה של המטריצה בווקטור צפוף מהירה יותר ממכפלה דלילה×דלילה
+                    self._neighbors[row], self._scores[row] = _top_k(self._matrix @ self._matrix[row].toarray().ravel(), row)
+                    self._computed[row] = True
+                out = []
+                for j, sc in zip(self._neighbors[row], self._scores[row]):
+                    if j < 0 or sc <= 0:
+                        break
+                    out.append({"id": self._ids[j], "score": round(float(sc), 4)})
+                return out[:limit]
+        # מתכון שעוד לא נכנס לבנייה האחרונה – מחשבים מול המטריצה הקיימת
+        recipe = recipe_index.get(rid)
+        return self._similar_to(recipe, limit) if recipe else []
+
+    def _similar_to(self, recipe: dict, limit: int) -> list[dict]:
+        with self._lock:
+            x, vocab, idf, ids = self._matrix, self._vocab, self._idf, self._ids
+        cols = sorted({vocab[t] for t in ingredient_ids(recipe) if t in vocab})
+        if not cols or x is None or x.shape[0] == 0:
+            return []
+        q = np.zeros(x.shape[1], dtype=np.float32)
+        q[cols] = idf[cols]
+        q /= np.linalg.norm(q)
+        sims = x @ q
+        k = min(limit + 1, len(sims))   # +1: המתכון עצמו עשוי להופיע אם כבר נכנס למטריצה
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        rid = str(recipe["id"])
+        return [{"id": ids[j], "score": round(float(sims[j]), 4)} for j in top if sims[j] > 0 and ids[j] != rid][:limit]
+
+    def stats(self) -> dict:
+        shape = self._matrix.shape if self._matrix is not None else (0, 0)
+        return {"recipes": shape[0], "ingredients": shape[1], "built": self._built, "dirty": self._dirty}
+
+
+def _top_k_rows(x: sparse.csr_matrix, xt: sparse.csc_matrix, start: int, stop: int,
+                neighbors: np.ndarray, scores: np.ndarray):
+    """מחשב את TOP_K השכנים של השורות [start, stop) במכפלה אחת וכותב אותם למערכים"""
+    n = x.shape[0]
+    k = min(TOP_K, n - 1)
+    if k <= 0:
+        return
+    sims = (x[start:stop] @ xt).toarray()
+    sims[np.arange(stop - start), np.arange(start, stop)] = -1.0   # לא שכן של עצמו
+    part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(sims, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    neighbors[start:stop, :k] = np.take_along_axis(part, order, axis=1)
+    scores[start:stop, :k] = np.take_along_axis(part_scores, order, axis=1)
+
+
+def _top_k(sims: np.ndarray, exclude: int) -> tuple[np.ndarray, np.ndarray]:
+    neighbors = np.full(TOP_K, -1, dtype=np.int32)
+    scores = np.zeros(TOP_K, dtype=np.float32)
+    sims[exclude] = -1.0
+    k = min(TOP_K, len(sims) - 1)
+    if k > 0:
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        neighbors[:k], scores[:k] = top, sims[top]
+    return neighbors, scores
+
+
+def _l2_normalize(x: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(x.multiply(x).sum(axis=1)).ravel())
+    return (sparse.diags((1.0 / np.maximum(norms, 1e-9)).astype(np.float32)) @ x).tocsr()
+
+
+similar_recipes = SimilarRecipes()
+recipe_index.add_listener(similar_recipes.on_recipes_changed)
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """
+    מאחד קריאות זהות שרצות במקביל: הקורא הראשון למפתח מפעיל את הקריאה,
+    וכל מי שמגיע עם אותו מפתח בזמן שהיא רצה מקבל את אותה תוצאה (או את אותה שגיאה).
+    הקריאה רצה ב-task משלה, כך שביטול של אחד הממתינים לא מבטל אותה לאחרים.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[str, int] = {}
+        self.stats = {"calls": 0, "deduplicated": 0, "abandoned": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], cancel_abandoned: bool = False) -> Any:
+        """
+        cancel_abandoned: אם כל הממתינים בוטלו (למשל כל הלקוחות התנתקו), מבטלים גם את הקריאה
+        עצמה במקום לתת לה לרוץ עד הסוף בשביל אף אחד.
+        """
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["deduplicated"] += 1
+        else:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._done(key, t))
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if cancel_abandoned and self._waiters.get(key) == 1 and not task.done():
+                task.cancel()
+                self.stats["abandoned"] += 1
+            raise
+        finally:
+            left = self._waiters.get(key, 1) - 1
+            if left > 0:
+                self._waiters[key] = left
+            else:
+                self._waiters.pop(key, None)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # מסמנים שהשגיאה נקראה גם אם כל הממתינים בוטלו (מונע אזהרת asyncio)
+        if not task.cancelled():
+            task.exception()
+
+    def waiters(self, key: str) -> int:
+        """כמה קוראים מחכים כרגע לתוצאה של המפתח"""
+        return self._waiters.get(key, 0)
+
+    def running(self, key: str) -> bool:
+        return key in self._inflight
+
+    def inflight(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,174 @@
+import re
+import threading
+
+from services import recipe_index
+from services.recipe_derivation import ingredient_ids
+
+# -------------------------------
+# השלמה אוטומטית לפי prefix (trie בזיכרון)
+# -------------------------------
+# מפתחות: כותרות (מכל תחילת מילה, כך ש-"cur" מוצא גם "Chicken Curry"), רכיבים ותגיות.
+# כל צומת שומר מראש את TOP_K ההצעות הכבדות ביותר שמתחתיו, כך ששאילתה היא
+# הליכה של len(prefix) צעדים והחזרת רשימה מוכנה – בלי סריקה של תת-העץ.
+# מתכון חדש / צפייה רק מעלים משקלים, ולכן עדכון כזה הוא הכנסה חוזרת של ההצעה
+# לאורך המסלול שלה. מתכון שהשתנה מוריד את המפתחות הישנים שלו – ירידה במשקל לא
+# מתוקנת ב-top של הצמתים, אז במקרה כזה (נדיר: סנכרון מחדש) בונים את העץ מחדש.
+
+TOP_K = 10
+# עומק מקסימלי של המפתח בעץ; prefix ארוך יותר מסונן מתוך הצומת העמוק ביותר
+MAX_DEPTH = 12
+
+_WORD_START = re.compile(r"(?:^|\s)(?=\w)")
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.top: list[tuple[float, str, str, str | None]] = []   # (weight, text, kind, recipe_id)
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._root = _Node()
+        self._built = False
+        self._keys_of: dict[str, frozenset] = {}                # recipe id → (kind, text) שהמתכון תרם
+        self._weights: dict[tuple[str, str], float] = {}        # (kind, text) → weight
+        self._title_of: dict[str, str] = {}
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._lock:
+            if not self._built:
+                self.add_many(recipe_index.iter_all())
+                self._built = True
+
+    # ---------- עדכון ----------
+    def add_many(self, recipes):
+        with self._lock:
+            stale = False
+            for r in recipes:
+                rid = str(r["id"])
+                keys = frozenset(
+                    [("ingredient", ing) for ing in ingredient_ids(r)]
+                    + [("tag", tag) for tag in {t.strip().lower() for t in r.get("tags") or []} - {""}]
+                )
+                old = self._keys_of.get(rid, frozenset())
+                for key in old - keys:
+                    self._drop(key)
+                    stale = True
+                for kind, text in keys - old:
+                    self._bump(kind, text, 1.0)
+                self._keys_of[rid] = keys
+
+                title = (r.get("title") or "").strip()
+                old_title = self._title_of.get(rid)
+                if title == old_title:
+                    continue
+                if old_title:
+                    stale = True   # הכותרת הישנה עדיין במסלולים שלה בעץ
+                if not title:
+                    self._title_of.pop(rid, None)
+                    self._weights.pop(("title", rid), None)
+                    continue
+                self._title_of[rid] = title
+                # כותרת שהשתנתה שומרת את המשקל שצברה (צפיות)
+                self._bump("title", title, 0.0 if old_title else 1.0, rid)
+            if stale:
+                self._rebuild()
+
+    def on_recipes_changed(self, recipes: list[dict]):
+        if self._built:
+            self.add_many(recipes)
+
+    def record_view(self, rid: str):
+        """מתכון שנפתח עולה במשקל (פופולריות)"""
+        with self._lock:
+            title = self._title_of.get(str(rid))
+            if title:
+                self._bump("title", title, 1.0, str(rid))
+
+    def _bump(self, kind: str, text: str, delta: float, rid: str | None = None):
+        key = (kind, text if kind != "title" else rid)
+        weight = self._weights.get(key, 0.0) + delta
+        self._weights[key] = weight
+        self._insert_all((weight, text, kind, rid))
+
+    def _drop(self, key: tuple[str, str]):
+        """מתכון הפסיק לתרום את המפתח; משקל 0 = ההצעה יוצאת (העץ נבנה מחדש אחרי זה)"""
+        weight = self._weights.get(key, 0.0) - 1.0
+        if weight > 0:
+            self._weights[key] = weight
+        else:
+            self._weights.pop(key, None)
+
+    def _rebuild(self):
+        self._root = _Node()
+        for (kind, k), weight in self._weights.items():
+            if kind == "title":
+                self._insert_all((weight, self._title_of[k], kind, k))
+            else:
+                self._insert_all((weight, k, kind, None))
+
+    def _insert_all(self, entry: tuple):
+        _, text, kind, _ = entry
+        for k in self._keys(kind, text):
+            self._insert(k[:MAX_DEPTH], entry)
+
+    @staticmethod
+    def _keys(kind: str, text: str) -> list[str]:
+        low = text.lower()
+        if kind != "title":
+            return [low]
+        return [low[m.end():] for m in _WORD_START.finditer(low)]
+
+    def _insert(self, key: str, entry: tuple):
+        node = self._root
+        self._offer(node, entry)
+        for ch in key:
+            node = node.children.setdefault(ch, _Node())
+            self._offer(node, entry)
+
+    @staticmethod
+    def _offer(node: _Node, entry: tuple):
+        weight, text, kind, rid = entry
+        top = node.top
+        for i, (_, t, k, r) in enumerate(top):
+            if t == text and k == kind and r == rid:
+                top[i] = entry
+                break
+        else:
+            if len(top) >= TOP_K and weight <= top[-1][0]:
+                return
+            top.append(entry)
+        top.sort(key=lambda e: (-e[0], e[1]))
+        del top[TOP_K:]
+
+    # ---------- שאילתה ----------
+    def suggest(self, prefix: str, limit: int = TOP_K) -> list[dict]:
+        self._ensure_built()
+        p = (prefix or "").lower().lstrip()
+        if not p:
+            return []
+        node = self._root
+        for ch in p[:MAX_DEPTH]:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        top = node.top
+        if len(p) > MAX_DEPTH:
+            top = [e for e in top if any(k.startswith(p) for k in self._keys(e[2], e[1]))]
+        return [
+            {"text": text, "kind": kind, "id": rid, "weight": weight}
+            for weight, text, kind, rid in top[:limit]
+        ]
+
+    def stats(self) -> dict:
+        return {"recipes": len(self._keys_of), "entries": len(self._weights), "built": self._built}
+
+
+suggest_index = SuggestIndex()
+recipe_index.add_listener(suggest_index.on_recipes_changed)
@@ -0,0 +1,62 @@
+"""
+שאלות מוצעות למתכון: השאלות הראשונות שמשתמשים כבר שאלו עליו (מההיסטוריה של השיחות),
+ואחריהן שאלות נפוצות לפי תבנית (החלפת הרכיב העיקרי, הכנה מראש, איך יודעים שמוכן).
+
+ה-API מייצר את התשובות להן מראש בעדיפות רקע (api/ai.py), כך שלחיצה על שאלה מוצעת
+בלקוח עונה מיד מה-cache.
+"""
+
+import os
+from collections import Counter
+
+from services.answer_cache import normalize_question
+from services.chat_sessions import first_questions
+
+# -------- הגדרות --------
+SUGGEST_COUNT = int(os.getenv("AI_SUGGEST_COUNT", "4"))
+# מכמה שיחות (האחרונות) על המתכון סופרים שאלות פופולריות
+POPULAR_SCAN = 200
+# שאלה צריכה להישאל לפחות כך כדי להיחשב פופולרית
+POPULAR_MIN = 2
+
+# רכיבים שלא שואלים על תחליף להם
+_STAPLES = {"salt", "pepper", "black pepper", "water", "oil", "olive oil", "vegetable oil", "sugar", "butter"}
+
+_TEMPLATES = (
+    "Can I make this ahead and freeze it?",
+    "How do I know when it's done?",
+    "How can I make this lighter?",
+)
+
+
+def _main_ingredient(recipe: dict) -> str | None:
+    for ing in recipe.get("ingredients") or []:
+        name = (ing.get("name") or "").strip()
+        if name and name.lower() not in _STAPLES:
+            return name
+    return None
+
+
+def popular_questions(recipe_id: str, limit: int = SUGGEST_COUNT) -> list[str]:
+    """השאלות הראשונות הנפוצות בשיחות על המתכון (הנוסח של הפעם האחרונה שנשאלו)"""
+    counts: Counter = Counter()
+    wording: dict[str, str] = {}
+    for question in first_questions(recipe_id, POPULAR_SCAN):
+        key = normalize_question(question)
+        counts[key] += 1
+        wording.setdefault(key, question.strip())
+    return [wording[k] for k, n in counts.most_common(limit) if n >= POPULAR_MIN]
+
+
+def suggestions_for(recipe_id: str, recipe: dict | None) -> list[str]:
+    questions = popular_questions(recipe_id)
+    ingredient = _main_ingredient(recipe or {})
+    templates = ([f"What can I use instead of {ingredient}?"] if ingredient else []) + list(_TEMPLATES)
+    seen = {normalize_question(q) for q in questions}
+    for q in templates:
+        if len(questions) >= SUGGEST_COUNT:
+            break
+        if normalize_question(q) not in seen:
+            questions.append(q)
+            seen.add(normalize_question(q))
+    return questions[:SUGGEST_COUNT]